@@ -1,203 +1,606 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import functools
+import os
+import re
+import tempfile
+import time
+import uuid
+import analitico
+import banco
+import carrinho
+import catalogo
+import escritor
+import favoritos
+import imagens
+import instrumentacao
+import recomendacoes
+import reservas
+import rotinas
+import sessoes
+import tarefas
+import vendas
 from datetime import datetime
 
+INICIO_EXECUCAO = time.perf_counter()
+instrumentacao.iniciar("app")
+
 # ========== CONFIGURAÇÕES INICIAIS ==========
+@st.cache_resource
+def obter_estilos():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "estilos.css"), encoding="utf-8") as arquivo:
+        css = arquivo.read()
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", re.sub(r"\s+", " ", css)).strip()
+    return f"<style>{css}</style>"
+
 st.set_page_config(
     page_title="Unifolhas",
     page_icon="🌿",
     layout="wide"
 )
 
-# Estilos CSS personalizados
-st.markdown("""
-<style>
-    .stButton>button {
-        background-color: #4CAF50;
-        color: white;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        background-color: #45a049;
-        transform: scale(1.05);
-    }
-    .stAlert { border-left: 4px solid #4CAF50; }
-    .product-card {
-        border: 1px solid #e0e0e0;
-        border-radius: 10px;
-        padding: 15px;
-        margin-bottom: 20px;
-        transition: all 0.3s;
-    }
-    .product-card:hover {
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        transform: translateY(-5px);
-    }
-    .login-section {
-        border: 1px solid #e0e0e0;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 20px;
-    }
-    .carrinho-item {
-        border-bottom: 1px solid #eee;
-        padding: 8px 0;
-    }
-    .carrinho-total {
-        font-weight: bold;
-        font-size: 1.1em;
-        margin-top: 10px;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Estilos CSS personalizados (lidos e compactados uma vez por processo; o
+# Streamlit descarta o que não é reenviado, então o <style> vai a cada rerun)
+st.markdown(obter_estilos(), unsafe_allow_html=True)
 
 # ========== BANCO DE DADOS SQLite ==========
-def init_db():
-    conn = sqlite3.connect('unifolhas.db')
-    c = conn.cursor()
-
-    # Tabela de vendas
-    c.execute('''CREATE TABLE IF NOT EXISTS vendas
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  Produto TEXT,
-                  Quantidade INTEGER,
-                  Preço REAL,
-                  Subtotal REAL,
-                  Usuario TEXT,
-                  Data TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-
-    # Tabela de usuários
-    c.execute('''CREATE TABLE IF NOT EXISTS usuarios
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  nome TEXT UNIQUE,
-                  email TEXT,
-                  favoritos TEXT)''')
-
-    # Tabela de produtos
-    c.execute('''CREATE TABLE IF NOT EXISTS produtos
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  Nome TEXT,
-                  Preço REAL,
-                  Estoque INTEGER,
-                  Categoria TEXT,
-                  Descricao TEXT,
-                  Imagem TEXT)''')
-
-    # Inserir produtos de exemplo se a tabela estiver vazia
-    c.execute("SELECT COUNT(*) FROM produtos")
-    if c.fetchone()[0] == 0:
-        produtos_exemplo = [
-            ("Shampoo Sólido", 42.50, 15, "Higiene", "Shampoo livre de sulfatos em barra", "https://via.placeholder.com/300?text=Shampoo"),
-            ("Condicionador Natural", 45.75, 20, "Higiene", "Condicionador com óleo de argan", "https://via.placeholder.com/300?text=Condicionador"),
-            ("Polpa Hidratante", 56.90, 37, "Tratamento", "Hidratante corporal com manteiga de karité", "https://via.placeholder.com/300?text=Polpa+Hidratante"),
-            ("Sabonete Líquido", 47.90, 17, "Higiene", "Sabonete vegano com extrato de camomila", "https://via.placeholder.com/300?text=Sabonete"),
-            ("Polpa Esfoliante", 57.10, 28, "Tratamento", "Esfoliante natural com cristais de açúcar", "https://via.placeholder.com/300?text=Polpa+Esfoliante")
-        ]
-        c.executemany('''INSERT INTO produtos (Nome, Preço, Estoque, Categoria, Descricao, Imagem)
-                         VALUES (?, ?, ?, ?, ?, ?)''', produtos_exemplo)
-
-    conn.commit()
-    conn.close()
-
-init_db()
+@st.cache_resource
+def obter_pool():
+    # Esquema e dados iniciais uma única vez por processo, não a cada rerun;
+    # com o serviço de escrita quem migra e semeia é ele, aqui só se confere
+    pool = banco.PoolConexoes(banco.CAMINHO_DB, fabrica=instrumentacao.fabrica_conexao())
+    with instrumentacao.secao("init_db"):
+        if escritor.ENDERECO:
+            banco.esperar_esquema(pool)
+        else:
+            banco.init_db(pool)
+    return pool
+
+@st.cache_resource
+def obter_pool_leitura():
+    # Catálogo e Dashboard só leem: réplica (UNIFOLHAS_REPLICA, immutable=1)
+    # ou o próprio banco aberto com mode=ro
+    fabrica = instrumentacao.fabrica_conexao()
+    if banco.CAMINHO_REPLICA:
+        if not os.path.exists(banco.CAMINHO_REPLICA):
+            banco.copiar_replica(obter_pool(), banco.CAMINHO_REPLICA)
+        return banco.PoolLeitura(banco.CAMINHO_REPLICA, fabrica=fabrica, imutavel=True)
+    obter_pool()
+    return banco.PoolLeitura(banco.CAMINHO_DB, fabrica=fabrica)
+
+@st.cache_resource
+def obter_escrita():
+    # Com vários processos (implantacao.py) as escritas vão ao serviço de escrita
+    if escritor.ENDERECO:
+        return escritor.Remoto(escritor.ENDERECO, escritor.CHAVE)
+    return escritor.Local(obter_pool())
+
+@st.cache_resource
+def obter_cache_catalogo():
+    # Nome, preço e descrição em memória, compartilhados pelas sessões do
+    # processo; relidos só quando a versão do catálogo muda
+    return catalogo.CacheCatalogo(obter_pool())
+
+@st.cache_resource
+def obter_historico_compras():
+    return vendas.HistoricoCompras(obter_pool())
+
+@st.cache_resource
+def obter_sessoes():
+    # Carrinho de quem está logado, compartilhado entre processos
+    return sessoes.ArmazemSessoes(sessoes.BackendSQLite(obter_pool(), obter_escrita()))
+
+@st.cache_resource
+def obter_espelho():
+    # Só com UNIFOLHAS_ANALITICO=<pasta> e pyarrow; senão o painel usa o SQLite
+    if analitico.DIRETORIO and analitico.disponivel():
+        return analitico.Espelho(analitico.DIRETORIO)
+    return None
+
+@st.cache_resource
+def obter_trabalhadores():
+    # Pós-checkout e recálculos periódicos fora do rerun, em threads do
+    # processo; com o serviço de escrita eles rodam lá (None aqui)
+    if escritor.ENDERECO:
+        return None
+    return rotinas.agendar_periodicas(tarefas.Trabalhadores(obter_pool()))
+
+@st.cache_resource
+def obter_imagens():
+    return imagens.CacheImagens()
+
+pool = obter_pool()
+pool_leitura = obter_pool_leitura()
+escrita = obter_escrita()
+obter_trabalhadores()
+
+TAMANHO_PAGINA_DADOS = 50
+TAMANHO_PAGINA_HISTORICO = 20
 
 # ========== ESTADO DA SESSÃO ==========
 if 'carrinho' not in st.session_state:
-    st.session_state.carrinho = []
+    st.session_state.carrinho = carrinho.Carrinho()
 if 'usuario' not in st.session_state:
     st.session_state.usuario = None
 if 'favoritos' not in st.session_state:
-    st.session_state.favoritos = []
+    st.session_state.favoritos = set()
+if 'catalogo_filtros' not in st.session_state:
+    st.session_state.catalogo_filtros = None
+if 'catalogo_paginas' not in st.session_state:
+    st.session_state.catalogo_paginas = [None]
+if 'tempos_execucao' not in st.session_state:
+    st.session_state.tempos_execucao = []
+if 'sessao_reservas' not in st.session_state:
+    # Dono das reservas de estoque do carrinho: a aba, até o login (aí o usuário)
+    st.session_state.sessao_reservas = uuid.uuid4().hex
+    st.session_state.reservas_renovadas_em = 0.0
+
+# ========== FRAGMENTOS E TEMPO DE EXECUÇÃO ==========
+def registrar_execucao(escopo, inicio):
+    tempos = st.session_state.tempos_execucao
+    tempos.append({"Hora": datetime.now().strftime("%H:%M:%S"),
+                   "Escopo": escopo,
+                   "ms": round((time.perf_counter() - inicio) * 1000, 1)})
+    del tempos[:-50]
+
+def fragmento(escopo):
+    # st.fragment que também registra quanto tempo cada execução levou
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                with instrumentacao.secao_fragmento(escopo):
+                    return funcao(*args, **kwargs)
+            finally:
+                registrar_execucao(escopo, inicio)
+        return st.fragment(medido)
+    return decorador
 
 # ========== FUNÇÕES AUXILIARES ==========
 def formatar_moeda(valor):
     return f"R$ {valor:,.2f}".replace(".", "~").replace(",", ".").replace("~", ",")
 
-def carregar_produtos():
-    conn = sqlite3.connect('unifolhas.db')
-    produtos = pd.read_sql('''SELECT * FROM produtos''', conn)
-    conn.close()
-    return produtos
+def carregar_favoritos():
+    # Favoritos marcados antes do login são gravados para o usuário
+    if st.session_state.favoritos:
+        escrita.executar("favoritar", st.session_state.usuario, st.session_state.favoritos)
+    st.session_state.favoritos = favoritos.carregar(pool, st.session_state.usuario)
 
-def salvar_favoritos():
+def persistir_sessao():
+    # Gravação adiada: só marca a sessão como alterada, a escrita é em lote
     if st.session_state.usuario:
-        conn = sqlite3.connect('unifolhas.db')
-        fav_str = ','.join(st.session_state.favoritos)
-        conn.execute('''INSERT OR REPLACE INTO usuarios (nome, favoritos)
-                        VALUES (?, ?)''',
-                     (st.session_state.usuario, fav_str))
-        conn.commit()
-        conn.close()
+        obter_sessoes().salvar(f"sessao:{st.session_state.usuario}",
+                               {"carrinho": st.session_state.carrinho.para_lista()})
+
+def restaurar_sessao():
+    # Chamada ao entrar: junta o carrinho salvo com o que foi montado antes do
+    # login (o atual vence quando o mesmo produto está nos dois)
+    carregar_favoritos()
+    salva = obter_sessoes().ler(f"sessao:{st.session_state.usuario}")
+    if salva is not None:
+        restaurado = carrinho.Carrinho.de_lista(salva["carrinho"])
+        for item in st.session_state.carrinho:
+            restaurado.remover(item.produto_id)
+            restaurado.adicionar(item.produto_id, item.nome, item.preco, item.quantidade)
+        st.session_state.carrinho = restaurado
+    # Logado, as reservas são do usuário e não da aba: entrar de novo (outra
+    # aba, outro navegador) renova as mesmas em vez de segurar o estoque em
+    # dobro até o TTL; as da aba anônima são soltas antes
+    anonima = st.session_state.sessao_reservas
+    st.session_state.sessao_reservas = f"usuario:{st.session_state.usuario}"
+    if anonima != st.session_state.sessao_reservas:
+        escrita.executar("liberar", anonima)
+    ajustados = reservar_carrinho()
+    if ajustados:
+        st.session_state.mensagem_carrinho = (
+            "warning", f"Estoque insuficiente, quantidade ajustada: {', '.join(ajustados)}.")
+    persistir_sessao()
+
+def reservar_carrinho():
+    # Reserva (ou renova) cada item do carrinho; o que não tem mais estoque
+    # livre é reduzido ao disponível (0 tira do carrinho). Outra sessão pode
+    # levar estoque entre uma tentativa e outra, então tenta de novo com o
+    # novo disponível, sempre menor; zerar nunca é recusado. Devolve os
+    # nomes ajustados.
+    ajustados = []
+    for item in list(st.session_state.carrinho):
+        quantidade = item.quantidade
+        while True:
+            try:
+                escrita.executar("reservar", st.session_state.sessao_reservas, item.produto_id, quantidade)
+                break
+            except reservas.ReservaRecusada as e:
+                quantidade = e.disponivel
+        if quantidade != item.quantidade:
+            st.session_state.carrinho.atualizar(item.produto_id, quantidade)
+            ajustados.append(item.nome)
+    st.session_state.reservas_renovadas_em = time.time()
+    return ajustados
+
+def exibir_imagem(fonte, largura):
+    # Miniatura local; se não der para gerar, o navegador busca a original
+    if not fonte:
+        # Produtos importados sem imagem
+        st.caption("📷 Sem imagem")
+        return
+    miniatura = obter_imagens().miniatura(fonte, largura)
+    st.image(miniatura if miniatura is not None else fonte, width=largura)
 
-def carregar_favoritos():
-    if st.session_state.usuario:
-        conn = sqlite3.connect('unifolhas.db')
-        c = conn.cursor()
-        c.execute('''SELECT favoritos FROM usuarios WHERE nome = ?''',
-                  (st.session_state.usuario,))
-        resultado = c.fetchone()
-        conn.close()
-        if resultado and resultado[0]:
-            st.session_state.favoritos = resultado[0].split(',')
-
-def adicionar_ao_carrinho(produto_nome, produto_preco, quantidade=1):
-    carrinho = st.session_state.carrinho
-    item_existente = next((item for item in carrinho if item["Produto"] == produto_nome), None)
-
-    if item_existente:
-        item_existente["Quantidade"] += quantidade
-        item_existente["Subtotal"] = item_existente["Quantidade"] * item_existente["Preço"]
-    else:
-        carrinho.append({
-            "Produto": produto_nome,
-            "Preço": produto_preco,
-            "Quantidade": quantidade,
-            "Subtotal": produto_preco * quantidade
-        })
-
-    st.success(f"{quantidade}x {produto_nome} adicionado ao carrinho!")
+def adicionar_ao_carrinho(produto, quantidade=1):
+    produto_id = int(produto['id'])
+    try:
+        escrita.executar("reservar", st.session_state.sessao_reservas, produto_id,
+                         st.session_state.carrinho.quantidade(produto_id) + quantidade)
+    except reservas.ReservaRecusada as e:
+        livre = e.disponivel - st.session_state.carrinho.quantidade(produto_id)
+        st.error(f"Só {max(livre, 0)} unidade(s) de {produto['Nome']} disponível(is) agora.")
+        return
+    st.session_state.carrinho.adicionar(produto_id, produto['Nome'], produto['Preço'], quantidade)
+    persistir_sessao()
+    st.success(f"{quantidade}x {produto['Nome']} adicionado ao carrinho!")
     st.rerun()
 
-def remover_do_carrinho(produto_nome):
-    st.session_state.carrinho = [item for item in st.session_state.carrinho if item["Produto"] != produto_nome]
-    st.rerun()
+def remover_do_carrinho(produto_id):
+    st.session_state.carrinho.remover(produto_id)
+    escrita.executar("liberar", st.session_state.sessao_reservas, produto_id)
+    persistir_sessao()
+
+def favoritar(produto_id, produto_nome):
+    if produto_id not in st.session_state.favoritos:
+        st.session_state.favoritos.add(produto_id)
+        if st.session_state.usuario:
+            escrita.executar("favoritar", st.session_state.usuario, [produto_id])
+        st.toast(f"{produto_nome} favoritado!")
+    else:
+        st.toast("Este produto já está nos favoritos")
+
+def remover_favorito(produto_id):
+    st.session_state.favoritos.discard(produto_id)
+    if st.session_state.usuario:
+        escrita.executar("desfavoritar", st.session_state.usuario, produto_id)
+
+def proxima_pagina(cursor):
+    st.session_state.catalogo_paginas.append(cursor)
+
+def pagina_anterior():
+    if len(st.session_state.catalogo_paginas) > 1:
+        st.session_state.catalogo_paginas.pop()
 
-def calcular_total_carrinho():
-    return sum(item["Subtotal"] for item in st.session_state.carrinho)
+def acordar_trabalhadores():
+    # Sem trabalhadores aqui, o serviço de escrita acorda os dele a cada lote
+    trabalhadores = obter_trabalhadores()
+    if trabalhadores is not None:
+        trabalhadores.acordar()
 
 def finalizar_compra():
+    # Callback do botão: a mensagem é mostrada pelo fragmento do carrinho
     if not st.session_state.usuario:
-        st.error("Por favor, faça login para finalizar a compra")
+        st.session_state.mensagem_carrinho = ("error", "Por favor, faça login para finalizar a compra")
         return
 
-    conn = sqlite3.connect('unifolhas.db')
+    # Os preços são conferidos na transação do pedido; se algum mudou nada
+    # é gravado e o carrinho é atualizado para o cliente conferir
     try:
-        for item in st.session_state.carrinho:
-            conn.execute('''INSERT INTO vendas (Produto, Quantidade, Preço, Subtotal, Usuario)
-                           VALUES (?, ?, ?, ?, ?)''',
-                        (item["Produto"], item["Quantidade"], item["Preço"],
-                         item["Subtotal"], st.session_state.usuario))
-        conn.commit()
-        st.session_state.carrinho = []
-        st.success("Compra finalizada com sucesso!")
+        escrita.executar("finalizar_pedido", st.session_state.usuario, st.session_state.carrinho.itens_pedido(),
+                         st.session_state.sessao_reservas)
+        acordar_trabalhadores()
+        st.session_state.carrinho.limpar()
+        persistir_sessao()
+        st.session_state.mensagem_carrinho = ("success", "Compra finalizada com sucesso!")
+    except vendas.PrecosAlterados as e:
+        alterados, removidos = st.session_state.carrinho.validar_precos(e.precos)
+        reservar_carrinho()
+        persistir_sessao()
+        avisos = []
+        if alterados:
+            avisos.append(f"Preço atualizado: {', '.join(alterados)}.")
+        if removidos:
+            avisos.append(f"Fora do catálogo (removido): {', '.join(removidos)}.")
+        st.session_state.mensagem_carrinho = ("warning", " ".join(avisos) + " Confira o carrinho e finalize de novo.")
+    except vendas.EstoqueInsuficiente as e:
+        st.session_state.mensagem_carrinho = (
+            "error", f"Estoque insuficiente para: {', '.join(e.produtos)}. Ajuste o carrinho e tente novamente.")
     except Exception as e:
-        st.error(f"Erro ao finalizar compra: {e}")
-    finally:
-        conn.close()
-    st.rerun()
+        st.session_state.mensagem_carrinho = ("error", f"Erro ao finalizar compra: {e}")
+
+# ========== FRAGMENTOS DA INTERFACE ==========
+# Cada fragmento reexecuta sozinho quando um widget dele muda; só
+# "Adicionar ao carrinho" precisa de um rerun completo, para o carrinho da
+# barra lateral refletir o item novo.
+@fragmento("carrinho")
+def carrinho_lateral():
+    st.header(f"🛒 Carrinho ({len(st.session_state.carrinho)})")
+
+    mensagem = st.session_state.pop("mensagem_carrinho", None)
+    if mensagem:
+        tipo, texto = mensagem
+        getattr(st, tipo)(texto)
+
+    if st.session_state.carrinho:
+        # Preços do catálogo em memória a cada exibição; o pedido confere de
+        # novo na transação ao gravar
+        ids = [item.produto_id for item in st.session_state.carrinho]
+        precos = obter_cache_catalogo().precos(ids)
+        alterados, removidos = st.session_state.carrinho.validar_precos(precos)
+        for produto_id in set(ids) - precos.keys():
+            escrita.executar("liberar", st.session_state.sessao_reservas, produto_id)
+        avisos = []
+        if alterados:
+            avisos.append(f"Preço atualizado: {', '.join(alterados)}.")
+        if removidos:
+            avisos.append(f"Fora do catálogo (removido): {', '.join(removidos)}.")
+        if avisos:
+            persistir_sessao()
+            st.warning(" ".join(avisos))
+
+    if st.session_state.carrinho:
+        # As reservas vencem em reservas.TTL sem renovação
+        if time.time() - st.session_state.reservas_renovadas_em > reservas.TTL / 3:
+            ajustados = reservar_carrinho()
+            if ajustados:
+                persistir_sessao()
+                st.warning(f"Estoque insuficiente, quantidade ajustada: {', '.join(ajustados)}.")
+
+    if st.session_state.carrinho:
+        for item in st.session_state.carrinho:
+            col1, col2 = st.columns([4,1])
+            with col1:
+                st.markdown(f"**{item.nome}**")
+                st.markdown(f"{item.quantidade} x {formatar_moeda(item.preco)} = {formatar_moeda(item.subtotal)}")
+            with col2:
+                st.button("❌", key=f"rem_{item.produto_id}",
+                          on_click=remover_do_carrinho, args=(item.produto_id,))
+
+        st.markdown("---")
+        st.markdown(f"**Total:** {formatar_moeda(st.session_state.carrinho.total)}", unsafe_allow_html=True)
+
+        st.button("Finalizar Compra", type="primary", use_container_width=True,
+                  on_click=finalizar_compra)
+    else:
+        st.info("Carrinho vazio")
+
+@fragmento("cartao_destaque")
+def cartao_destaque(produto):
+    with st.container():
+        st.markdown('<div class="product-card">', unsafe_allow_html=True)
+        st.markdown(f"### {produto['Nome']}")
+        st.markdown(f"{produto['Descricao']}")
+        st.markdown(f"**Preço:** {formatar_moeda(produto['Preço'])}")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(f"🛒 Adicionar", key=f"add_{produto['id']}"):
+                adicionar_ao_carrinho(produto)
+
+        with col2:
+            st.button(f"❤️ Favoritar", key=f"fav_{produto['id']}",
+                      on_click=favoritar, args=(int(produto['id']), produto['Nome']))
+
+        st.markdown('</div>', unsafe_allow_html=True)
+
+@fragmento("cartao_catalogo")
+def cartao_catalogo(produto, disponivel, sugestoes=()):
+    with st.container():
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            exibir_imagem(produto["Imagem"], 200)
+
+        with col2:
+            st.markdown(f"### {produto['Nome']}")
+            st.markdown(f"**Categoria:** {produto['Categoria']}")
+            st.markdown(f"**Preço:** {formatar_moeda(produto['Preço'])}")
+            st.markdown(f"**Disponível:** {disponivel} unidades"
+                        + (f" ({produto['Estoque'] - disponivel} em carrinhos)" if produto['Estoque'] > disponivel else ""))
+            st.markdown(f"**Descrição:** {produto['Descricao']}")
+            if sugestoes:
+                st.caption("🛍️ Quem comprou também comprou: " + ", ".join(nome for _, nome in sugestoes))
+
+            col_btn1, col_btn2 = st.columns(2)
+            with col_btn1:
+                quantidade = st.number_input(f"Qtd {produto['Nome']}",
+                                           min_value=1,
+                                           max_value=max(1, min(10, disponivel)),
+                                           value=1,
+                                           key=f"qtd_{produto['id']}",
+                                           disabled=disponivel <= 0)
+
+            with col_btn2:
+                if st.button(f"🛒 Adicionar", key=f"add_{produto['id']}", disabled=disponivel <= 0):
+                    adicionar_ao_carrinho(produto, quantidade)
+
+            st.button(f"❤️ Favoritar {produto['Nome']}", key=f"fav_{produto['id']}",
+                      on_click=favoritar, args=(int(produto['id']), produto['Nome']))
+
+        st.divider()
+
+@fragmento("catalogo")
+def lista_catalogo():
+    categorias, preco_piso, preco_teto = catalogo.facetas_catalogo(pool_leitura)
+
+    busca = st.text_input("🔎 Buscar produtos", placeholder="Ex.: shampoo, polpa, argan")
+
+    # Filtros
+    with st.expander("🔍 Filtros", expanded=True):
+        col_f1, col_f2, col_f3 = st.columns(3)
+        with col_f1:
+            categoria = st.selectbox("Categoria:", ["Todas"] + categorias)
+        with col_f2:
+            preco_min, preco_max = st.slider("Faixa de preço:",
+                                           preco_piso,
+                                           preco_teto,
+                                           (preco_piso, preco_teto))
+        with col_f3:
+            ordenacao = st.selectbox("Ordenar por:", list(catalogo.ORDENACOES))
+
+    # Filtros mudaram: volta para a primeira página
+    filtros = (busca, categoria, preco_min, preco_max, ordenacao)
+    if st.session_state.catalogo_filtros != filtros:
+        st.session_state.catalogo_filtros = filtros
+        st.session_state.catalogo_paginas = [None]
+
+    if catalogo.expressao_busca(busca):
+        # Com busca, a ordem é por relevância
+        total_filtrados = catalogo.contar_busca(pool_leitura, busca, categoria, preco_min, preco_max)
+        produtos_filtrados, proxima = catalogo.buscar_produtos(
+            pool_leitura, busca, categoria, preco_min, preco_max,
+            apos=st.session_state.catalogo_paginas[-1])
+    else:
+        total_filtrados = catalogo.contar_produtos(pool_leitura, categoria, preco_min, preco_max)
+        produtos_filtrados, proxima = catalogo.pagina_produtos(
+            pool_leitura, categoria, preco_min, preco_max, ordenacao,
+            apos=st.session_state.catalogo_paginas[-1])
+
+    # Exibir produtos
+    st.subheader(f"🎯 {total_filtrados} produtos encontrados")
+
+    # Estoque menos o que está reservado em carrinhos (o desta sessão conta como livre)
+    ids_pagina = [int(produto_id) for produto_id in produtos_filtrados["id"]]
+    livres = reservas.disponiveis(pool, ids_pagina, st.session_state.sessao_reservas)
+    # Vizinhos do índice de recomendações, uma consulta para a página
+    sugeridos = recomendacoes.sugestoes(pool_leitura, ids_pagina)
+    for _, produto in produtos_filtrados.iterrows():
+        cartao_catalogo(produto, livres.get(int(produto["id"]), 0), sugeridos.get(int(produto["id"]), []))
+
+    # Paginação
+    total_paginas = max(1, -(-total_filtrados // catalogo.TAMANHO_PAGINA))
+    col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+    with col_p1:
+        st.button("◀ Anterior", on_click=pagina_anterior,
+                  disabled=len(st.session_state.catalogo_paginas) == 1)
+    with col_p2:
+        st.markdown(f"<div style='text-align: center;'>Página {len(st.session_state.catalogo_paginas)} de {total_paginas}</div>",
+                    unsafe_allow_html=True)
+    with col_p3:
+        st.button("Próxima ▶", on_click=proxima_pagina, args=(proxima,),
+                  disabled=proxima is None)
+
+@fragmento("favoritos")
+def favoritos_perfil():
+    favoritos_df = (favoritos.produtos_favoritos(pool, st.session_state.usuario, cache=obter_cache_catalogo())
+                    if st.session_state.favoritos else None)
+
+    if favoritos_df is not None and not favoritos_df.empty:
+        for _, produto in favoritos_df.iterrows():
+            col1, col2 = st.columns([1, 4])
+            with col1:
+                exibir_imagem(produto["Imagem"], 100)
+            with col2:
+                st.markdown(f"**{produto['Nome']}**")
+                st.markdown(f"Preço: {formatar_moeda(produto['Preço'])}")
+
+                if st.button(f"Adicionar ao carrinho", key=f"favcart_{produto['id']}"):
+                    adicionar_ao_carrinho(produto)
+
+                st.button(f"Remover dos favoritos", key=f"removefav_{produto['id']}",
+                          on_click=remover_favorito, args=(int(produto['id']),))
+            st.divider()
+    else:
+        st.info("Nenhum produto favoritado ainda.")
+
+@fragmento("historico")
+def historico_compras():
+    total_compras = vendas.contar_historico(pool, st.session_state.usuario)
+
+    if total_compras:
+        # Resumo de compras (incremental, desde a última venda já somada)
+        resumo = obter_historico_compras().resumo(st.session_state.usuario)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Total Gasto", formatar_moeda(resumo["total_gasto"]))
+        with col2:
+            st.metric("Itens Comprados", resumo["total_itens"])
+
+        # Gráfico de compras por mês
+        compras_por_mes = resumo["compras_por_mes"]
+        st.line_chart(compras_por_mes.set_index('Mês')['Subtotal'])
+
+        # Tabela detalhada, uma página por vez
+        total_paginas = max(1, -(-total_compras // TAMANHO_PAGINA_HISTORICO))
+        pagina_historico = st.number_input(f"Página (de {total_paginas}, {total_compras} compras):",
+                                           min_value=1, max_value=total_paginas, value=1,
+                                           key="pagina_historico")
+        st.dataframe(
+            vendas.pagina_historico(pool, st.session_state.usuario, pagina_historico,
+                                    TAMANHO_PAGINA_HISTORICO),
+            column_config={
+                "Data": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm"),
+                "Subtotal": st.column_config.NumberColumn(format="R$ %.2f")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.info("Nenhuma compra registrada ainda.")
+
+@fragmento("dados_completos")
+def dados_completos(por_dia):
+    primeiro_dia = pd.to_datetime(por_dia["Dia"].iloc[0]).date()
+    ultimo_dia = pd.to_datetime(por_dia["Dia"].iloc[-1]).date()
+
+    col_d1, col_d2, col_d3, col_d4 = st.columns([2, 2, 2, 1])
+    with col_d1:
+        periodo = st.date_input("Período:", (primeiro_dia, ultimo_dia), format="DD/MM/YYYY")
+    with col_d2:
+        filtro_usuario = st.text_input("Usuário:", key="dados_usuario").strip()
+    with col_d3:
+        ordenar_por = st.selectbox("Ordenar por:", list(vendas.ORDENACAO_DADOS_COMPLETOS),
+                                   key="dados_ordem")
+    with col_d4:
+        decrescente = st.checkbox("Decrescente", value=True)
+
+    # Enquanto o usuário escolhe o período o date_input devolve só o início
+    inicio, fim = (periodo[0], periodo[-1]) if periodo else (None, None)
+    total_linhas = vendas.contar_dados_completos(pool_leitura, inicio, fim, filtro_usuario)
+    total_paginas = max(1, -(-total_linhas // TAMANHO_PAGINA_DADOS))
+    pagina_dados = st.number_input(f"Página (de {total_paginas}, {total_linhas} vendas):",
+                                   min_value=1, max_value=total_paginas, value=1)
+
+    st.dataframe(
+        vendas.pagina_dados_completos(pool_leitura, inicio, fim, filtro_usuario, ordenar_por,
+                                      decrescente, pagina_dados, TAMANHO_PAGINA_DADOS),
+        column_config={
+            "Data": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm"),
+            "Preço Vendido": st.column_config.NumberColumn(format="R$ %.2f"),
+            "Preço Atual": st.column_config.NumberColumn(format="R$ %.2f"),
+            "Subtotal": st.column_config.NumberColumn(format="R$ %.2f")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+    # Exportação completa, gravada em disco lote a lote
+    col_e1, col_e2 = st.columns([1, 3])
+    with col_e1:
+        formato = st.radio("Formato:", ["csv", "parquet"], horizontal=True)
+    with col_e2:
+        if st.button("📥 Gerar exportação"):
+            destino = os.path.join(tempfile.gettempdir(),
+                                   f"vendas_{datetime.now():%Y%m%d_%H%M%S}.{formato}")
+            linhas = vendas.exportar_dados_completos(pool_leitura, destino, formato, inicio, fim, filtro_usuario)
+            st.session_state.exportacao = destino
+            st.success(f"{linhas} linhas exportadas")
+        exportacao = st.session_state.get("exportacao")
+        if exportacao and os.path.exists(exportacao):
+            with open(exportacao, "rb") as arquivo:
+                st.download_button("Baixar " + os.path.basename(exportacao), arquivo,
+                                   file_name=os.path.basename(exportacao))
 
 # ========== BARRA LATERAL ==========
-with st.sidebar:
+with st.sidebar, instrumentacao.secao("barra_lateral"):
     st.markdown('<div class="login-section">', unsafe_allow_html=True)
     st.markdown("## Entrar")
 
     if st.session_state.usuario:
         st.success(f"Logado como: {st.session_state.usuario}")
         if st.button("Sair"):
-            salvar_favoritos()
+            persistir_sessao()
+            escrita.executar("liberar", st.session_state.sessao_reservas)
+            st.session_state.sessao_reservas = uuid.uuid4().hex
             st.session_state.usuario = None
-            st.session_state.carrinho = []
+            st.session_state.carrinho = carrinho.Carrinho()
+            st.session_state.favoritos = set()
             st.rerun()
     else:
         usuario = st.text_input("Nome de usuário")
@@ -208,19 +611,16 @@ with st.sidebar:
             if st.button("Entrar"):
                 if usuario.strip() and len(usuario) >= 3:
                     st.session_state.usuario = usuario
-                    carregar_favoritos()
+                    restaurar_sessao()
                     st.rerun()
                 else:
                     st.error("Nome inválido (mín. 3 caracteres)")
         with col2:
             if st.button("Cadastrar"):
                 if usuario.strip() and len(usuario) >= 3 and "@" in email:
-                    conn = sqlite3.connect('unifolhas.db')
-                    conn.execute('''INSERT OR IGNORE INTO usuarios (nome, email)
-                                    VALUES (?, ?)''', (usuario, email))
-                    conn.commit()
-                    conn.close()
+                    escrita.executar("cadastrar", usuario, email)
                     st.session_state.usuario = usuario
+                    restaurar_sessao()
                     st.rerun()
                 else:
                     st.error("Dados inválidos para cadastro")
@@ -230,27 +630,10 @@ with st.sidebar:
     st.divider()
     st.header("🌿 Navegação")
     pagina = st.radio("Menu", ["🏠 Home", "📦 Catálogo", "👤 Perfil", "📊 Dashboard"])
+    instrumentacao.anotar("pagina", pagina)
 
     st.divider()
-    st.header(f"🛒 Carrinho ({len(st.session_state.carrinho)})")
-
-    if st.session_state.carrinho:
-        for item in st.session_state.carrinho:
-            col1, col2 = st.columns([4,1])
-            with col1:
-                st.markdown(f"**{item['Produto']}**")
-                st.markdown(f"{item['Quantidade']} x {formatar_moeda(item['Preço'])} = {formatar_moeda(item['Subtotal'])}")
-            with col2:
-                if st.button("❌", key=f"rem_{item['Produto']}"):
-                    remover_do_carrinho(item['Produto'])
-
-        st.markdown("---")
-        st.markdown(f"**Total:** {formatar_moeda(calcular_total_carrinho())}", unsafe_allow_html=True)
-
-        if st.button("Finalizar Compra", type="primary", use_container_width=True):
-            finalizar_compra()
-    else:
-        st.info("Carrinho vazio")
+    carrinho_lateral()
 
 # ========== PÁGINA: HOME ==========
 if pagina == "🏠 Home":
@@ -269,30 +652,12 @@ if pagina == "🏠 Home":
     # Destaques
     st.subheader("⭐ Produtos em Destaque", divider="green")
 
-    produtos = carregar_produtos()
-    produtos_selecionados = produtos[produtos['Nome'].isin(["Shampoo Sólido", "Condicionador Natural", "Polpa Hidratante"])]
+    # Vizinhos dos favoritos e compras de quem entrou; senão os mais populares
+    produtos_selecionados = recomendacoes.destaques(pool_leitura, st.session_state.usuario,
+                                                    cache=obter_cache_catalogo())
 
     for _, produto in produtos_selecionados.iterrows():
-        with st.container():
-            st.markdown('<div class="product-card">', unsafe_allow_html=True)
-            st.markdown(f"### {produto['Nome']}")
-            st.markdown(f"{produto['Descricao']}")
-            st.markdown(f"**Preço:** {formatar_moeda(produto['Preço'])}")
-
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button(f"🛒 Adicionar", key=f"add_{produto['Nome']}"):
-                    adicionar_ao_carrinho(produto['Nome'], produto['Preço'])
-
-            with col2:
-                if st.button(f"❤️ Favoritar", key=f"fav_{produto['Nome']}"):
-                    if produto['Nome'] not in st.session_state.favoritos:
-                        st.session_state.favoritos.append(produto['Nome'])
-                        st.toast(f"{produto['Nome']} favoritado!")
-                    else:
-                        st.warning("Este produto já está nos favoritos")
-
-            st.markdown('</div>', unsafe_allow_html=True)
+        cartao_destaque(produto)
 
     # Seção de valores
     st.divider()
@@ -334,74 +699,7 @@ if pagina == "🏠 Home":
 # ========== PÁGINA: CATÁLOGO ==========
 elif pagina == "📦 Catálogo":
     st.title("📦 Catálogo Completo")
-    produtos = carregar_produtos()
-
-    # Filtros
-    with st.expander("🔍 Filtros", expanded=True):
-        col_f1, col_f2, col_f3 = st.columns(3)
-        with col_f1:
-            categoria = st.selectbox("Categoria:", ["Todas"] + list(produtos["Categoria"].unique()))
-        with col_f2:
-            preco_min, preco_max = st.slider("Faixa de preço:",
-                                           float(produtos["Preço"].min()),
-                                           float(produtos["Preço"].max()),
-                                           (float(produtos["Preço"].min()), float(produtos["Preço"].max())))
-        with col_f3:
-            ordenacao = st.selectbox("Ordenar por:", ["Padrão", "Preço Crescente", "Preço Decrescente", "Mais Estoque"])
-
-    # Aplicar filtros
-    produtos_filtrados = produtos.copy()
-    if categoria != "Todas":
-        produtos_filtrados = produtos_filtrados[produtos_filtrados["Categoria"] == categoria]
-    produtos_filtrados = produtos_filtrados[
-        (produtos_filtrados["Preço"] >= preco_min) &
-        (produtos_filtrados["Preço"] <= preco_max)
-    ]
-
-    # Ordenação
-    if ordenacao == "Preço Crescente":
-        produtos_filtrados = produtos_filtrados.sort_values("Preço")
-    elif ordenacao == "Preço Decrescente":
-        produtos_filtrados = produtos_filtrados.sort_values("Preço", ascending=False)
-    elif ordenacao == "Mais Estoque":
-        produtos_filtrados = produtos_filtrados.sort_values("Estoque", ascending=False)
-
-    # Exibir produtos
-    st.subheader(f"🎯 {len(produtos_filtrados)} produtos encontrados")
-
-    for _, produto in produtos_filtrados.iterrows():
-        with st.container():
-            col1, col2 = st.columns([1, 3])
-            with col1:
-                st.image(produto["Imagem"], width=200)
-
-            with col2:
-                st.markdown(f"### {produto['Nome']}")
-                st.markdown(f"**Categoria:** {produto['Categoria']}")
-                st.markdown(f"**Preço:** {formatar_moeda(produto['Preço'])}")
-                st.markdown(f"**Estoque:** {produto['Estoque']} unidades")
-                st.markdown(f"**Descrição:** {produto['Descricao']}")
-
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    quantidade = st.number_input(f"Qtd {produto['Nome']}",
-                                               min_value=1,
-                                               max_value=min(10, produto['Estoque']),
-                                               value=1,
-                                               key=f"qtd_{produto['Nome']}")
-
-                with col_btn2:
-                    if st.button(f"🛒 Adicionar", key=f"add_{produto['Nome']}"):
-                        adicionar_ao_carrinho(produto['Nome'], produto['Preço'], quantidade)
-
-                if st.button(f"❤️ Favoritar {produto['Nome']}", key=f"fav_{produto['Nome']}"):
-                    if produto['Nome'] not in st.session_state.favoritos:
-                        st.session_state.favoritos.append(produto['Nome'])
-                        st.toast(f"{produto['Nome']} favoritado!")
-                    else:
-                        st.warning("Este produto já está nos favoritos")
-
-            st.divider()
+    lista_catalogo()
 
 # ========== PÁGINA: PERFIL ==========
 elif pagina == "👤 Perfil":
@@ -410,72 +708,11 @@ elif pagina == "👤 Perfil":
 
         # Seção de Favoritos
         st.subheader("❤️ Seus Favoritos", divider="green")
-        if st.session_state.favoritos:
-            produtos = carregar_produtos()
-            favoritos_df = produtos[produtos['Nome'].isin(st.session_state.favoritos)]
-
-            if not favoritos_df.empty:
-                for _, produto in favoritos_df.iterrows():
-                    col1, col2 = st.columns([1, 4])
-                    with col1:
-                        st.image(produto["Imagem"], width=100)
-                    with col2:
-                        st.markdown(f"**{produto['Nome']}**")
-                        st.markdown(f"Preço: {formatar_moeda(produto['Preço'])}")
-
-                        if st.button(f"Adicionar ao carrinho", key=f"favcart_{produto['Nome']}"):
-                            adicionar_ao_carrinho(produto['Nome'], produto['Preço'])
-
-                        if st.button(f"Remover dos favoritos", key=f"removefav_{produto['Nome']}"):
-                            st.session_state.favoritos.remove(produto['Nome'])
-                            st.rerun()
-                    st.divider()
-            else:
-                st.info("Nenhum produto favoritado ainda.")
-        else:
-            st.info("Nenhum produto favoritado ainda.")
+        favoritos_perfil()
 
         # Histórico de Compras
         st.subheader("📦 Histórico de Compras", divider="green")
-        conn = sqlite3.connect('unifolhas.db')
-        historico = pd.read_sql('''SELECT Produto, Quantidade, Subtotal, Data
-                                  FROM vendas
-                                  WHERE Usuario = ?
-                                  ORDER BY Data DESC''',
-                               conn, params=(st.session_state.usuario,))
-        conn.close()
-
-        if not historico.empty:
-            # Resumo de compras
-            total_gasto = historico["Subtotal"].sum()
-            total_itens = historico["Quantidade"].sum()
-
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("Total Gasto", formatar_moeda(total_gasto))
-            with col2:
-                st.metric("Itens Comprados", total_itens)
-
-            # Gráfico de compras por mês
-            historico['Data'] = pd.to_datetime(historico['Data'])
-            historico['Mês'] = historico['Data'].dt.to_period('M')
-            compras_por_mes = historico.groupby('Mês').agg({'Subtotal': 'sum', 'Quantidade': 'sum'}).reset_index()
-            compras_por_mes['Mês'] = compras_por_mes['Mês'].astype(str)
-
-            st.line_chart(compras_por_mes.set_index('Mês')['Subtotal'])
-
-            # Tabela detalhada
-            st.dataframe(
-                historico,
-                column_config={
-                    "Data": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm"),
-                    "Subtotal": st.column_config.NumberColumn(format="R$ %.2f")
-                },
-                hide_index=True,
-                use_container_width=True
-            )
-        else:
-            st.info("Nenhuma compra registrada ainda.")
+        historico_compras()
     else:
         st.warning("🔒 Faça login para acessar seu perfil")
 
@@ -484,33 +721,42 @@ elif pagina == "📊 Dashboard":
     st.title("📊 Dashboard de Vendas")
 
     if st.session_state.usuario == "admin":
-        conn = sqlite3.connect('unifolhas.db')
-        vendas = pd.read_sql('''SELECT * FROM vendas''', conn)
-        produtos = pd.read_sql('''SELECT * FROM produtos''', conn)
-        conn.close()
-
-        if not vendas.empty:
+        # Resumos em dia pela fila de tarefas (pós-checkout e periódica)
+        primeiro_dia, ultimo_dia = vendas.periodo_vendas(pool_leitura)
+        painel = None
+        if primeiro_dia is not None:
+            periodo = st.date_input("Período da análise:", (primeiro_dia, ultimo_dia),
+                                    format="DD/MM/YYYY", key="dashboard_periodo")
+            inicio, fim = (periodo[0], periodo[-1]) if periodo else (None, None)
+            # Histórico inteiro: sem filtro (no SQLite sai tudo dos resumos)
+            if inicio is not None and inicio <= primeiro_dia and fim >= ultimo_dia:
+                inicio, fim = None, None
+            with instrumentacao.secao("dashboard_painel"):
+                painel = analitico.painel_vendas(pool_leitura, obter_espelho(), inicio, fim)
+            st.caption(f"Painel calculado via {painel['motor']}")
+
+        if painel is None:
+            st.info("Nenhum dado de vendas disponível ainda.")
+        elif not painel["vendas"]:
+            st.info("Nenhuma venda no período selecionado.")
+        else:
             # Métricas gerais
             st.subheader("📈 Métricas Gerais", divider="green")
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Total de Vendas", len(vendas))
+                st.metric("Total de Vendas", painel["vendas"])
             with col2:
-                st.metric("Receita Total", formatar_moeda(vendas["Subtotal"].sum()))
+                st.metric("Receita Total", formatar_moeda(painel["receita"]))
             with col3:
-                st.metric("Produtos Vendidos", vendas["Quantidade"].sum())
+                st.metric("Produtos Vendidos", painel["quantidade"])
             with col4:
-                clientes_unicos = vendas["Usuario"].nunique()
-                st.metric("Clientes Únicos", clientes_unicos)
+                st.metric("Clientes Únicos", painel["clientes"])
 
             st.divider()
 
             # Análise temporal
             st.subheader("🕒 Análise Temporal", divider="green")
-            vendas['Data'] = pd.to_datetime(vendas['Data'])
-            vendas['Dia'] = vendas['Data'].dt.date
-
-            vendas_por_dia = vendas.groupby('Dia').agg({'Subtotal': 'sum', 'Quantidade': 'sum'}).reset_index()
+            vendas_por_dia = painel["por_dia"]
 
             tab1, tab2 = st.tabs(["Receita Diária", "Volume de Vendas"])
             with tab1:
@@ -520,10 +766,7 @@ elif pagina == "📊 Dashboard":
 
             # Produtos mais vendidos
             st.subheader("🏆 Produtos Mais Vendidos", divider="green")
-            top_produtos = vendas.groupby("Produto").agg({
-                "Quantidade": "sum",
-                "Subtotal": "sum"
-            }).nlargest(5, "Quantidade").reset_index()
+            top_produtos = painel["top_produtos"]
 
             col_graf1, col_graf2 = st.columns(2)
             with col_graf1:
@@ -533,14 +776,8 @@ elif pagina == "📊 Dashboard":
 
             # Clientes mais ativos
             st.subheader("👥 Clientes Mais Ativos", divider="green")
-            top_clientes = vendas.groupby("Usuario").agg({
-                "Subtotal": "sum",
-                "Quantidade": "sum",
-                "id": "count"
-            }).rename(columns={"id": "Compras"}).nlargest(5, "Subtotal")
-
             st.dataframe(
-                top_clientes,
+                painel["top_clientes"],
                 column_config={
                     "Subtotal": st.column_config.NumberColumn(format="R$ %.2f")
                 },
@@ -550,19 +787,45 @@ elif pagina == "📊 Dashboard":
 
             # Dados completos
             st.subheader("📝 Dados Completos", divider="green")
-            st.dataframe(
-                vendas.merge(produtos, left_on="Produto", right_on="Nome"),
-                column_config={
-                    "Data": st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm"),
-                    "Preço_x": st.column_config.NumberColumn("Preço Vendido", format="R$ %.2f"),
-                    "Preço_y": st.column_config.NumberColumn("Preço Atual", format="R$ %.2f"),
-                    "Subtotal": st.column_config.NumberColumn(format="R$ %.2f")
-                },
-                hide_index=True,
-                use_container_width=True
-            )
-        else:
-            st.info("Nenhum dado de vendas disponível ainda.")
+            dados_completos(painel["por_dia"])
+
+        mais_favoritados = favoritos.mais_favoritados(pool_leitura)
+        if not mais_favoritados.empty:
+            st.subheader("❤️ Produtos Mais Favoritados", divider="green")
+            st.bar_chart(mais_favoritados.set_index("Produto")["Favoritos"])
+
+        alertas = vendas.alertas_estoque(pool_leitura)
+        if not alertas.empty:
+            st.subheader("⚠️ Estoque Baixo", divider="green")
+            st.dataframe(alertas, hide_index=True, use_container_width=True)
+
+        with st.expander("🧵 Fila de tarefas"):
+            fila = tarefas.profundidade(pool)
+            col_f1, col_f2, col_f3, col_f4 = st.columns(4)
+            col_f1.metric("Pendentes", fila["pendente"])
+            col_f2.metric("Executando", fila["executando"])
+            col_f3.metric("Falharam", fila["falhou"])
+            col_f4.metric("Atraso", f"{fila['atraso_s']:.1f} s")
+            trabalhadores = obter_trabalhadores()
+            if trabalhadores is not None:
+                contagem = trabalhadores.estatisticas
+                st.caption(f"Neste processo: {contagem['executadas']} executadas, {contagem['falhas']} falhas "
+                           f"com nova tentativa, {contagem['desistencias']} desistências")
+            else:
+                st.caption("Tarefas executadas pelo serviço de escrita")
+            if fila["falhou"] and st.button("🔁 Reprocessar falhas"):
+                escrita.executar("reenfileirar_falhas")
+                acordar_trabalhadores()
+
+        cache = obter_cache_catalogo().estatisticas()
+        st.caption(f"Cache do catálogo: {cache['acertos']} acertos, {cache['falhas']} falhas "
+                   f"({cache['taxa_acerto']:.0%}) • versão {cache['versao']}")
+        espelho = obter_espelho()
+        if espelho is not None:
+            tamanho = espelho.tamanho()
+            st.caption(f"Espelho colunar ({espelho.motor}): {tamanho['arquivos']} arquivos, "
+                       f"{tamanho['bytes'] / 2**20:.1f} MiB, até a venda {tamanho['ultima_venda']} • "
+                       f"{espelho.estatisticas['falhas']} falhas")
     else:
         st.error("🚨 Acesso restrito - apenas administradores podem visualizar esta página")
 
@@ -573,3 +836,23 @@ st.markdown("""
     Unifolhas Cosméticos Naturais • © 2024 • Fase 5
 </div>
 """, unsafe_allow_html=True)
+
+registrar_execucao("app", INICIO_EXECUCAO)
+execucao = instrumentacao.finalizar()
+if st.session_state.usuario == "admin":
+    with st.sidebar.expander("⏱️ Tempo de execução"):
+        st.dataframe(pd.DataFrame(st.session_state.tempos_execucao[::-1]),
+                     hide_index=True, use_container_width=True)
+
+    # Só com UNIFOLHAS_PERFIL=1
+    if execucao is not None:
+        with st.sidebar.expander("🔬 Perfil do rerun"):
+            resumo = execucao.resumo()
+            st.markdown(f"**{resumo['ms']:.0f} ms** no total • {resumo['consultas']} consultas SQL "
+                        f"({resumo['ms_sql']:.0f} ms, {resumo['linhas']} linhas)")
+            st.dataframe(pd.DataFrame(resumo["secoes"], columns=["secao", "ms"]),
+                         hide_index=True, use_container_width=True)
+            st.dataframe(pd.DataFrame(execucao.consultas, columns=["sql", "ms", "linhas"])
+                         .sort_values("ms", ascending=False),
+                         column_config={"ms": st.column_config.NumberColumn(format="%.2f")},
+                         hide_index=True, use_container_width=True)
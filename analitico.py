@@ -0,0 +1,337 @@
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+import banco
+import tarefas
+import vendas
+
+# ========== CONFIGURAÇÕES ==========
+# UNIFOLHAS_ANALITICO=<pasta> liga o espelho colunar das vendas; sem ela (ou
+# sem pyarrow) o Dashboard usa os resumos do SQLite
+DIRETORIO = os.environ.get("UNIFOLHAS_ANALITICO", "")
+# "duckdb" ou "arrow"; vazio = duckdb se estiver instalado
+MOTOR = os.environ.get("UNIFOLHAS_ANALITICO_MOTOR", "")
+# Vendas lidas do SQLite por vez na sincronização
+LOTE = 100_000
+# Acima disso os arquivos de um mês são reescritos num só
+MAX_ARQUIVOS_MES = 8
+
+# id, segundos desde 1970, mês e as colunas copiadas como estão
+SQL_VENDAS = '''SELECT id, CAST(strftime('%s', Data) AS INTEGER), COALESCE(strftime('%Y-%m', Data), '0000-00'),
+                       Produto, produto_id, Quantidade, Preço, Subtotal, Usuario, usuario_id, pedido_id
+                FROM vendas
+                WHERE id > ? AND id <= ?
+                ORDER BY id'''
+
+
+def disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _motor_padrao():
+    if MOTOR:
+        return MOTOR
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return "arrow"
+    return "duckdb"
+
+
+def _esquema():
+    import pyarrow as pa
+
+    return pa.schema([("id", pa.int64()), ("Data", pa.timestamp("s")), ("Dia", pa.date32()),
+                      ("Produto", pa.string()), ("produto_id", pa.int64()), ("Quantidade", pa.int64()),
+                      ("Preço", pa.float64()), ("Subtotal", pa.float64()), ("Usuario", pa.string()),
+                      ("usuario_id", pa.int64()), ("pedido_id", pa.int64())])
+
+
+def _data(valor):
+    if valor is None or isinstance(valor, datetime.date):
+        return valor
+    return datetime.date.fromisoformat(str(valor)[:10])
+
+
+# ========== ESPELHO COLUNAR ==========
+class Espelho:
+    """Cópia das vendas em Parquet, um diretório por mês, para o Dashboard.
+
+    `sincronizar` só acrescenta as vendas com id acima da marca d'água (a
+    tabela vendas é só de inserção e o SQLite grava os ids em ordem). Cada
+    lote vira um arquivo `<primeiro id>-<último id>.parquet` no mês; a marca
+    só avança depois dos arquivos gravados, e arquivos acima dela são restos
+    de uma sincronização interrompida. As consultas abrem só os meses do
+    período e agregam vetorizado (DuckDB ou pyarrow.compute).
+    """
+
+    def __init__(self, diretorio, motor=None):
+        self.diretorio = diretorio
+        self.pasta = os.path.join(diretorio, "vendas")
+        self.motor = motor or _motor_padrao()
+        self._lock = threading.Lock()
+        self.estatisticas = {"sincronizadas": 0, "consultas": 0, "falhas": 0, "ultimo_erro": None}
+
+    # ---------- marca d'água ----------
+    def marca(self):
+        try:
+            with open(os.path.join(self.diretorio, "marca.json"), encoding="utf-8") as arquivo:
+                return json.load(arquivo)["ultima_venda"]
+        except FileNotFoundError:
+            return 0
+
+    def _gravar_marca(self, ultima):
+        caminho = os.path.join(self.diretorio, "marca.json")
+        with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+            json.dump({"ultima_venda": ultima, "atualizado_em": time.time()}, arquivo)
+        os.replace(caminho + ".tmp", caminho)
+
+    # ---------- arquivos ----------
+    def _arquivos_do_mes(self, mes):
+        pasta = os.path.join(self.pasta, f"mes={mes}")
+        try:
+            nomes = sorted(nome for nome in os.listdir(pasta) if nome.endswith(".parquet"))
+        except FileNotFoundError:
+            return []
+        arquivos = []
+        for nome in nomes:
+            primeiro, ultimo = nome[:-len(".parquet")].split("-")
+            arquivos.append((int(primeiro), int(ultimo), os.path.join(pasta, nome)))
+        return arquivos
+
+    def meses(self):
+        try:
+            return sorted(nome[len("mes="):] for nome in os.listdir(self.pasta) if nome.startswith("mes="))
+        except FileNotFoundError:
+            return []
+
+    def arquivos(self, inicio=None, fim=None):
+        """Arquivos Parquet dos meses que cruzam o período."""
+        de = inicio.strftime("%Y-%m") if inicio else ""
+        ate = fim.strftime("%Y-%m") if fim else "9999-99"
+        return [caminho for mes in self.meses() if de <= mes <= ate
+                for _, _, caminho in self._arquivos_do_mes(mes)]
+
+    def _limpar(self, marca):
+        # Restos de sincronização (acima da marca) ou de compactação
+        # interrompida (faixa de ids contida na de outro arquivo do mês)
+        for mes in self.meses():
+            arquivos = self._arquivos_do_mes(mes)
+            for primeiro, ultimo, caminho in arquivos:
+                contido = any(p <= primeiro and ultimo <= u and (p, u) != (primeiro, ultimo)
+                              for p, u, _ in arquivos)
+                if ultimo > marca or contido:
+                    os.remove(caminho)
+
+    def _gravar(self, mes, tabela):
+        import pyarrow.parquet as pq
+
+        pasta = os.path.join(self.pasta, f"mes={mes}")
+        os.makedirs(pasta, exist_ok=True)
+        ids = tabela.column("id")
+        caminho = os.path.join(pasta, f"{ids[0].as_py():012d}-{ids[-1].as_py():012d}.parquet")
+        pq.write_table(tabela, caminho + ".tmp")
+        os.replace(caminho + ".tmp", caminho)
+
+    def _compactar(self, mes):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arquivos = self._arquivos_do_mes(mes)
+        if len(arquivos) <= MAX_ARQUIVOS_MES:
+            return
+        self._gravar(mes, pa.concat_tables([pq.read_table(caminho, schema=_esquema())
+                                            for _, _, caminho in arquivos]))
+        for _, _, caminho in arquivos:
+            os.remove(caminho)
+
+    @staticmethod
+    def _tabela(linhas):
+        import pyarrow as pa
+
+        colunas = list(zip(*linhas))
+        data = pa.array(colunas[1], pa.int64()).cast(pa.timestamp("s"))
+        return pa.Table.from_arrays(
+            [pa.array(colunas[0], pa.int64()), data, data.cast(pa.date32()),
+             *(pa.array(valores, tipo) for valores, tipo in zip(
+                 colunas[3:], (pa.string(), pa.int64(), pa.int64(), pa.float64(), pa.float64(),
+                               pa.string(), pa.int64(), pa.int64())))],
+            schema=_esquema())
+
+    # ---------- sincronização ----------
+    def sincronizar(self, pool, lote=LOTE):
+        """Acrescenta as vendas novas do SQLite e devolve quantas foram."""
+        with pool.conexao() as conn:
+            maxima = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+        if maxima == self.marca():
+            return 0
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        # Vários reruns (threads) e vários processos podem tentar juntos
+        with self._lock, banco.trava_arquivo(os.path.join(self.diretorio, "sincronizar.lock")):
+            marca = self.marca()
+            if maxima < marca:
+                # Banco recriado ou trocado: o espelho não corresponde mais
+                shutil.rmtree(self.pasta, ignore_errors=True)
+                marca = 0
+                self._gravar_marca(0)
+            self._limpar(marca)
+            if maxima <= marca:
+                return 0
+
+            tocados = set()
+            with pool.conexao() as conn:
+                cursor = conn.execute(SQL_VENDAS, (marca, maxima))
+                while True:
+                    linhas = cursor.fetchmany(lote)
+                    if not linhas:
+                        break
+                    tabela = self._tabela(linhas)
+                    por_mes = {}
+                    for posicao, linha in enumerate(linhas):
+                        por_mes.setdefault(linha[2], []).append(posicao)
+                    for mes, posicoes in por_mes.items():
+                        self._gravar(mes, tabela.take(posicoes))
+                    tocados.update(por_mes)
+            for mes in tocados:
+                self._compactar(mes)
+            self._gravar_marca(maxima)
+        self.estatisticas["sincronizadas"] += maxima - marca
+        return maxima - marca
+
+    def reconstruir(self, pool, lote=LOTE):
+        """Apaga o espelho e copia todas as vendas de novo."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        with self._lock, banco.trava_arquivo(os.path.join(self.diretorio, "sincronizar.lock")):
+            shutil.rmtree(self.pasta, ignore_errors=True)
+            try:
+                os.remove(os.path.join(self.diretorio, "marca.json"))
+            except FileNotFoundError:
+                pass
+        return self.sincronizar(pool, lote)
+
+    def tamanho(self):
+        arquivos = self.arquivos()
+        return {"meses": len(self.meses()), "arquivos": len(arquivos),
+                "bytes": sum(os.path.getsize(caminho) for caminho in arquivos),
+                "ultima_venda": self.marca()}
+
+    # ---------- consultas ----------
+    def painel(self, inicio=None, fim=None):
+        """Mesmo formato de `vendas.painel_vendas`, calculado sobre o Parquet."""
+        inicio, fim = _data(inicio), _data(fim)
+        arquivos = self.arquivos(inicio, fim)
+        self.estatisticas["consultas"] += 1
+        if not arquivos:
+            return _painel(self.motor, 0, 0.0, 0, 0,
+                           pd.DataFrame(columns=["Dia", "Subtotal", "Quantidade"]),
+                           pd.DataFrame(columns=["Produto", "Quantidade", "Subtotal"]),
+                           pd.DataFrame(columns=["Usuario", "Subtotal", "Quantidade", "Compras"]))
+        if self.motor == "duckdb":
+            return self._painel_duckdb(arquivos, inicio, fim)
+        return self._painel_arrow(arquivos, inicio, fim)
+
+    def _painel_duckdb(self, arquivos, inicio, fim):
+        import duckdb
+
+        # Datas já validadas por _data(); uma view não aceita parâmetros
+        condicoes = []
+        if inicio:
+            condicoes.append(f"Dia >= DATE '{inicio.isoformat()}'")
+        if fim:
+            condicoes.append(f"Dia <= DATE '{fim.isoformat()}'")
+        where = (" WHERE " + " AND ".join(condicoes)) if condicoes else ""
+        lista = ", ".join("'" + caminho.replace("'", "''") + "'" for caminho in arquivos)
+        conn = duckdb.connect()
+        try:
+            conn.execute(f'''CREATE TEMP VIEW v AS
+                             SELECT Dia, Produto, Usuario, Quantidade, Subtotal
+                             FROM read_parquet([{lista}]){where}''')
+            n_vendas, receita, quantidade, clientes = conn.execute(
+                '''SELECT COUNT(*), COALESCE(SUM(Subtotal), 0), CAST(COALESCE(SUM(Quantidade), 0) AS BIGINT),
+                          COUNT(DISTINCT Usuario) FROM v''').fetchone()
+            por_dia = conn.execute('''SELECT CAST(Dia AS VARCHAR) AS Dia, SUM(Subtotal) AS Subtotal,
+                                             CAST(SUM(Quantidade) AS BIGINT) AS Quantidade
+                                      FROM v GROUP BY Dia ORDER BY Dia''').df()
+            top_produtos = conn.execute('''SELECT Produto, CAST(SUM(Quantidade) AS BIGINT) AS Quantidade,
+                                                  SUM(Subtotal) AS Subtotal
+                                           FROM v GROUP BY Produto
+                                           ORDER BY Quantidade DESC LIMIT 5''').df()
+            top_clientes = conn.execute('''SELECT Usuario, SUM(Subtotal) AS Subtotal,
+                                                  CAST(SUM(Quantidade) AS BIGINT) AS Quantidade, COUNT(*) AS Compras
+                                           FROM v GROUP BY Usuario
+                                           ORDER BY Subtotal DESC LIMIT 5''').df()
+        finally:
+            conn.close()
+        return _painel("duckdb", n_vendas, receita, quantidade, clientes, por_dia, top_produtos, top_clientes)
+
+    def _painel_arrow(self, arquivos, inicio, fim):
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        filtro = None
+        if inicio:
+            filtro = ds.field("Dia") >= inicio
+        if fim:
+            filtro = ds.field("Dia") <= fim if filtro is None else filtro & (ds.field("Dia") <= fim)
+        tabela = ds.dataset(arquivos, schema=_esquema(), format="parquet").to_table(
+            columns=["Dia", "Produto", "Usuario", "Quantidade", "Subtotal"], filter=filtro)
+
+        por_dia = (tabela.group_by("Dia").aggregate([("Subtotal", "sum"), ("Quantidade", "sum")])
+                   .sort_by("Dia").to_pandas())
+        por_dia.columns = [coluna.removesuffix("_sum") for coluna in por_dia.columns]
+        por_dia = por_dia[["Dia", "Subtotal", "Quantidade"]].astype({"Dia": str})
+
+        top_produtos = (tabela.group_by("Produto").aggregate([("Quantidade", "sum"), ("Subtotal", "sum")])
+                        .sort_by([("Quantidade_sum", "descending")]).slice(0, 5).to_pandas()
+                        .rename(columns={"Quantidade_sum": "Quantidade", "Subtotal_sum": "Subtotal"}))
+        top_clientes = (tabela.group_by("Usuario")
+                        .aggregate([("Subtotal", "sum"), ("Quantidade", "sum"), ("Quantidade", "count")])
+                        .sort_by([("Subtotal_sum", "descending")]).slice(0, 5).to_pandas()
+                        .rename(columns={"Subtotal_sum": "Subtotal", "Quantidade_sum": "Quantidade",
+                                         "Quantidade_count": "Compras"}))
+        return _painel("arrow", tabela.num_rows, pc.sum(tabela["Subtotal"]).as_py() or 0.0,
+                       pc.sum(tabela["Quantidade"]).as_py() or 0, pc.count_distinct(tabela["Usuario"]).as_py(),
+                       por_dia, top_produtos[["Produto", "Quantidade", "Subtotal"]],
+                       top_clientes[["Usuario", "Subtotal", "Quantidade", "Compras"]])
+
+
+def _painel(motor, n_vendas, receita, quantidade, clientes, por_dia, top_produtos, top_clientes):
+    return {
+        "motor": motor,
+        "vendas": n_vendas,
+        "receita": receita,
+        "quantidade": quantidade,
+        "clientes": clientes,
+        "por_dia": por_dia,
+        "top_produtos": top_produtos,
+        "top_clientes": top_clientes,
+    }
+
+
+@tarefas.tarefa("espelho")
+def sincronizar_espelho(pool, dados):
+    # Periódica: mantém o espelho em dia fora do rerun do Dashboard
+    return Espelho(dados["diretorio"]).sincronizar(pool)
+
+
+def painel_vendas(pool, espelho, inicio=None, fim=None):
+    """Painel do Dashboard pelo espelho colunar; sem ele, ou se falhar, pelo SQLite."""
+    if espelho is not None:
+        try:
+            espelho.sincronizar(pool)
+            return espelho.painel(inicio, fim)
+        except Exception as e:
+            espelho.estatisticas["falhas"] += 1
+            espelho.estatisticas["ultimo_erro"] = repr(e)
+    return vendas.painel_vendas(pool, inicio, fim)
@@ -0,0 +1,645 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager, nullcontext
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ========== CONFIGURAÇÕES DO BANCO ==========
+CAMINHO_DB = os.environ.get("UNIFOLHAS_DB", "unifolhas.db")
+
+# Tempo máximo (ms) que uma conexão espera por um lock antes de falhar
+BUSY_TIMEOUT_MS = 5000
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+# Chamadas com cada conexão nova do pool (instrumentação e benchmarks)
+AO_ABRIR = []
+
+
+# ========== POOL DE CONEXÕES ==========
+class PoolConexoes:
+    """Pool de conexões SQLite compartilhado pelo processo.
+
+    O Streamlit executa cada rerun numa thread nova, então as conexões não
+    ficam presas a uma thread: cada thread pega uma conexão emprestada
+    enquanto trabalha e a devolve ao final. Chamadas aninhadas na mesma
+    thread reaproveitam a conexão já emprestada.
+    """
+
+    def __init__(self, caminho=CAMINHO_DB, tamanho=8, fabrica=sqlite3.Connection):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.fabrica = fabrica
+        self._livres = queue.LifoQueue()
+        self._abertas = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.caminho,
+                               timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None,
+                               check_same_thread=False,
+                               factory=self.fabrica)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        for funcao in AO_ABRIR:
+            funcao(conn)
+        return conn
+
+    def _emprestar(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._abertas < self.tamanho:
+                self._abertas += 1
+                criar = True
+            else:
+                criar = False
+        if criar:
+            try:
+                return self._abrir()
+            except Exception:
+                with self._lock:
+                    self._abertas -= 1
+                raise
+        return self._livres.get()
+
+    @contextmanager
+    def conexao(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.profundidade += 1
+            try:
+                yield conn
+            finally:
+                self._local.profundidade -= 1
+            return
+
+        conn = self._emprestar()
+        self._local.conn = conn
+        self._local.profundidade = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.profundidade = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._livres.put(conn)
+
+    @contextmanager
+    def transacao(self, imediata=False):
+        with self.conexao() as conn:
+            if conn.in_transaction:
+                # Já estamos dentro de uma transação desta thread
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    def fechar(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._livres.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._abertas -= 1
+
+
+# ========== LEITURA SOMENTE ==========
+# Leituras do Catálogo e do Dashboard podem ir por um pool separado, que não
+# escreve: o próprio banco aberto com mode=ro (enxerga cada commit pelo WAL)
+# ou uma réplica copiada de tempos em tempos, aberta com immutable=1 (sem
+# locks nem WAL; defasada até a próxima cópia).
+CAMINHO_REPLICA = os.environ.get("UNIFOLHAS_REPLICA", "")
+# Intervalo (s) entre cópias da réplica
+INTERVALO_REPLICA = int(os.environ.get("UNIFOLHAS_REPLICA_INTERVALO", 30))
+
+PRAGMAS_LEITURA = (
+    "PRAGMA query_only=ON",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+)
+
+
+class PoolLeitura(PoolConexoes):
+    """Pool de conexões só de leitura (mesma interface de PoolConexoes).
+
+    Com `imutavel=True` o arquivo é uma réplica substituída inteira por
+    `copiar_replica`: a conexão aberta antes da troca continua lendo a cópia
+    antiga, então é fechada e reaberta quando o arquivo muda.
+    """
+
+    def __init__(self, caminho=CAMINHO_DB, tamanho=8, fabrica=sqlite3.Connection, imutavel=False):
+        super().__init__(caminho, tamanho, fabrica)
+        self.imutavel = imutavel
+        self._arquivos = {}
+
+    def _identidade(self):
+        estado = os.stat(self.caminho)
+        return estado.st_ino, estado.st_mtime_ns
+
+    def _abrir(self):
+        parametro = "immutable=1" if self.imutavel else "mode=ro"
+        conn = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(self.caminho))}?{parametro}",
+                               uri=True,
+                               timeout=BUSY_TIMEOUT_MS / 1000,
+                               isolation_level=None,
+                               check_same_thread=False,
+                               factory=self.fabrica)
+        for pragma in PRAGMAS_LEITURA:
+            conn.execute(pragma)
+        for funcao in AO_ABRIR:
+            funcao(conn)
+        if self.imutavel:
+            self._arquivos[id(conn)] = self._identidade()
+        return conn
+
+    def _emprestar(self):
+        conn = super()._emprestar()
+        if self.imutavel and self._arquivos.get(id(conn)) != self._identidade():
+            # Réplica trocada desde que esta conexão abriu
+            self._arquivos.pop(id(conn), None)
+            conn.close()
+            conn = self._abrir()
+        return conn
+
+
+def copiar_replica(pool, destino):
+    """Copia o banco de `pool` para `destino` e troca o arquivo de uma vez.
+
+    A cópia usa a API de backup do SQLite sobre uma leitura do WAL, então
+    não bloqueia quem está gravando; devolve o tamanho em bytes.
+    """
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    copia = sqlite3.connect(temporario)
+    try:
+        with pool.conexao() as conn:
+            conn.backup(copia)
+        # A réplica é um arquivo só, lido com immutable=1
+        copia.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        copia.close()
+    os.replace(temporario, destino)
+    return os.path.getsize(destino)
+
+
+# ========== ESQUEMA E DADOS INICIAIS ==========
+PRODUTOS_EXEMPLO = [
+    ("Shampoo Sólido", 42.50, 15, "Higiene", "Shampoo livre de sulfatos em barra", "https://via.placeholder.com/300?text=Shampoo"),
+    ("Condicionador Natural", 45.75, 20, "Higiene", "Condicionador com óleo de argan", "https://via.placeholder.com/300?text=Condicionador"),
+    ("Polpa Hidratante", 56.90, 37, "Tratamento", "Hidratante corporal com manteiga de karité", "https://via.placeholder.com/300?text=Polpa+Hidratante"),
+    ("Sabonete Líquido", 47.90, 17, "Higiene", "Sabonete vegano com extrato de camomila", "https://via.placeholder.com/300?text=Sabonete"),
+    ("Polpa Esfoliante", 57.10, 28, "Tratamento", "Esfoliante natural com cristais de açúcar", "https://via.placeholder.com/300?text=Polpa+Esfoliante")
+]
+
+
+def _adicionar_coluna(conn, tabela, coluna, definicao):
+    # Bancos criados antes das migrações podem já ter a coluna
+    colunas = {linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")}
+    if coluna not in colunas:
+        conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+
+# ========== MIGRAÇÕES ==========
+# Cada migração roda uma única vez; a versão do esquema fica em PRAGMA
+# user_version. Todo DDL é idempotente para aceitar bancos criados pelo
+# antigo init_db (user_version = 0 com as tabelas já existentes).
+def _migracao_esquema_inicial(conn):
+    # Tabela de vendas
+    conn.execute('''CREATE TABLE IF NOT EXISTS vendas
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     Produto TEXT,
+                     Quantidade INTEGER,
+                     Preço REAL,
+                     Subtotal REAL,
+                     Usuario TEXT,
+                     Data TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Tabela de usuários
+    conn.execute('''CREATE TABLE IF NOT EXISTS usuarios
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     nome TEXT UNIQUE,
+                     email TEXT,
+                     favoritos TEXT)''')
+
+    # Tabela de produtos
+    conn.execute('''CREATE TABLE IF NOT EXISTS produtos
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     Nome TEXT,
+                     Preço REAL,
+                     Estoque INTEGER,
+                     Categoria TEXT,
+                     Descricao TEXT,
+                     Imagem TEXT)''')
+
+
+def _migracao_pedidos(conn):
+    # Cabeçalho dos pedidos; cada linha de vendas aponta para um pedido
+    conn.execute('''CREATE TABLE IF NOT EXISTS pedidos
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     Usuario TEXT,
+                     Itens INTEGER,
+                     Total REAL,
+                     Data TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    _adicionar_coluna(conn, "vendas", "pedido_id", "INTEGER REFERENCES pedidos(id)")
+
+
+def _migracao_catalogo(conn):
+    # Índices usados pelos filtros e ordenações do Catálogo
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_categoria_preco ON produtos (Categoria, Preço)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos (Preço)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_estoque ON produtos (Estoque)")
+
+    # Versão do catálogo: incrementada a cada alteração em produtos
+    conn.execute('''CREATE TABLE IF NOT EXISTS catalogo_versao
+                    (id INTEGER PRIMARY KEY CHECK (id = 1),
+                     versao INTEGER NOT NULL)''')
+    conn.execute("INSERT OR IGNORE INTO catalogo_versao (id, versao) VALUES (1, 0)")
+    for evento in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS produtos_versao_{evento.lower()}
+                         AFTER {evento} ON produtos
+                         BEGIN
+                             UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1;
+                         END''')
+
+
+def _migracao_busca(conn):
+    # Busca textual (FTS5) espelhando Nome, Descricao e Categoria.
+    # remove_diacritics faz "solido" encontrar "Sólido".
+    fts_existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'produtos_fts'").fetchone()
+    conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5
+                    (Nome, Descricao, Categoria,
+                     content='produtos', content_rowid='id',
+                     tokenize='unicode61 remove_diacritics 2',
+                     prefix='2 3')''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS produtos_fts_insert AFTER INSERT ON produtos
+                    BEGIN
+                        INSERT INTO produtos_fts (rowid, Nome, Descricao, Categoria)
+                        VALUES (new.id, new.Nome, new.Descricao, new.Categoria);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS produtos_fts_delete AFTER DELETE ON produtos
+                    BEGIN
+                        INSERT INTO produtos_fts (produtos_fts, rowid, Nome, Descricao, Categoria)
+                        VALUES ('delete', old.id, old.Nome, old.Descricao, old.Categoria);
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS produtos_fts_update
+                    AFTER UPDATE OF Nome, Descricao, Categoria ON produtos
+                    BEGIN
+                        INSERT INTO produtos_fts (produtos_fts, rowid, Nome, Descricao, Categoria)
+                        VALUES ('delete', old.id, old.Nome, old.Descricao, old.Categoria);
+                        INSERT INTO produtos_fts (rowid, Nome, Descricao, Categoria)
+                        VALUES (new.id, new.Nome, new.Descricao, new.Categoria);
+                    END''')
+    if not fts_existia:
+        conn.execute("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')")
+
+
+def _migracao_resumos(conn):
+    # Resumos do Dashboard, mantidos incrementalmente a partir de vendas
+    conn.execute('''CREATE TABLE IF NOT EXISTS resumo_vendas_dia
+                    (Dia TEXT PRIMARY KEY,
+                     Vendas INTEGER NOT NULL,
+                     Quantidade INTEGER NOT NULL,
+                     Receita REAL NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS resumo_vendas_produto
+                    (Produto TEXT PRIMARY KEY,
+                     Vendas INTEGER NOT NULL,
+                     Quantidade INTEGER NOT NULL,
+                     Receita REAL NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS resumo_vendas_usuario
+                    (Usuario TEXT PRIMARY KEY,
+                     Compras INTEGER NOT NULL,
+                     Quantidade INTEGER NOT NULL,
+                     Receita REAL NOT NULL)''')
+    # Última venda (id) já somada aos resumos
+    conn.execute('''CREATE TABLE IF NOT EXISTS resumo_marca_d_agua
+                    (id INTEGER PRIMARY KEY CHECK (id = 1),
+                     ultima_venda INTEGER NOT NULL)''')
+    conn.execute("INSERT OR IGNORE INTO resumo_marca_d_agua (id, ultima_venda) VALUES (1, 0)")
+
+
+def _migracao_chaves_vendas(conn):
+    # vendas passa a referenciar produtos e usuários por id
+    _adicionar_coluna(conn, "vendas", "produto_id", "INTEGER REFERENCES produtos(id)")
+    _adicionar_coluna(conn, "vendas", "usuario_id", "INTEGER REFERENCES usuarios(id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_produto_id ON vendas (produto_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_usuario_data ON vendas (usuario_id, Data)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (Data)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos (Nome)")
+
+    # Quem só fez "Entrar" (sem cadastro) também comprou: cria o usuário
+    conn.execute('''INSERT OR IGNORE INTO usuarios (nome)
+                    SELECT DISTINCT Usuario FROM vendas WHERE Usuario IS NOT NULL''')
+
+
+def _preencher_chaves_vendas(conn, inicio, fim):
+    conn.execute('''UPDATE vendas
+                    SET produto_id = COALESCE(produto_id,
+                                              (SELECT id FROM produtos WHERE Nome = vendas.Produto)),
+                        usuario_id = COALESCE(usuario_id,
+                                              (SELECT id FROM usuarios WHERE nome = vendas.Usuario))
+                    WHERE id > ? AND id <= ?
+                      AND (produto_id IS NULL OR usuario_id IS NULL)''', (inicio, fim))
+
+
+def _migracao_sessoes(conn):
+    # Estado de sessão (carrinho etc.) compartilhado entre processos do app
+    conn.execute('''CREATE TABLE IF NOT EXISTS sessoes
+                    (chave TEXT PRIMARY KEY,
+                     dados BLOB NOT NULL,
+                     atualizado_em REAL NOT NULL) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_atualizado_em ON sessoes(atualizado_em)")
+
+
+def _migracao_favoritos(conn):
+    # Favoritos saem da string separada por vírgulas em usuarios.favoritos
+    # (a coluna fica, sem uso, para não reescrever a tabela)
+    conn.execute('''CREATE TABLE IF NOT EXISTS favoritos
+                    (usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+                     produto_id INTEGER NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                     PRIMARY KEY (usuario_id, produto_id)) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_favoritos_produto ON favoritos(produto_id)")
+    legados = conn.execute('''SELECT id, favoritos FROM usuarios
+                              WHERE LENGTH(favoritos) > 0''').fetchall()
+    for usuario_id, nomes in legados:
+        conn.executemany('''INSERT OR IGNORE INTO favoritos (usuario_id, produto_id)
+                            SELECT ?, id FROM produtos WHERE Nome = ?''',
+                         [(usuario_id, nome) for nome in nomes.split(",")])
+
+
+def _migracao_sku(conn):
+    # Código do fornecedor; chave das importações em massa (upsert por SKU)
+    _adicionar_coluna(conn, "produtos", "sku", "TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_sku ON produtos (sku)")
+    # Índices e triggers retirados durante uma carga em massa, até serem recriados
+    conn.execute('''CREATE TABLE IF NOT EXISTS ddl_adiada
+                    (nome TEXT PRIMARY KEY,
+                     tabela TEXT NOT NULL,
+                     sql TEXT NOT NULL)''')
+
+
+def _migracao_tarefas(conn):
+    # Fila de tarefas em segundo plano (módulo tarefas); chave = idempotência
+    conn.execute('''CREATE TABLE IF NOT EXISTS tarefas
+                    (id INTEGER PRIMARY KEY,
+                     tipo TEXT NOT NULL,
+                     chave TEXT UNIQUE,
+                     dados TEXT,
+                     estado TEXT NOT NULL DEFAULT 'pendente',
+                     tentativas INTEGER NOT NULL DEFAULT 0,
+                     max_tentativas INTEGER NOT NULL,
+                     disponivel_em REAL NOT NULL,
+                     criado_em REAL NOT NULL,
+                     iniciado_em REAL,
+                     concluido_em REAL,
+                     erro TEXT)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas (estado, disponivel_em)")
+    # Gravadas pelas tarefas pós-checkout
+    conn.execute('''CREATE TABLE IF NOT EXISTS alertas_estoque
+                    (produto_id INTEGER PRIMARY KEY,
+                     Estoque INTEGER NOT NULL,
+                     criado_em REAL NOT NULL)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS confirmacoes_pedido
+                    (pedido_id INTEGER PRIMARY KEY,
+                     Usuario TEXT,
+                     Itens INTEGER,
+                     Total REAL,
+                     criado_em REAL NOT NULL)''')
+
+
+def _migracao_reservas(conn):
+    # Estoque segurado por carrinhos (módulo reservas) e o total por produto,
+    # mantido junto com as reservas para o disponível sair sem SUM
+    conn.execute('''CREATE TABLE IF NOT EXISTS reservas
+                    (sessao TEXT NOT NULL,
+                     produto_id INTEGER NOT NULL,
+                     quantidade INTEGER NOT NULL,
+                     expira_em REAL NOT NULL,
+                     PRIMARY KEY (sessao, produto_id)) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservas_expira_em ON reservas (expira_em)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reservas_produto ON reservas (produto_id, expira_em)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS reservas_total
+                    (produto_id INTEGER PRIMARY KEY,
+                     quantidade INTEGER NOT NULL)''')
+
+
+def _migracao_recomendacoes(conn):
+    # Índice de "quem comprou também comprou" (módulo recomendacoes): os K
+    # vizinhos de cada produto, lidos pela chave primária
+    conn.execute('''CREATE TABLE IF NOT EXISTS recomendacoes
+                    (produto_id INTEGER NOT NULL,
+                     posicao INTEGER NOT NULL,
+                     vizinho_id INTEGER NOT NULL,
+                     pontuacao REAL NOT NULL,
+                     PRIMARY KEY (produto_id, posicao)) WITHOUT ROWID''')
+    # Pedidos e favoritos de cada produto: denominador das pontuações e
+    # popularidade para completar os destaques
+    conn.execute('''CREATE TABLE IF NOT EXISTS recomendacoes_ocorrencias
+                    (produto_id INTEGER PRIMARY KEY,
+                     pedidos INTEGER NOT NULL,
+                     favoritos INTEGER NOT NULL,
+                     peso REAL NOT NULL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recomendacoes_ocorrencias_peso ON recomendacoes_ocorrencias (peso)")
+    # Última venda (id) já contada no índice
+    conn.execute('''CREATE TABLE IF NOT EXISTS recomendacoes_marca
+                    (id INTEGER PRIMARY KEY CHECK (id = 1),
+                     ultima_venda INTEGER NOT NULL,
+                     reconstruido_em REAL)''')
+    conn.execute("INSERT OR IGNORE INTO recomendacoes_marca (id, ultima_venda) VALUES (1, 0)")
+    # Itens de cada pedido, para montar as cestas na atualização incremental
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_pedido ON vendas (pedido_id, produto_id)")
+
+
+def _migracao_versao_catalogo(conn):
+    # Só colunas do catálogo mudam a versão: baixas de Estoque a cada venda
+    # descartavam o CacheCatalogo (que não guarda o estoque) sem necessidade
+    conn.execute("DROP TRIGGER IF EXISTS produtos_versao_update")
+    conn.execute('''CREATE TRIGGER produtos_versao_update
+                    AFTER UPDATE OF Nome, Preço, Categoria, Descricao, Imagem, sku ON produtos
+                    BEGIN
+                        UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1;
+                    END''')
+
+
+# (versão, DDL, preenchimento em lotes ou None)
+MIGRACOES = (
+    (1, _migracao_esquema_inicial, None),
+    (2, _migracao_pedidos, None),
+    (3, _migracao_catalogo, None),
+    (4, _migracao_busca, None),
+    (5, _migracao_resumos, None),
+    (6, _migracao_chaves_vendas, ("vendas", _preencher_chaves_vendas)),
+    (7, _migracao_sessoes, None),
+    (8, _migracao_favoritos, None),
+    (9, _migracao_sku, None),
+    (10, _migracao_tarefas, None),
+    (11, _migracao_reservas, None),
+    (12, _migracao_recomendacoes, None),
+    (13, _migracao_versao_catalogo, None),
+)
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+TAMANHO_LOTE_MIGRACAO = 10_000
+
+
+def versao_esquema(pool):
+    with pool.conexao() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def esperar_esquema(pool, prazo=60.0, intervalo=0.2):
+    """Espera outro processo deixar o esquema em VERSAO_ESQUEMA; devolve a versão.
+
+    Para quem não grava (os processos do app atrás do serviço de escrita,
+    que migra e semeia ao subir): só lê PRAGMA user_version. Levanta
+    RuntimeError se o prazo acabar antes.
+    """
+    limite = time.monotonic() + prazo
+    while (versao := versao_esquema(pool)) < VERSAO_ESQUEMA:
+        if time.monotonic() > limite:
+            raise RuntimeError(f"esquema na versão {versao}, esperada {VERSAO_ESQUEMA}")
+        time.sleep(intervalo)
+    return versao
+
+
+def migrar(pool, lote=TAMANHO_LOTE_MIGRACAO):
+    """Aplica as migrações pendentes e devolve a versão final do esquema.
+
+    Com o banco em dia, custa um único PRAGMA user_version. O preenchimento
+    de dados roda em lotes, cada um na sua transação, para não segurar o lock
+    de escrita; a versão só avança no fim, então uma migração interrompida é
+    retomada do ponto em que parou na próxima inicialização.
+    """
+    versao = versao_esquema(pool)
+    for numero, ddl, preenchimento in MIGRACOES:
+        if numero <= versao:
+            continue
+        with pool.transacao(imediata=True) as conn:
+            ddl(conn)
+
+        if preenchimento:
+            tabela, preencher = preenchimento
+            with pool.conexao() as conn:
+                maximo = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {tabela}").fetchone()[0]
+            for inicio in range(0, maximo, lote):
+                with pool.transacao(imediata=True) as conn:
+                    preencher(conn, inicio, inicio + lote)
+
+        with pool.transacao(imediata=True) as conn:
+            # PRAGMA não aceita parâmetro; numero vem de MIGRACOES
+            conn.execute(f"PRAGMA user_version = {numero}")
+        versao = numero
+    return versao
+
+
+# ========== CARGA EM MASSA ==========
+def adiar_indices(pool, tabela, manter=()):
+    """Remove índices e triggers de `tabela` antes de uma carga em massa.
+
+    O DDL de cada um fica guardado em `ddl_adiada`, na mesma transação que o
+    remove, e `restaurar_indices` recria tudo no fim. Se o processo morrer no
+    meio da carga, a próxima importação (ou `python cli.py restaurar-indices`)
+    recria. Devolve quantos saíram.
+    """
+    with pool.transacao(imediata=True) as conn:
+        objetos = conn.execute('''SELECT type, name, sql FROM sqlite_master
+                                  WHERE tbl_name = ? AND type IN ('index', 'trigger')
+                                    AND sql IS NOT NULL''', (tabela,)).fetchall()
+        objetos = [objeto for objeto in objetos if objeto[1] not in manter]
+        for tipo, nome, sql in objetos:
+            conn.execute("INSERT OR REPLACE INTO ddl_adiada (nome, tabela, sql) VALUES (?, ?, ?)",
+                         (nome, tabela, sql))
+            conn.execute(f"DROP {tipo.upper()} {nome}")
+    return len(objetos)
+
+
+def restaurar_indices(pool):
+    """Recria o que `adiar_indices` removeu; devolve quantos objetos voltaram."""
+    with pool.transacao(imediata=True) as conn:
+        adiados = conn.execute("SELECT nome, tabela, sql FROM ddl_adiada").fetchall()
+        if not adiados:
+            return 0
+        for _, _, sql in adiados:
+            conn.execute(sql)
+        conn.execute("DELETE FROM ddl_adiada")
+        if any(tabela == "produtos" for _, tabela, _ in adiados):
+            # Sem os triggers, a busca e a versão do catálogo não acompanharam a carga
+            conn.execute("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')")
+            conn.execute("UPDATE catalogo_versao SET versao = versao + 1 WHERE id = 1")
+    return len(adiados)
+
+
+# ========== INICIALIZAÇÃO ==========
+@contextmanager
+def trava_arquivo(caminho):
+    """Lock exclusivo entre processos (flock em `caminho`).
+
+    Sem fcntl (Windows) não trava nada: quem usa precisa tolerar execução
+    concorrente, como as migrações com BEGIN IMMEDIATE.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(caminho, "a") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _trava_inicializacao(caminho):
+    # Processos subindo juntos: um migra e semeia, os outros esperam e acham
+    # tudo pronto
+    if caminho == ":memory:":
+        return nullcontext()
+    return trava_arquivo(f"{caminho}.init.lock")
+
+
+def init_db(pool, exemplos=True):
+    """Prepara o banco: migrações pendentes e produtos de exemplo.
+
+    Feito uma vez por processo (o app chama dentro de `st.cache_resource`).
+    Com `exemplos=False` (linha de comando) só o esquema é preparado.
+    """
+    with _trava_inicializacao(pool.caminho):
+        migrar(pool)
+        if not exemplos:
+            return
+
+        # Inserir produtos de exemplo se a tabela estiver vazia
+        with pool.transacao(imediata=True) as conn:
+            if conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0] == 0:
+                conn.executemany('''INSERT INTO produtos (Nome, Preço, Estoque, Categoria, Descricao, Imagem)
+                                    VALUES (?, ?, ?, ?, ?, ?)''', PRODUTOS_EXEMPLO)
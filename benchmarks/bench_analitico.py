@@ -0,0 +1,114 @@
+"""Painel do Dashboard: SQLite (resumos/varredura) vs. espelho colunar.
+
+Popula um banco com --vendas vendas, copia para o espelho Parquet e mede o
+painel para o histórico inteiro e para períodos de 30 e 365 dias em cada
+caminho: pandas sobre a tabela inteira (como o Dashboard fazia), SQLite,
+pyarrow e DuckDB (se instalado). Mede também a cópia inicial e uma
+sincronização incremental depois de novas vendas.
+
+Uso: python benchmarks/bench_analitico.py --vendas 1000000
+"""
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+import analitico  # noqa: E402
+import banco  # noqa: E402
+import vendas  # noqa: E402
+from semear import semear  # noqa: E402
+
+
+def painel_pandas(pool, inicio, fim):
+    # O caminho antigo: tabela inteira em memória, datas convertidas a cada vez
+    with pool.conexao() as conn:
+        df = pd.read_sql("SELECT Produto, Quantidade, Subtotal, Usuario, Data FROM vendas", conn)
+    df["Data"] = pd.to_datetime(df["Data"])
+    if inicio:
+        df = df[(df["Data"].dt.date >= inicio) & (df["Data"].dt.date <= fim)]
+    por_dia = df.groupby(df["Data"].dt.date).agg({"Subtotal": "sum", "Quantidade": "sum"})
+    top_produtos = df.groupby("Produto")["Quantidade"].sum().nlargest(5)
+    top_clientes = df.groupby("Usuario")["Subtotal"].sum().nlargest(5)
+    return len(df), por_dia, top_produtos, top_clientes
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vendas", type=int, default=1_000_000)
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--usuarios", type=int, default=20_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--novas", type=int, default=1_000, help="vendas acrescentadas antes da sincronização incremental")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "analitico.db")
+        pool = banco.PoolConexoes(caminho)
+        banco.init_db(pool)
+        semear(pool, args.produtos, args.usuarios, args.vendas, relatar=lambda _: None)
+
+        motores = ["arrow"]
+        try:
+            import duckdb  # noqa: F401
+            motores.append("duckdb")
+        except ImportError:
+            print("duckdb não instalado: só pyarrow\n")
+        espelhos = {motor: analitico.Espelho(os.path.join(tmp, "espelho"), motor) for motor in motores}
+
+        inicio = time.perf_counter()
+        espelhos["arrow"].sincronizar(pool)
+        duracao = time.perf_counter() - inicio
+        tamanho = espelhos["arrow"].tamanho()
+        print(f"cópia inicial: {args.vendas:,} vendas em {duracao:.1f}s ({args.vendas / duracao:,.0f}/s); "
+              f"Parquet {tamanho['bytes'] / 2**20:.0f} MiB em {tamanho['arquivos']} arquivos, "
+              f"SQLite {os.path.getsize(caminho) / 2**20:.0f} MiB")
+
+        ultimo = vendas.periodo_vendas(pool)[1]
+        periodos = {"histórico inteiro": (None, None),
+                    "365 dias": (ultimo - datetime.timedelta(days=364), ultimo),
+                    "30 dias": (ultimo - datetime.timedelta(days=29), ultimo)}
+        caminhos = {"pandas (antigo)": lambda i, f: painel_pandas(pool, i, f),
+                    "sqlite": lambda i, f: vendas.painel_vendas(pool, i, f)}
+        for motor, espelho in espelhos.items():
+            caminhos[motor] = espelho.painel
+
+        print(f"\n{'caminho':<18}" + "".join(f"{nome:>20}" for nome in periodos))
+        for nome, funcao in caminhos.items():
+            repeticoes = 1 if nome.startswith("pandas") else args.repeticoes
+            tempos = [medir(lambda: funcao(*periodo), repeticoes) for periodo in periodos.values()]
+            print(f"{nome:<18}" + "".join(f"{ms:>17.1f} ms" for ms in tempos))
+
+        # Novas vendas chegando: só elas são copiadas
+        with pool.transacao(imediata=True) as conn:
+            conn.execute('''INSERT INTO vendas (Produto, produto_id, Quantidade, Preço, Subtotal, Usuario, usuario_id)
+                            SELECT Produto, produto_id, Quantidade, Preço, Subtotal, Usuario, usuario_id
+                            FROM vendas ORDER BY id DESC LIMIT ?''', (args.novas,))
+        inicio = time.perf_counter()
+        copiadas = espelhos["arrow"].sincronizar(pool)
+        print(f"\nsincronização incremental: {copiadas:,} vendas novas em "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+        inicio = time.perf_counter()
+        espelhos["arrow"].sincronizar(pool)
+        print(f"sincronização sem novidades: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Benchmark de ponta a ponta do app com AppTest, sobre um banco sintético.
+
+Cada sessão simulada percorre o fluxo de uma visita: Home, login,
+Catálogo (busca, filtro de categoria, próxima página), adicionar ao
+carrinho, finalizar compra, Perfil e, a cada --admin-a-cada sessões, o
+Dashboard. Para cada passo registra latência (p50/p90/p95/p99), consultas
+SQL e, com --tracemalloc, o pico de memória Python. O relatório JSON pode
+ser comparado com um anterior (--baseline); termina com código 1 se algum
+passo piorou além da tolerância.
+
+Uso:
+    python benchmarks/bench_app.py --vendas 1000000 --saida atual.json
+    python benchmarks/bench_app.py --banco carga.db --reusar --baseline atual.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+# Só piora se passar da tolerância E desta diferença absoluta (ruído)
+PISO_MS = 5.0
+
+
+class ContadorConsultas:
+    # Conta os comandos SQL de todas as conexões do pool (trace callback)
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, conn):
+        conn.set_trace_callback(self._contar)
+
+    def _contar(self, sql):
+        if not sql.startswith("--"):  # comandos dentro de triggers vêm como "-- TRIGGER"
+            with self._lock:
+                self.total += 1
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    baixo = int(posicao)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (posicao - baixo)
+
+
+def widget(colecao, rotulo):
+    return next(w for w in colecao if w.label == rotulo)
+
+
+def sessao(numero, args, medir):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(RAIZ / "1_app.py"), default_timeout=args.timeout)
+    medir("home", at.run)
+
+    at.session_state["usuario"] = f"cliente{numero % args.usuarios}"
+    medir("login", at.run)
+
+    at.sidebar.radio[0].set_value("📦 Catálogo")
+    medir("catalogo", at.run)
+
+    busca = widget(at.text_input, "🔎 Buscar produtos")
+    busca.set_value(("hidratante", "oleo coco", "sabonete vegano", "argan")[numero % 4])
+    medir("catalogo_busca", at.run)
+
+    widget(at.text_input, "🔎 Buscar produtos").set_value("")
+    widget(at.selectbox, "Categoria:").set_value(("Higiene", "Corpo", "Cabelos", "Tratamento")[numero % 4])
+    medir("catalogo_filtro", at.run)
+
+    proxima = widget(at.button, "Próxima ▶")
+    if not proxima.disabled:
+        proxima.click()
+        medir("catalogo_proxima", at.run)
+
+    # O botão "Adicionar" chama st.rerun(), que o AppTest não acompanha: faz
+    # o mesmo que ele (altera o carrinho e reexecuta o script inteiro)
+    cesta = at.session_state["carrinho"]
+    for produto_id, nome, preco in args.vitrine[numero % len(args.vitrine):][:2]:
+        cesta.adicionar(produto_id, nome, preco, 1 + numero % 2)
+    medir("carrinho_adicionar", at.run)
+
+    widget(at.sidebar.button, "Finalizar Compra").click()
+    medir("checkout", at.run)
+    if not any(m.value == "Compra finalizada com sucesso!" for m in at.sidebar.success):
+        args.falhas_checkout += 1
+
+    at.sidebar.radio[0].set_value("👤 Perfil")
+    medir("perfil", at.run)
+
+    if args.admin_a_cada and numero % args.admin_a_cada == 0:
+        at.session_state["usuario"] = "admin"
+        at.sidebar.radio[0].set_value("📊 Dashboard")
+        medir("dashboard", at.run)
+
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def comparar(relatorio, baseline, tolerancia):
+    diferentes = [chave for chave in ("produtos", "usuarios", "vendas", "tracemalloc")
+                  if relatorio["meta"].get(chave) != baseline["meta"].get(chave)]
+    if diferentes:
+        print(f"\natenção: baseline com outra configuração ({', '.join(diferentes)})")
+    print(f"\n{'passo':<20} {'p95 base':>10} {'p95 atual':>10} {'Δ':>8} {'SQL base':>9} {'SQL atual':>10}")
+    pioras = []
+    for passo, atual in relatorio["passos"].items():
+        base = baseline["passos"].get(passo)
+        if base is None:
+            print(f"{passo:<20} {'-':>10} {atual['p95_ms']:>10.1f}")
+            continue
+        delta = (atual["p95_ms"] - base["p95_ms"]) / max(base["p95_ms"], 1e-9)
+        marca = ""
+        if delta > tolerancia and atual["p95_ms"] - base["p95_ms"] > PISO_MS:
+            pioras.append(f"{passo}: p95 {base['p95_ms']:.1f} -> {atual['p95_ms']:.1f} ms")
+            marca = " <-"
+        if atual["consultas_media"] > base["consultas_media"] * (1 + tolerancia) + 1:
+            pioras.append(f"{passo}: consultas {base['consultas_media']:.1f} -> {atual['consultas_media']:.1f}")
+            marca = " <-"
+        print(f"{passo:<20} {base['p95_ms']:>10.1f} {atual['p95_ms']:>10.1f} {delta:>+8.0%} "
+              f"{base['consultas_media']:>9.1f} {atual['consultas_media']:>10.1f}{marca}")
+    return pioras
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="arquivo SQLite (padrão: um temporário)")
+    parser.add_argument("--reusar", action="store_true", help="não popula o banco, usa o que já existe")
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--usuarios", type=int, default=2_000)
+    parser.add_argument("--vendas", type=int, default=200_000)
+    parser.add_argument("--sessoes", type=int, default=20)
+    parser.add_argument("--aquecimento", type=int, default=1, help="sessões iniciais fora das estatísticas")
+    parser.add_argument("--admin-a-cada", type=int, default=5)
+    parser.add_argument("--tracemalloc", action="store_true", help="pico de memória por passo (mais lento)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--saida", default="bench_app.json")
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora aceita no p95 (fração)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    caminho = args.banco or os.path.join(tmp.name, "carga.db")
+    # O app lê estas variáveis ao importar os módulos, então vêm antes dos imports
+    os.environ["UNIFOLHAS_DB"] = caminho
+    os.environ["UNIFOLHAS_OFFLINE"] = "1"
+    os.environ.setdefault("UNIFOLHAS_CACHE_IMAGENS", os.path.join(tmp.name, "imagens"))
+
+    import banco
+    import streamlit
+    from semear import semear
+
+    pool = banco.PoolConexoes(caminho)
+    banco.init_db(pool)
+    if not args.reusar:
+        semear(pool, args.produtos, args.usuarios, args.vendas)
+    with pool.conexao() as conn:
+        args.vitrine = conn.execute("SELECT id, Nome, Preço FROM produtos ORDER BY id LIMIT 50").fetchall()
+        conn.execute("UPDATE produtos SET Estoque = 1000000")
+    pool.fechar()
+
+    contador = ContadorConsultas()
+    banco.AO_ABRIR.append(contador)
+    amostras = {}
+    args.falhas_checkout = 0
+    contando = [False]
+
+    def medir(passo, executar):
+        consultas = contador.total
+        if args.tracemalloc:
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        executar()
+        duracao = (time.perf_counter() - inicio) * 1000
+        if contando[0]:
+            amostra = amostras.setdefault(passo, {"ms": [], "consultas": [], "memoria": []})
+            amostra["ms"].append(duracao)
+            amostra["consultas"].append(contador.total - consultas)
+            if args.tracemalloc:
+                amostra["memoria"].append(tracemalloc.get_traced_memory()[1])
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    for numero in range(args.aquecimento + args.sessoes):
+        contando[0] = numero >= args.aquecimento
+        sessao(numero, args, medir)
+    duracao = time.perf_counter() - inicio
+
+    relatorio = {
+        "meta": {
+            "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                     capture_output=True, text=True).stdout.strip(),
+            "python": platform.python_version(),
+            "streamlit": streamlit.__version__,
+            "produtos": args.produtos, "usuarios": args.usuarios, "vendas": args.vendas,
+            "reusar": args.reusar, "sessoes": args.sessoes, "tracemalloc": args.tracemalloc,
+            "segundos": round(duracao, 1),
+        },
+        "rss_pico_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "falhas_checkout": args.falhas_checkout,
+        "passos": {},
+    }
+    print(f"{'passo':<20} {'n':>4} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8} {'SQL':>6}"
+          + (f" {'pico MiB':>9}" if args.tracemalloc else ""))
+    for passo, amostra in amostras.items():
+        ms = amostra["ms"]
+        resumo = {"n": len(ms),
+                  **{f"p{p}_ms": round(percentil(ms, p), 2) for p in (50, 90, 95, 99)},
+                  "max_ms": round(max(ms), 2),
+                  "consultas_media": round(sum(amostra["consultas"]) / len(ms), 1)}
+        if amostra["memoria"]:
+            resumo["memoria_pico_mib"] = round(max(amostra["memoria"]) / 2**20, 1)
+        relatorio["passos"][passo] = resumo
+        print(f"{passo:<20} {resumo['n']:>4} {resumo['p50_ms']:>8.1f} {resumo['p90_ms']:>8.1f} "
+              f"{resumo['p95_ms']:>8.1f} {resumo['p99_ms']:>8.1f} {resumo['max_ms']:>8.1f} "
+              f"{resumo['consultas_media']:>6.1f}"
+              + (f" {resumo['memoria_pico_mib']:>9.1f}" if amostra["memoria"] else ""))
+    print(f"\nRSS máximo {relatorio['rss_pico_mib']} MiB, {args.falhas_checkout} checkouts recusados, "
+          f"{duracao:.1f}s no total")
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(f"relatório em {args.saida}")
+
+    tmp.cleanup()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            pioras = comparar(relatorio, json.load(arquivo), args.tolerancia)
+        if pioras:
+            print("PIOROU: " + "; ".join(pioras))
+            sys.exit(1)
+        print("sem regressões")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Busca FTS5 (produtos_fts) vs. varredura com LIKE num catálogo sintético.
+
+Uso: python benchmarks/bench_busca.py --produtos 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import catalogo  # noqa: E402
+
+NOMES = ["Shampoo", "Condicionador", "Polpa", "Sabonete", "Óleo", "Máscara", "Creme", "Loção", "Bálsamo", "Sérum"]
+ADJETIVOS = ["Sólido", "Natural", "Hidratante", "Esfoliante", "Líquido", "Vegano", "Nutritivo", "Calmante"]
+INGREDIENTES = ["argan", "karité", "camomila", "açúcar", "coco", "lavanda", "alecrim", "cacau", "maracujá", "aloe"]
+CATEGORIAS = ["Higiene", "Tratamento", "Cabelos", "Corpo", "Rosto"]
+
+CONSULTAS = ["solido", "polpa esfol", "argan", "oleo coco", "mascara nutri", "karite", "7777"]
+
+
+def gerar_produtos(n, semente=42):
+    rnd = random.Random(semente)
+    for i in range(n):
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(ADJETIVOS)} {i}"
+        descricao = (f"{rnd.choice(NOMES)} com {rnd.choice(INGREDIENTES)} e "
+                     f"{rnd.choice(INGREDIENTES)}, fórmula {rnd.choice(ADJETIVOS).lower()}")
+        yield (nome, round(rnd.uniform(5, 300), 2), rnd.randint(0, 200),
+               rnd.choice(CATEGORIAS), descricao, "")
+
+
+def like_scan(pool, termo, limite):
+    # Busca ingênua: LIKE em cada palavra, sem normalizar acentos
+    condicoes, params = [], []
+    for palavra in termo.split():
+        condicoes.append("(Nome LIKE ? OR Descricao LIKE ? OR Categoria LIKE ?)")
+        params += [f"%{palavra}%"] * 3
+    with pool.conexao() as conn:
+        return conn.execute(f"SELECT * FROM produtos WHERE {' AND '.join(condicoes)} LIMIT ?",
+                            params + [limite]).fetchall()
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produtos", type=int, default=200_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = banco.PoolConexoes(os.path.join(tmp, "busca.db"))
+        banco.init_db(pool)
+        inicio = time.perf_counter()
+        with pool.transacao() as conn:
+            conn.executemany('''INSERT INTO produtos (Nome, Preço, Estoque, Categoria, Descricao, Imagem)
+                                VALUES (?, ?, ?, ?, ?, ?)''', gerar_produtos(args.produtos))
+        print(f"{args.produtos} produtos inseridos (com índice FTS) em {time.perf_counter() - inicio:.1f}s\n")
+
+        print(f"{'consulta':<16} {'FTS5 (ms)':>10} {'LIKE (ms)':>10} {'achados FTS':>12} {'achados LIKE':>13}")
+        for termo in CONSULTAS:
+            fts = medir(lambda: catalogo.buscar_produtos(pool, termo), args.repeticoes)
+            like = medir(lambda: like_scan(pool, termo, catalogo.TAMANHO_PAGINA), args.repeticoes)
+            achados_fts = catalogo.contar_busca(pool, termo)
+            achados_like = len(like_scan(pool, termo, args.produtos))
+            print(f"{termo:<16} {fts:>10.2f} {like:>10.2f} {achados_fts:>12} {achados_like:>13}")
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Operações de carrinho com centenas de linhas: lista de dicts vs. Carrinho.
+
+Mede adicionar (item novo e repetido), remover, renderizar o total e o
+tamanho serializado de cada representação.
+
+Uso: python benchmarks/bench_carrinho.py --linhas 100 500 1000 --repeticoes 5
+"""
+import argparse
+import pickle
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import carrinho  # noqa: E402
+
+
+# ----- carrinho como o app guardava antes: lista de dicts por nome -----
+def lista_adicionar(itens, nome, preco, quantidade=1):
+    item_existente = next((item for item in itens if item["Produto"] == nome), None)
+    if item_existente:
+        item_existente["Quantidade"] += quantidade
+        item_existente["Subtotal"] = item_existente["Quantidade"] * item_existente["Preço"]
+    else:
+        itens.append({"Produto": nome, "Preço": preco, "Quantidade": quantidade, "Subtotal": preco * quantidade})
+    return itens
+
+
+def lista_remover(itens, nome):
+    return [item for item in itens if item["Produto"] != nome]
+
+
+def lista_total(itens):
+    return sum(item["Subtotal"] for item in itens)
+
+
+def medir(funcao, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def cenario(linhas, repeticoes):
+    produtos = [(i, f"Produto {i}", round(random.uniform(5, 200), 2)) for i in range(linhas)]
+    ordem = random.sample(produtos, linhas)
+
+    def lista_completa():
+        itens = []
+        for _, nome, preco in produtos:
+            itens = lista_adicionar(itens, nome, preco)
+        for _, nome, preco in ordem:
+            itens = lista_adicionar(itens, nome, preco)
+            lista_total(itens)
+        for _, nome, _ in ordem:
+            itens = lista_remover(itens, nome)
+            lista_total(itens)
+
+    def carrinho_completo():
+        c = carrinho.Carrinho()
+        for produto_id, nome, preco in produtos:
+            c.adicionar(produto_id, nome, preco)
+        for produto_id, nome, preco in ordem:
+            c.adicionar(produto_id, nome, preco)
+            c.total
+        for produto_id, _, _ in ordem:
+            c.remover(produto_id)
+            c.total
+
+    lista = []
+    c = carrinho.Carrinho()
+    for produto_id, nome, preco in produtos:
+        lista_adicionar(lista, nome, preco)
+        c.adicionar(produto_id, nome, preco)
+
+    operacoes = linhas * 3
+    t_lista = medir(lista_completa, repeticoes)
+    t_carrinho = medir(carrinho_completo, repeticoes)
+    print(f"{linhas:>6} linhas   lista {t_lista / operacoes * 1e6:>9.2f} µs/op   "
+          f"carrinho {t_carrinho / operacoes * 1e6:>7.2f} µs/op   ({t_lista / t_carrinho:>6.1f}x)   "
+          f"pickle {len(pickle.dumps(lista)) / 1024:>7.1f} KiB -> {len(pickle.dumps(c.para_lista())) / 1024:>6.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    for linhas in args.linhas:
+        cenario(linhas, args.repeticoes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Tempo de montagem do Dashboard: pandas sobre vendas inteira vs. resumos.
+
+Para cada volume de vendas mede o caminho antigo (SELECT * + groupby) e o
+caminho novo (acumular as vendas novas desde o último rerun + ler os
+resumos). O segundo deve ficar constante conforme vendas cresce.
+
+Uso: python benchmarks/bench_dashboard.py --volumes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import vendas  # noqa: E402
+
+
+def gerar_vendas(n, inicio, semente):
+    rnd = random.Random(semente)
+    produtos = [nome for nome, preco, *_ in banco.PRODUTOS_EXEMPLO]
+    precos = {nome: preco for nome, preco, *_ in banco.PRODUTOS_EXEMPLO}
+    for i in range(n):
+        produto = rnd.choice(produtos)
+        quantidade = rnd.randint(1, 4)
+        dia = (inicio + i) % 730
+        yield (produto, quantidade, precos[produto], precos[produto] * quantidade,
+               f"cliente{rnd.randint(1, 5000)}", "2024-01-01 12:00:00", f"+{dia} days")
+
+
+def inserir(pool, n, inicio, semente=0):
+    with pool.transacao() as conn:
+        conn.executemany('''INSERT INTO vendas (Produto, Quantidade, Preço, Subtotal, Usuario, Data)
+                            VALUES (?, ?, ?, ?, ?, datetime(?, ?))''', gerar_vendas(n, inicio, semente))
+
+
+def dashboard_pandas(pool):
+    # Mesmo trabalho que o Dashboard fazia a cada rerun
+    with pool.conexao() as conn:
+        df = pd.read_sql('''SELECT * FROM vendas''', conn)
+    len(df), df["Subtotal"].sum(), df["Quantidade"].sum(), df["Usuario"].nunique()
+    df['Data'] = pd.to_datetime(df['Data'])
+    df['Dia'] = df['Data'].dt.date
+    df.groupby('Dia').agg({'Subtotal': 'sum', 'Quantidade': 'sum'})
+    df.groupby("Produto").agg({"Quantidade": "sum", "Subtotal": "sum"}).nlargest(5, "Quantidade")
+    df.groupby("Usuario").agg({"Subtotal": "sum", "Quantidade": "sum", "id": "count"}).nlargest(5, "Subtotal")
+
+
+def dashboard_resumos(pool):
+    vendas.atualizar_resumos(pool)
+    vendas.painel_vendas(pool)
+
+
+def medir(funcao, repeticoes, antes=None):
+    tempos = []
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--volumes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--novas-por-rerun", type=int, default=20,
+                        help="vendas novas entre um rerun e outro")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = banco.PoolConexoes(os.path.join(tmp, "dashboard.db"))
+        banco.init_db(pool)
+        total = 0
+        print(f"{'vendas':>10} {'pandas (ms)':>12} {'resumos (ms)':>13}")
+        for volume in sorted(args.volumes):
+            inserir(pool, volume - total, total)
+            total = volume
+            vendas.atualizar_resumos(pool)
+
+            def novas_vendas():
+                nonlocal total
+                inserir(pool, args.novas_por_rerun, total, semente=total)
+                total += args.novas_por_rerun
+
+            resumos = medir(lambda: dashboard_resumos(pool), args.repeticoes, antes=novas_vendas)
+            antigo = medir(lambda: dashboard_pandas(pool), args.repeticoes)
+            print(f"{total:>10} {antigo:>12.1f} {resumos:>13.1f}")
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Custo das imagens numa página com N produtos: original a cada render vs. miniaturas.
+
+Gera imagens de fixture num diretório local (sem rede) e mede, para a
+largura de 200 px do Catálogo, o tempo e os bytes enviados ao navegador:
+- original: o que o app fazia, a imagem inteira a cada render;
+- fria: primeira renderização, gerando as miniaturas;
+- disco: processo novo, miniaturas já no cache em disco;
+- memória: reruns seguintes no mesmo processo.
+
+Uso: python benchmarks/bench_imagens.py --produtos 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import imagens  # noqa: E402
+
+
+def criar_fixtures(diretorio, n, tamanho):
+    fontes = []
+    for i in range(n):
+        fonte = f"https://via.placeholder.com/{tamanho}?text=Produto+{i}"
+        # Ruído sobre uma cor base: comprime como foto, não como desenho chapado
+        base = Image.new("RGB", (tamanho, tamanho), ((i * 37) % 256, (i * 91) % 256, (i * 13) % 256))
+        ruido = Image.effect_noise((tamanho, tamanho), 48).convert("RGB")
+        imagem = Image.blend(base, ruido, 0.35)
+        imagem.save(os.path.join(diretorio, imagens.nome_local(fonte)), format="JPEG", quality=90)
+        fontes.append(fonte)
+    return fontes
+
+
+def renderizar(cache, fontes, largura):
+    inicio = time.perf_counter()
+    enviados = sum(len(cache.miniatura(fonte, largura) or b"") for fonte in fontes)
+    return (time.perf_counter() - inicio) * 1000, enviados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--tamanho", type=int, default=800, help="lado da imagem original (px)")
+    parser.add_argument("--largura", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixtures, tempfile.TemporaryDirectory() as cache_dir:
+        fontes = criar_fixtures(fixtures, args.produtos, args.tamanho)
+
+        inicio = time.perf_counter()
+        enviados = 0
+        for fonte in fontes:
+            with open(os.path.join(fixtures, imagens.nome_local(fonte)), "rb") as arquivo:
+                enviados += len(arquivo.read())
+        resultados = [("original", (time.perf_counter() - inicio) * 1000, enviados)]
+
+        cache = imagens.CacheImagens(cache_dir, diretorio_local=fixtures, offline=True)
+        resultados.append(("fria",) + renderizar(cache, fontes, args.largura))
+        resultados.append(("memória",) + renderizar(cache, fontes, args.largura))
+        novo_processo = imagens.CacheImagens(cache_dir, diretorio_local=fixtures, offline=True)
+        resultados.append(("disco",) + renderizar(novo_processo, fontes, args.largura))
+
+        print(f"{args.produtos} produtos, originais {args.tamanho}px, miniatura {args.largura}px")
+        print(f"{'cenário':<10} {'tempo (ms)':>11} {'enviado (KB)':>13}")
+        for nome, ms, total in resultados:
+            print(f"{nome:<10} {ms:>11.1f} {total / 1024:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Importação em massa de produtos (CSV/Parquet) e exportação em lotes.
+
+Compara um INSERT por linha com commit (amostra), a carga em lotes com os
+índices mantidos e com os índices adiados, e uma reimportação (só updates).
+
+Uso: python benchmarks/bench_importacao.py --linhas 1000000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import transferencia  # noqa: E402
+from bench_busca import gerar_produtos  # noqa: E402
+
+
+def gerar_csv(caminho, linhas, semente=42):
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(["sku", "Nome", "Preço", "Estoque", "Categoria", "Descricao", "Imagem"])
+        for i, produto in enumerate(gerar_produtos(linhas, semente)):
+            escritor.writerow((f"SKU{i:08d}",) + produto)
+
+
+def banco_novo(tmp, nome):
+    pool = banco.PoolConexoes(os.path.join(tmp, nome))
+    banco.init_db(pool, exemplos=False)
+    return pool
+
+
+def linha_por_linha(pool, origem, amostra):
+    # Como um script ingênuo faria: um INSERT e um commit por produto
+    inicio = time.perf_counter()
+    lidas = 0
+    for _, linhas in transferencia.ler_lotes(origem, "csv", 1000):
+        for sku, nome, preco, estoque, categoria, descricao, imagem in linhas:
+            with pool.transacao() as conn:
+                conn.execute('''INSERT INTO produtos (sku, Nome, Preço, Estoque, Categoria, Descricao, Imagem)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                                ON CONFLICT (sku) DO UPDATE SET Nome = excluded.Nome, Preço = excluded.Preço''',
+                             (sku, nome, float(preco), int(estoque), categoria, descricao, imagem))
+            lidas += 1
+            if lidas >= amostra:
+                return lidas / (time.perf_counter() - inicio)
+    return lidas / (time.perf_counter() - inicio)
+
+
+def relatar(nome, estatisticas):
+    indices = (f"   índices {estatisticas['segundos_indices']:.1f}s"
+               if "segundos_indices" in estatisticas else "")
+    print(f"{nome:<34} {estatisticas['segundos']:>8.1f}s {estatisticas['linhas_por_segundo']:>12,.0f} linhas/s"
+          f"{indices}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--amostra", type=int, default=5_000, help="linhas no teste linha a linha")
+    parser.add_argument("--lote", type=int, default=transferencia.TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        origem_csv = os.path.join(tmp, "produtos.csv")
+        origem_parquet = os.path.join(tmp, "produtos.parquet")
+        inicio = time.perf_counter()
+        gerar_csv(origem_csv, args.linhas)
+        transferencia.gravar_lotes(origem_parquet, "parquet", transferencia.ler_lotes(origem_csv, "csv", 50_000))
+        print(f"{args.linhas:,} produtos gerados em {time.perf_counter() - inicio:.1f}s "
+              f"(CSV {os.path.getsize(origem_csv) / 2**20:.0f} MiB, "
+              f"Parquet {os.path.getsize(origem_parquet) / 2**20:.0f} MiB)\n")
+
+        pool = banco_novo(tmp, "linha.db")
+        taxa = linha_por_linha(pool, origem_csv, args.amostra)
+        pool.fechar()
+        print(f"{'INSERT + commit por linha':<34} {args.linhas / taxa:>8.1f}s {taxa:>12,.0f} linhas/s"
+              f"   (estimado por {args.amostra:,} linhas)")
+
+        pool = banco_novo(tmp, "mantidos.db")
+        relatar("lotes, índices mantidos (CSV)",
+                transferencia.importar_produtos(pool, origem_csv, lote=args.lote, adiar=False))
+        pool.fechar()
+
+        pool = banco_novo(tmp, "adiados.db")
+        relatar("lotes, índices adiados (CSV)",
+                transferencia.importar_produtos(pool, origem_csv, lote=args.lote, adiar=True))
+        relatar("reimportação, só updates (Parquet)",
+                transferencia.importar_produtos(pool, origem_parquet, lote=args.lote, adiar=True))
+        pool.fechar()
+
+        pool = banco_novo(tmp, "parquet.db")
+        relatar("lotes, índices adiados (Parquet)",
+                transferencia.importar_produtos(pool, origem_parquet, lote=args.lote, adiar=True))
+
+        print()
+        for formato in ("csv", "parquet"):
+            inicio = time.perf_counter()
+            linhas = transferencia.exportar_produtos(pool, os.path.join(tmp, f"saida.{formato}"), formato)
+            duracao = time.perf_counter() - inicio
+            print(f"{'exportação ' + formato:<34} {duracao:>8.1f}s {linhas / duracao:>12,.0f} linhas/s")
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
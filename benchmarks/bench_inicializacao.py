@@ -0,0 +1,115 @@
+"""Partida a frio vs. rerun aquecido do app, e init_db concorrente.
+
+Partida a frio: um processo novo importa o app e faz o primeiro run (com
+banco novo e com banco já migrado). Rerun aquecido: runs seguintes no
+mesmo processo, que não repetem init_db nem a leitura do CSS. Por fim
+vários processos chamam init_db juntos num banco novo e o script confere
+que as migrações e os produtos de exemplo foram aplicados uma vez só.
+
+Uso: python benchmarks/bench_inicializacao.py --partidas 3 --reruns 30 --processos 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import banco  # noqa: E402
+
+# Roda num processo novo; mede do início do interpretador até o fim de cada run
+PARTIDA = """
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+primeiro = time.perf_counter() - inicio
+reruns = []
+for _ in range({reruns}):
+    antes = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - antes)
+print(json.dumps({{"primeiro": primeiro, "reruns": reruns, "erro": bool(at.exception)}}))
+"""
+
+
+def partida(caminho, reruns):
+    ambiente = dict(os.environ, UNIFOLHAS_DB=caminho, UNIFOLHAS_OFFLINE="1")
+    saida = subprocess.run([sys.executable, "-c", PARTIDA.format(raiz=str(RAIZ), app=str(RAIZ / "1_app.py"),
+                                                                 reruns=reruns)],
+                           env=ambiente, capture_output=True, text=True, check=True)
+    resultado = json.loads(saida.stdout.strip().splitlines()[-1])
+    if resultado["erro"]:
+        raise RuntimeError("o app levantou exceção durante o benchmark")
+    return resultado
+
+
+def inicializar(caminho, barreira):
+    pool = banco.PoolConexoes(caminho, tamanho=1)
+    barreira.wait()
+    banco.init_db(pool)
+    pool.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--partidas", type=int, default=3)
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--processos", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        novos, migrados, reruns = [], [], []
+        for i in range(args.partidas):
+            caminho = os.path.join(tmp, f"partida{i}.db")
+            novos.append(partida(caminho, 0)["primeiro"])
+            resultado = partida(caminho, args.reruns)
+            migrados.append(resultado["primeiro"])
+            reruns.extend(resultado["reruns"])
+
+        print(f"partida a frio, banco novo      {statistics.median(novos) * 1000:>8.0f} ms (mediana)")
+        print(f"partida a frio, banco migrado   {statistics.median(migrados) * 1000:>8.0f} ms (mediana)")
+        print(f"rerun aquecido                  {statistics.median(reruns) * 1000:>8.1f} ms (mediana), "
+              f"p95 {statistics.quantiles(reruns, n=20)[-1] * 1000:.1f} ms")
+
+        # O que cada rerun pagava antes: init_db com o banco em dia
+        pool = banco.PoolConexoes(os.path.join(tmp, "partida0.db"), tamanho=1)
+        inicio = time.perf_counter()
+        for _ in range(200):
+            banco.init_db(pool)
+        print(f"init_db com o banco em dia      {(time.perf_counter() - inicio) / 200 * 1000:>8.2f} ms por chamada "
+              f"(antes: a cada rerun; agora: uma vez por processo)")
+        pool.fechar()
+
+        caminho = os.path.join(tmp, "concorrente.db")
+        barreira = multiprocessing.Barrier(args.processos)
+        processos = [multiprocessing.Process(target=inicializar, args=(caminho, barreira))
+                     for _ in range(args.processos)]
+        for p in processos:
+            p.start()
+        for p in processos:
+            p.join()
+        pool = banco.PoolConexoes(caminho, tamanho=1)
+        with pool.conexao() as conn:
+            produtos = conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0]
+        versao = banco.versao_esquema(pool)
+        pool.fechar()
+        print(f"\n{args.processos} processos em init_db juntos: versão {versao}, {produtos} produtos de exemplo")
+        if (produtos != len(banco.PRODUTOS_EXEMPLO) or versao != banco.VERSAO_ESQUEMA
+                or any(p.exitcode for p in processos)):
+            print("FALHOU")
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Reruns/s com N sessões simuladas: conexão por rerun vs. pool compartilhado.
+
+Uso: python benchmarks/bench_pool.py --sessoes 16 --reruns 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+
+
+def popular(pool, vendas):
+    banco.init_db(pool)
+    with pool.transacao() as conn:
+        conn.executemany('''INSERT INTO vendas (Produto, Quantidade, Preço, Subtotal, Usuario)
+                            VALUES (?, ?, ?, ?, ?)''',
+                         [("Shampoo Sólido", 1, 42.5, 42.5, f"cliente{i % 50}") for i in range(vendas)])
+
+
+def rerun(conn_ctx, trans_ctx, usuario, escrever):
+    # Mesmas consultas que uma renderização do Perfil faz hoje
+    with conn_ctx() as conn:
+        conn.execute("SELECT * FROM produtos").fetchall()
+        conn.execute("SELECT favoritos FROM usuarios WHERE nome = ?", (usuario,)).fetchone()
+        conn.execute('''SELECT Produto, Quantidade, Subtotal, Data FROM vendas
+                        WHERE Usuario = ? ORDER BY Data DESC''', (usuario,)).fetchall()
+    if escrever:
+        with trans_ctx() as conn:
+            conn.execute('''INSERT INTO vendas (Produto, Quantidade, Preço, Subtotal, Usuario)
+                            VALUES (?, ?, ?, ?, ?)''', ("Polpa Hidratante", 1, 56.9, 56.9, usuario))
+
+
+def executar(nome, conn_ctx, trans_ctx, sessoes, reruns, escrita_a_cada):
+    erros = []
+
+    def sessao(n):
+        usuario = f"cliente{n}"
+        for i in range(reruns):
+            try:
+                rerun(conn_ctx, trans_ctx, usuario, i % escrita_a_cada == 0)
+            except sqlite3.OperationalError as e:
+                erros.append(str(e))
+
+    threads = [threading.Thread(target=sessao, args=(n,)) for n in range(sessoes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    total = sessoes * reruns
+    print(f"{nome:<20} {total / duracao:>10.1f} reruns/s   {len(erros):>5} erros de lock")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessoes", type=int, default=16)
+    parser.add_argument("--reruns", type=int, default=200)
+    parser.add_argument("--vendas", type=int, default=5000)
+    parser.add_argument("--escrita-a-cada", type=int, default=5,
+                        help="um checkout a cada N reruns por sessão")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Conexão por rerun, como o app fazia antes do pool
+        caminho = os.path.join(tmp, "por_rerun.db")
+        base = banco.PoolConexoes(caminho, tamanho=1)
+        popular(base, args.vendas)
+        with base.conexao() as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        base.fechar()
+
+        @contextmanager
+        def conectar():
+            conn = sqlite3.connect(caminho)
+            try:
+                yield conn
+            finally:
+                conn.commit()
+                conn.close()
+
+        executar("conexão por rerun", conectar, conectar,
+                 args.sessoes, args.reruns, args.escrita_a_cada)
+
+        pool = banco.PoolConexoes(os.path.join(tmp, "pool.db"))
+        popular(pool, args.vendas)
+        executar("pool + WAL", pool.conexao, lambda: pool.transacao(imediata=True),
+                 args.sessoes, args.reruns, args.escrita_a_cada)
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Índice de recomendações: construção completa, atualização incremental e consultas.
+
+Popula um banco com --vendas vendas (pedidos de 1 a 3 itens) e favoritos
+aleatórios, mede a reconstrução completa em etapas (leitura das cestas,
+matriz de coocorrência e top-K em NumPy, gravação), a atualização
+incremental depois de --novos pedidos e a latência das consultas da Home
+e do Catálogo. Confere que a atualização incremental dá as mesmas listas
+que uma reconstrução para os produtos tocados.
+
+Uso: python benchmarks/bench_recomendacoes.py --vendas 10000000
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import recomendacoes  # noqa: E402
+import vendas  # noqa: E402
+from semear import semear  # noqa: E402
+
+
+def medir(funcao, repeticoes=200):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def favoritar(pool, por_usuario, semente=7):
+    rnd = random.Random(semente)
+    with pool.transacao(imediata=True) as conn:
+        produtos = [linha[0] for linha in conn.execute("SELECT id FROM produtos")]
+        usuarios = [linha[0] for linha in conn.execute("SELECT id FROM usuarios")]
+        conn.executemany("INSERT OR IGNORE INTO favoritos (usuario_id, produto_id) VALUES (?, ?)",
+                         ((usuario_id, produto_id) for usuario_id in usuarios
+                          for produto_id in rnd.sample(produtos, rnd.randint(0, por_usuario))))
+
+
+def indice(pool, produto_ids):
+    marcas = ",".join("?" * len(produto_ids))
+    with pool.conexao() as conn:
+        return conn.execute(f'''SELECT produto_id, posicao, vizinho_id, ROUND(pontuacao, 9) FROM recomendacoes
+                                WHERE produto_id IN ({marcas}) ORDER BY 1, 2''', list(produto_ids)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vendas", type=int, default=10_000_000)
+    parser.add_argument("--produtos", type=int, default=10_000)
+    parser.add_argument("--usuarios", type=int, default=50_000)
+    parser.add_argument("--favoritos", type=int, default=20, help="máximo de favoritos por usuário")
+    parser.add_argument("--novos", type=int, default=200, help="pedidos antes da atualização incremental")
+    args = parser.parse_args()
+    falhou = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = banco.PoolConexoes(os.path.join(tmp, "recomendacoes.db"))
+        banco.init_db(pool)
+        inicio = time.perf_counter()
+        semear(pool, args.produtos, args.usuarios, args.vendas, relatar=lambda _: None)
+        favoritar(pool, args.favoritos)
+        with pool.conexao() as conn:
+            n_favoritos = conn.execute("SELECT COUNT(*) FROM favoritos").fetchone()[0]
+        print(f"banco: {args.vendas:,} vendas, {n_favoritos:,} favoritos, {args.produtos:,} produtos "
+              f"({time.perf_counter() - inicio:.0f}s para popular)\n")
+
+        # Reconstrução em etapas
+        etapas = {}
+        inicio = time.perf_counter()
+        with pool.conexao() as conn:
+            maxima = conn.execute("SELECT MAX(id) FROM vendas").fetchone()[0]
+            pedidos = recomendacoes._ler_cestas(conn, recomendacoes.SQL_CESTAS_PEDIDOS, (maxima,))
+            favoritos = recomendacoes._ler_cestas(conn, recomendacoes.SQL_CESTAS_FAVORITOS)
+        etapas["leitura das cestas"] = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        ocorrencias, vizinhos = recomendacoes.construir(pedidos, favoritos)
+        etapas["coocorrência + top-K (NumPy)"] = time.perf_counter() - inicio
+        del pedidos, favoritos, ocorrencias, vizinhos
+
+        inicio = time.perf_counter()
+        produtos = recomendacoes.reconstruir(pool)
+        etapas["reconstruir() completo"] = time.perf_counter() - inicio
+        for nome, segundos in etapas.items():
+            print(f"{nome:<32} {segundos:>8.2f} s")
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with pool.conexao() as conn:
+            linhas = conn.execute("SELECT COUNT(*) FROM recomendacoes").fetchone()[0]
+        print(f"{produtos:,} produtos, {linhas:,} vizinhos gravados; pico de memória do processo {pico:,.0f} MiB")
+
+        # Pedidos novos: só os produtos deles são recalculados
+        rnd = random.Random(3)
+        with pool.conexao() as conn:
+            catalogo = conn.execute("SELECT id, Nome, Preço FROM produtos").fetchall()
+        tocados = set()
+        for n in range(args.novos):
+            escolhidos = rnd.sample(catalogo, rnd.randint(1, 3))
+            tocados |= {produto_id for produto_id, _, _ in escolhidos}
+            vendas.finalizar_pedido(pool, f"cliente{n}", [
+                {"produto_id": produto_id, "Produto": nome, "Preço": preco, "Quantidade": 1, "Subtotal": preco}
+                for produto_id, nome, preco in escolhidos])
+        inicio = time.perf_counter()
+        novas = recomendacoes.atualizar(pool)
+        print(f"\natualização incremental: {novas:,} vendas novas, {len(tocados):,} produtos em "
+              f"{time.perf_counter() - inicio:.2f} s")
+        inicio = time.perf_counter()
+        recomendacoes.atualizar(pool)
+        print(f"atualização sem novidades: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+        incremental = indice(pool, tocados)
+        recomendacoes.reconstruir(pool)
+        completo = indice(pool, tocados)
+        iguais = incremental == completo
+        falhou |= not iguais
+        print(f"listas dos produtos tocados iguais às da reconstrução: {'sim' if iguais else 'NÃO'}")
+
+        # Consultas: O(K) pela chave primária do índice
+        pagina = [produto_id for produto_id, _, _ in rnd.sample(catalogo, 10)]
+        print(f"\n{'consulta':<40} {'p50':>8}")
+        print(f"{'sugestões de uma página (10 produtos)':<40} "
+              f"{medir(lambda: recomendacoes.sugestoes(pool, pagina)):>6.2f}ms")
+        print(f"{'destaques sem login':<40} {medir(lambda: recomendacoes.destaques(pool)):>6.2f}ms")
+        print(f"{'destaques de um cliente':<40} "
+              f"{medir(lambda: recomendacoes.destaques(pool, 'cliente1')):>6.2f}ms")
+        pool.fechar()
+
+    print("\nFALHOU" if falhou else "\nOK")
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
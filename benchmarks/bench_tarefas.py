@@ -0,0 +1,189 @@
+"""Fila de tarefas: latência do checkout, vazão, novas tentativas e idempotência.
+
+1. Checkout com o pós-checkout (resumos, alerta, confirmação) na hora vs.
+   enfileirado: latência p50/p95 de finalizar_pedido.
+2. Vazão da fila com 1, 2 e 4 threads e com vários processos; confere que
+   cada tarefa rodou exatamente uma vez.
+3. Falhas: tarefa que falha duas vezes e depois passa, tarefa que sempre
+   falha (termina em "falhou"), chave de idempotência repetida e tarefa
+   presa em "executando" por um trabalhador que morreu.
+
+Uso: python benchmarks/bench_tarefas.py --pedidos 2000 --tarefas 5000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import tarefas  # noqa: E402
+import vendas  # noqa: E402
+
+FALHAS_ANTES = {}
+
+
+@tarefas.tarefa("bench_marcar")
+def marcar(pool, dados):
+    # Uma linha por execução: tarefa repetida aparece como duplicata
+    with pool.transacao(imediata=True) as conn:
+        conn.execute("INSERT INTO bench_execucoes (tarefa) VALUES (?)", (dados["n"],))
+
+
+@tarefas.tarefa("bench_instavel")
+def instavel(pool, dados):
+    FALHAS_ANTES[dados["n"]] = FALHAS_ANTES.get(dados["n"], 0) + 1
+    if FALHAS_ANTES[dados["n"]] <= dados["falhas"]:
+        raise RuntimeError("falha simulada")
+
+
+def banco_novo(tmp, nome):
+    pool = banco.PoolConexoes(os.path.join(tmp, nome))
+    banco.init_db(pool)
+    with pool.transacao() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS bench_execucoes (id INTEGER PRIMARY KEY, tarefa INTEGER)")
+        conn.execute("UPDATE produtos SET Estoque = 1000000")
+    return pool
+
+
+def percentis(valores):
+    ordenados = sorted(valores)
+    return ordenados[len(ordenados) // 2], ordenados[int(len(ordenados) * 0.95)]
+
+
+def checkout(tmp, pedidos, inline):
+    pool = banco_novo(tmp, f"checkout_{inline}.db")
+    with pool.conexao() as conn:
+        produtos = conn.execute("SELECT id, Nome, Preço FROM produtos").fetchall()
+    tempos = []
+    for n in range(pedidos):
+        itens = [{"produto_id": produto_id, "Produto": nome, "Preço": preco, "Quantidade": 1, "Subtotal": preco}
+                 for produto_id, nome, preco in produtos[n % len(produtos):][:2]]
+        inicio = time.perf_counter()
+        pedido_id = vendas.finalizar_pedido(pool, f"cliente{n % 50}", itens)
+        if inline:
+            vendas.pos_checkout(pool, {"pedido_id": pedido_id})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    trabalhadores = tarefas.Trabalhadores(pool, quantidade=0)
+    inicio = time.perf_counter()
+    trabalhadores.executar_pendentes()
+    dreno = time.perf_counter() - inicio
+    pool.fechar()
+    return tempos, dreno
+
+
+def enfileirar_varias(pool, quantidade, tipo="bench_marcar", inicio=0):
+    with pool.transacao(imediata=True) as conn:
+        for n in range(inicio, inicio + quantidade):
+            tarefas.enfileirar(conn, tipo, {"n": n}, chave=f"{tipo}:{n}")
+
+
+def drenar(pool, threads, total):
+    trabalhadores = tarefas.Trabalhadores(pool, quantidade=threads, intervalo=0.05)
+    while True:
+        with pool.conexao() as conn:
+            if conn.execute("SELECT COUNT(*) FROM bench_execucoes").fetchone()[0] >= total:
+                break
+        time.sleep(0.01)
+    trabalhadores.fechar()
+
+
+def processo(caminho, threads, total):
+    pool = banco.PoolConexoes(caminho)
+    drenar(pool, threads, total)
+    pool.fechar()
+
+
+def conferir_uma_vez(pool, total):
+    with pool.conexao() as conn:
+        execucoes, distintas = conn.execute("SELECT COUNT(*), COUNT(DISTINCT tarefa) FROM bench_execucoes").fetchone()
+    return execucoes == distintas == total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pedidos", type=int, default=2_000)
+    parser.add_argument("--tarefas", type=int, default=5_000)
+    parser.add_argument("--processos", type=int, default=4)
+    args = parser.parse_args()
+    falhou = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'checkout':<28} {'p50':>8} {'p95':>8}")
+        for inline in (True, False):
+            tempos, dreno = checkout(tmp, args.pedidos, inline)
+            p50, p95 = percentis(tempos)
+            nome = "pós-checkout na hora" if inline else "pós-checkout enfileirado"
+            extra = f"   (fila drenada depois em {dreno:.1f}s)" if not inline else ""
+            print(f"{nome:<28} {p50:>6.2f}ms {p95:>6.2f}ms{extra}")
+
+        print(f"\n{'vazão (' + format(args.tarefas, ',') + ' tarefas)':<28} {'s':>8} {'tarefas/s':>10}")
+        for threads in (1, 2, 4):
+            pool = banco_novo(tmp, f"vazao_{threads}.db")
+            enfileirar_varias(pool, args.tarefas)
+            inicio = time.perf_counter()
+            drenar(pool, threads, args.tarefas)
+            duracao = time.perf_counter() - inicio
+            ok = conferir_uma_vez(pool, args.tarefas)
+            falhou |= not ok
+            print(f"{f'{threads} thread(s)':<28} {duracao:>8.1f} {args.tarefas / duracao:>10,.0f}"
+                  f"{'' if ok else '   DUPLICADAS/PERDIDAS'}")
+            pool.fechar()
+
+        caminho = os.path.join(tmp, "processos.db")
+        pool = banco_novo(tmp, "processos.db")
+        enfileirar_varias(pool, args.tarefas)
+        inicio = time.perf_counter()
+        procs = [multiprocessing.Process(target=processo, args=(caminho, 2, args.tarefas))
+                 for _ in range(args.processos)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        duracao = time.perf_counter() - inicio
+        ok = conferir_uma_vez(pool, args.tarefas)
+        falhou |= not ok
+        print(f"{f'{args.processos} processos x 2 threads':<28} {duracao:>8.1f} {args.tarefas / duracao:>10,.0f}"
+              f"{'' if ok else '   DUPLICADAS/PERDIDAS'}")
+
+        # Falhas, idempotência e recuperação
+        tarefas.ESPERA_BASE = 0.01
+        trabalhadores = tarefas.Trabalhadores(pool, quantidade=0)
+        with pool.transacao(imediata=True) as conn:
+            tarefas.enfileirar(conn, "bench_instavel", {"n": 1, "falhas": 2}, chave="instavel:1")
+            tarefas.enfileirar(conn, "bench_instavel", {"n": 2, "falhas": 99}, chave="instavel:2", max_tentativas=3)
+            repetida = tarefas.enfileirar(conn, "bench_instavel", {"n": 1, "falhas": 0}, chave="instavel:1")
+        limite = time.time() + 10
+        while time.time() < limite and trabalhadores.executar_pendentes() + tarefas.profundidade(pool)["pendente"]:
+            time.sleep(0.02)
+        with pool.conexao() as conn:
+            estados = dict(conn.execute('''SELECT chave, estado || ' após ' || tentativas FROM tarefas
+                                           WHERE tipo = 'bench_instavel' ''').fetchall())
+        print(f"\nfalha 2x e passa:  {estados['instavel:1']} tentativas")
+        print(f"sempre falha:      {estados['instavel:2']} tentativas")
+        print(f"chave repetida:    {'ignorada' if repetida is None else 'DUPLICOU'}")
+        falhou |= (estados["instavel:1"] != "feita após 3" or estados["instavel:2"] != "falhou após 3"
+                   or repetida is not None)
+
+        with pool.transacao(imediata=True) as conn:
+            presa = tarefas.enfileirar(conn, "bench_marcar", {"n": args.tarefas}, chave="presa")
+            conn.execute("UPDATE tarefas SET estado = 'executando', iniciado_em = ? WHERE id = ?",
+                         (time.time() - tarefas.PRAZO_EXECUCAO - 1, presa))
+        trabalhadores._manutencao()
+        trabalhadores.executar_pendentes()
+        with pool.conexao() as conn:
+            estado = conn.execute("SELECT estado FROM tarefas WHERE id = ?", (presa,)).fetchone()[0]
+        print(f"trabalhador morto: tarefa retomada e {estado}")
+        falhou |= estado != "feita"
+        pool.fechar()
+
+    print("\nFALHOU" if falhou else "\nOK")
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Carga no modo com vários processos: vazão do app por número de processos.
+
+Para cada quantidade em --processos sobe `implantacao.py` (serviço de
+escrita + processos do Streamlit + proxy) num banco semeado e abre
+--sessoes navegadores simulados pelo proxy: cada um pega o cookie do
+processo, abre o WebSocket do Streamlit e repete reruns do Catálogo; numa
+fração deles clica em "Adicionar", o que reserva estoque pelo serviço de
+escrita. Mede reruns por segundo e latência (p50/p95) depois do aquecimento
+e confere que cada sessão ficou sempre no mesmo processo.
+
+A escala com os processos depende de núcleos livres: com um núcleo só os
+processos dividem a mesma CPU e a vazão não cresce, então a escala só é
+conferida com mais de uma CPU (falha se a maior quantidade de processos
+não passar da vazão de um processo); com uma CPU o resultado avisa que
+ela não foi medida.
+
+Uso: python benchmarks/carga_implantacao.py --processos 1,2,4 --sessoes 16 --duracao 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import banco  # noqa: E402
+import proxy  # noqa: E402
+from semear import semear  # noqa: E402
+
+CATALOGO = 1  # índice de "📦 Catálogo" no menu
+TERMINOS = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+
+
+async def rerun(ws, estados=()):
+    """Pede um rerun e devolve os elementos novos, até o script terminar de vez."""
+    mensagem = BackMsg()
+    mensagem.rerun_script.query_string = ""
+    mensagem.rerun_script.widget_states.widgets.extend(estados)
+    await ws.write_message(mensagem.SerializeToString(), binary=True)
+    elementos = []
+    while True:
+        dados = await ws.read_message()
+        if dados is None:
+            raise ConnectionError("WebSocket fechado pelo servidor")
+        resposta = ForwardMsg()
+        resposta.ParseFromString(dados)
+        tipo = resposta.WhichOneof("type")
+        if tipo == "delta" and resposta.delta.WhichOneof("type") == "new_element":
+            elementos.append(resposta.delta.new_element)
+        elif tipo == "script_finished" and resposta.script_finished in TERMINOS:
+            # FINISHED_EARLY_FOR_RERUN (st.rerun ao adicionar): vem outro run em seguida
+            return elementos
+
+
+def widgets(elementos, tipo):
+    return [getattr(e, tipo) for e in elementos if e.WhichOneof("type") == tipo]
+
+
+async def sessao(porta, numero, args, fim_aquecimento, fim, resultados):
+    rnd = random.Random(numero)
+    resposta = await AsyncHTTPClient().fetch(f"http://127.0.0.1:{porta}/")
+    cookie = resposta.headers.get("Set-Cookie", "").split(";")[0]
+    ws = await websocket_connect(HTTPRequest(f"ws://127.0.0.1:{porta}/_stcore/stream",
+                                             headers={"Sec-WebSocket-Protocol": "streamlit", "Cookie": cookie}))
+    if any(valor.startswith(proxy.COOKIE + "=") for valor in ws.headers.get_list("Set-Cookie")):
+        # O proxy mandou a sessão a outro processo
+        resultados["trocas"] += 1
+    try:
+        menu = widgets(await rerun(ws), "radio")[0]
+        estado_menu = WidgetState(id=menu.id, int_value=CATALOGO)
+        elementos = await rerun(ws, [estado_menu])
+        while time.monotonic() < fim:
+            estados = [estado_menu]
+            botoes = [b for b in widgets(elementos, "button") if b.label == "🛒 Adicionar" and not b.disabled]
+            adicionou = botoes and rnd.random() < args.adicionar
+            if adicionou:
+                estados.append(WidgetState(id=rnd.choice(botoes).id, trigger_value=True))
+            inicio = time.monotonic()
+            elementos = await rerun(ws, estados)
+            if inicio >= fim_aquecimento and time.monotonic() <= fim:
+                resultados["latencias"].append(time.monotonic() - inicio)
+                resultados["adicoes"] += bool(adicionou)
+    except Exception as e:
+        resultados["erros"].append(repr(e))
+    finally:
+        ws.close()
+    resultados["cookies"].add(cookie)
+
+
+async def carga(porta, args):
+    resultados = {"latencias": [], "adicoes": 0, "trocas": 0, "erros": [], "cookies": set()}
+    fim_aquecimento = time.monotonic() + args.aquecimento
+    fim = fim_aquecimento + args.duracao
+    await asyncio.gather(*(sessao(porta, n, args, fim_aquecimento, fim, resultados)
+                           for n in range(args.sessoes)))
+    return resultados
+
+
+def esperar(porta, processo, prazo=120):
+    limite = time.monotonic() + prazo
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError("implantacao.py terminou antes de ficar pronta")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError("implantacao.py não ficou pronta")
+
+
+def medir(caminho, processos, args, log):
+    ambiente = dict(os.environ, UNIFOLHAS_DB=caminho, UNIFOLHAS_OFFLINE="1")
+    if args.replica:
+        ambiente["UNIFOLHAS_REPLICA"] = caminho + ".replica"
+    implantacao = subprocess.Popen([sys.executable, str(RAIZ / "implantacao.py"), "--processos", str(processos),
+                                    "--porta", str(args.porta), "--host", "127.0.0.1",
+                                    "--porta-interna", str(args.porta + 100)],
+                                   env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        esperar(args.porta, implantacao)
+        return asyncio.run(carga(args.porta, args))
+    finally:
+        implantacao.terminate()
+        implantacao.wait(60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", default="1,2,4", help="quantidades de processos do app, separadas por vírgula")
+    parser.add_argument("--sessoes", type=int, default=16, help="navegadores simulados ao mesmo tempo")
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos medidos por rodada")
+    parser.add_argument("--aquecimento", type=float, default=5.0)
+    parser.add_argument("--adicionar", type=float, default=0.1, help="fração dos reruns que clica em Adicionar")
+    parser.add_argument("--produtos", type=int, default=5_000)
+    parser.add_argument("--vendas", type=int, default=200_000)
+    parser.add_argument("--replica", action="store_true", help="leituras por réplica immutable=1")
+    parser.add_argument("--porta", type=int, default=8701)
+    args = parser.parse_args()
+    problemas = []
+    quantidades = [int(n) for n in args.processos.split(",")]
+    conferir_escala = (os.cpu_count() or 1) > 1 and len(quantidades) > 1
+
+    print(f"{os.cpu_count()} CPU(s); {args.sessoes} sessões, {args.duracao:.0f}s medidos por rodada, "
+          f"leituras por {'réplica' if args.replica else 'mode=ro'}\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "carga.db")
+        pool = banco.PoolConexoes(caminho)
+        banco.init_db(pool)
+        semear(pool, args.produtos, 1_000, args.vendas, relatar=lambda _: None)
+        pool.fechar()
+
+        print(f"{'processos':>9} {'reruns/s':>9} {'p50':>9} {'p95':>9} {'adições':>8} {'processos usados':>17}")
+        base = vazao = None
+        with open(os.path.join(tmp, "implantacao.log"), "w") as log:
+            for processos in quantidades:
+                resultados = medir(caminho, processos, args, log)
+                latencias = sorted(resultados["latencias"])
+                if not latencias:
+                    problemas.append(f"{processos} processos: nenhum rerun medido")
+                    continue
+                vazao = len(latencias) / args.duracao
+                base = base or vazao
+                usados = len({c for c in resultados["cookies"] if c.startswith(proxy.COOKIE)})
+                print(f"{processos:>9} {vazao:>9.1f} {statistics.median(latencias) * 1000:>7.0f}ms "
+                      f"{latencias[int(len(latencias) * .95)] * 1000:>7.0f}ms {resultados['adicoes']:>8} "
+                      f"{usados:>17}   ({vazao / base:.2f}x)")
+                if resultados["erros"]:
+                    problemas.append(f"{processos} processos: {len(resultados['erros'])} sessões com erro "
+                                     f"({resultados['erros'][0]})")
+                if resultados["trocas"]:
+                    problemas.append(f"{processos} processos: {resultados['trocas']} sessões trocaram de processo")
+                if usados != min(processos, args.sessoes):
+                    problemas.append(f"{processos} processos: sessões distribuídas em {usados}")
+        if conferir_escala and base and vazao and vazao <= base:
+            problemas.append(f"vazão não cresceu com {quantidades[-1]} processos ({vazao / base:.2f}x)")
+        if problemas:
+            with open(os.path.join(tmp, "implantacao.log")) as log:
+                print("\n" + "".join(log.readlines()[-20:]))
+
+    if problemas:
+        print("FALHOU: " + "; ".join(problemas))
+        sys.exit(1)
+    print("OK" if conferir_escala else "OK (escala com os processos não medida: precisa de mais de uma CPU)")
+
+
+if __name__ == "__main__":
+    main()
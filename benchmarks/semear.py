@@ -0,0 +1,106 @@
+"""Popula um banco da Unifolhas com volumes sintéticos para benchmarks.
+
+Produtos, usuários e pedidos/vendas espalhados por dois anos, inseridos em
+lotes com os índices adiados. Os resumos do Dashboard já saem atualizados.
+
+Uso: python benchmarks/semear.py --banco carga.db --produtos 10000 --usuarios 5000 --vendas 1000000
+"""
+import argparse
+import datetime
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import vendas  # noqa: E402
+from bench_busca import gerar_produtos  # noqa: E402
+
+LOTE = 50_000
+DIAS = 730
+INICIO = datetime.datetime(2024, 1, 1)
+
+
+def _inserir_produtos(conn, n, semente):
+    conn.executemany('''INSERT INTO produtos (sku, Nome, Preço, Estoque, Categoria, Descricao, Imagem)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     ((f"SINT{i:08d}", nome, preco, 1_000_000, categoria, descricao, imagem)
+                      for i, (nome, preco, _, categoria, descricao, imagem) in enumerate(gerar_produtos(n, semente))))
+
+
+def _pedidos(conn, n_vendas, semente):
+    # Gera (pedido, linhas) com 1 a 3 itens por pedido até somar n_vendas
+    rnd = random.Random(semente)
+    produtos = conn.execute("SELECT id, Nome, Preço FROM produtos").fetchall()
+    usuarios = conn.execute("SELECT id, nome FROM usuarios WHERE nome LIKE 'cliente%'").fetchall()
+    pedido_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM pedidos").fetchone()[0]
+    geradas = 0
+    while geradas < n_vendas:
+        pedido_id += 1
+        usuario_id, usuario = rnd.choice(usuarios)
+        data = (INICIO + datetime.timedelta(seconds=rnd.randrange(DIAS * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+        linhas = []
+        for produto_id, nome, preco in rnd.sample(produtos, min(len(produtos), rnd.randint(1, 3))):
+            quantidade = rnd.randint(1, 4)
+            linhas.append((nome, produto_id, quantidade, preco, preco * quantidade,
+                           usuario, usuario_id, pedido_id, data))
+        linhas = linhas[:n_vendas - geradas]
+        geradas += len(linhas)
+        yield (pedido_id, usuario, len(linhas), sum(linha[4] for linha in linhas), data), linhas
+
+
+def semear(pool, produtos=1_000, usuarios=1_000, n_vendas=100_000, semente=42, relatar=print):
+    """Acrescenta os volumes pedidos ao banco de `pool` (já inicializado)."""
+    inicio = time.perf_counter()
+    banco.adiar_indices(pool, "produtos", manter=("idx_produtos_sku",))
+    banco.adiar_indices(pool, "vendas")
+    try:
+        with pool.transacao(imediata=True) as conn:
+            _inserir_produtos(conn, produtos, semente)
+            conn.executemany("INSERT OR IGNORE INTO usuarios (nome, email) VALUES (?, ?)",
+                             [(f"cliente{i}", f"cliente{i}@exemplo.com") for i in range(usuarios)])
+        relatar(f"{produtos:,} produtos e {usuarios:,} usuários em {time.perf_counter() - inicio:.1f}s")
+
+        with pool.conexao() as conn:
+            gerador = _pedidos(conn, n_vendas, semente)
+            while True:
+                pedidos, linhas = [], []
+                for pedido, itens in gerador:
+                    pedidos.append(pedido)
+                    linhas.extend(itens)
+                    if len(linhas) >= LOTE:
+                        break
+                if not linhas:
+                    break
+                with pool.transacao(imediata=True) as conn:
+                    conn.executemany("INSERT INTO pedidos (id, Usuario, Itens, Total, Data) VALUES (?, ?, ?, ?, ?)",
+                                     pedidos)
+                    conn.executemany('''INSERT INTO vendas (Produto, produto_id, Quantidade, Preço, Subtotal,
+                                                           Usuario, usuario_id, pedido_id, Data)
+                                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', linhas)
+        relatar(f"{n_vendas:,} vendas em {time.perf_counter() - inicio:.1f}s")
+    finally:
+        banco.restaurar_indices(pool)
+    vendas.atualizar_resumos(pool)
+    relatar(f"índices e resumos prontos em {time.perf_counter() - inicio:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=banco.CAMINHO_DB)
+    parser.add_argument("--produtos", type=int, default=1_000)
+    parser.add_argument("--usuarios", type=int, default=1_000)
+    parser.add_argument("--vendas", type=int, default=100_000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    pool = banco.PoolConexoes(args.banco)
+    banco.init_db(pool)
+    semear(pool, args.produtos, args.usuarios, args.vendas, args.semente)
+    pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Checkouts paralelos disputando o mesmo SKU com pouco estoque.
+
+Verifica que nunca há venda acima do estoque: unidades vendidas == estoque
+inicial - estoque final, estoque final >= 0 e cada pedido aceito tem suas
+linhas em vendas. Termina com código 1 se alguma invariante falhar.
+
+Uso: python benchmarks/stress_checkout.py --compradores 200 --estoque 25 --processos 4
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import vendas  # noqa: E402
+
+PRODUTO = "Shampoo Sólido"
+
+
+def comprar(pool, ids, comprador, quantidade):
+    itens = [{"produto_id": ids[PRODUTO], "Produto": PRODUTO, "Preço": 42.5,
+              "Quantidade": quantidade, "Subtotal": 42.5 * quantidade},
+             {"produto_id": ids["Polpa Hidratante"], "Produto": "Polpa Hidratante", "Preço": 56.9,
+              "Quantidade": 1, "Subtotal": 56.9}]
+    try:
+        vendas.finalizar_pedido(pool, f"comprador{comprador}", itens)
+        return "ok"
+    except vendas.EstoqueInsuficiente:
+        return "sem_estoque"
+    except sqlite3.OperationalError:
+        return "erro"
+
+
+def processo(caminho, compradores, threads, quantidade, fila):
+    pool = banco.PoolConexoes(caminho, tamanho=threads)
+    with pool.conexao() as conn:
+        ids = dict(conn.execute("SELECT Nome, id FROM produtos").fetchall())
+    resultados = []
+
+    def trabalhador(inicio):
+        for comprador in range(inicio, len(compradores), threads):
+            resultados.append(comprar(pool, ids, compradores[comprador], quantidade))
+
+    grupo = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    pool.fechar()
+    fila.put(resultados)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--compradores", type=int, default=200)
+    parser.add_argument("--estoque", type=int, default=25)
+    parser.add_argument("--quantidade", type=int, default=2, help="unidades do SKU disputado por pedido")
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads por processo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "stress.db")
+        pool = banco.PoolConexoes(caminho)
+        banco.init_db(pool)
+        with pool.transacao() as conn:
+            conn.execute("UPDATE produtos SET Estoque = ? WHERE Nome = ?", (args.estoque, PRODUTO))
+            conn.execute("UPDATE produtos SET Estoque = ? WHERE Nome = ?", (args.compradores, "Polpa Hidratante"))
+
+        fila = multiprocessing.Queue()
+        fatias = [list(range(args.compradores))[i::args.processos] for i in range(args.processos)]
+        inicio = time.perf_counter()
+        procs = [multiprocessing.Process(target=processo,
+                                         args=(caminho, fatia, args.threads, args.quantidade, fila))
+                 for fatia in fatias]
+        for p in procs:
+            p.start()
+        resultados = [r for _ in procs for r in fila.get()]
+        for p in procs:
+            p.join()
+        duracao = time.perf_counter() - inicio
+
+        with pool.conexao() as conn:
+            estoque_final = conn.execute("SELECT Estoque FROM produtos WHERE Nome = ?", (PRODUTO,)).fetchone()[0]
+            vendido = conn.execute("SELECT COALESCE(SUM(Quantidade), 0) FROM vendas WHERE Produto = ?",
+                                   (PRODUTO,)).fetchone()[0]
+            pedidos = conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0]
+            orfaos = conn.execute('''SELECT COUNT(*) FROM pedidos p
+                                     WHERE (SELECT COUNT(*) FROM vendas v WHERE v.pedido_id = p.id) != p.Itens''').fetchone()[0]
+        pool.fechar()
+
+    aceitos = resultados.count("ok")
+    print(f"{len(resultados)} checkouts em {duracao:.2f}s ({len(resultados) / duracao:.0f}/s)")
+    print(f"aceitos={aceitos} sem_estoque={resultados.count('sem_estoque')} erros={resultados.count('erro')}")
+    print(f"estoque inicial={args.estoque} vendido={vendido} final={estoque_final} pedidos={pedidos}")
+
+    falhas = []
+    if estoque_final < 0:
+        falhas.append("estoque negativo")
+    if vendido != args.estoque - estoque_final:
+        falhas.append("vendido != baixa de estoque")
+    if vendido != aceitos * args.quantidade or pedidos != aceitos:
+        falhas.append("pedidos aceitos não batem com vendas")
+    if orfaos:
+        falhas.append(f"{orfaos} pedidos com linhas faltando")
+    if resultados.count("erro"):
+        falhas.append("erros de lock")
+    if falhas:
+        print("FALHOU: " + "; ".join(falhas))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Promoção relâmpago: muitos carrinhos disputando o mesmo produto com reservas.
+
+Cada comprador tenta reservar 1 ou 2 unidades; quem consegue finaliza a
+compra, desiste (remove do carrinho) ou abandona a aba (a reserva vence e
+é varrida). Enquanto isso um auditor confere, em leituras consistentes,
+que o total mantido em reservas_total bate com as reservas e nunca passa
+do estoque. No fim: toda compra com reserva foi aceita, vendido = estoque
+inicial - final, e depois da varredura não sobra reserva.
+
+Uso: python benchmarks/stress_reservas.py --compradores 2000 --estoque 300 --processos 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import reservas  # noqa: E402
+import vendas  # noqa: E402
+
+PRODUTO = "Shampoo Sólido"
+
+
+def comprador(pool, produto_id, preco, numero, args, rnd):
+    sessao = f"p{os.getpid()}-{numero}"
+    quantidade = rnd.randint(1, 2)
+    inicio = time.perf_counter()
+    try:
+        reservas.reservar(pool, sessao, produto_id, quantidade, ttl=args.ttl)
+    except reservas.ReservaRecusada:
+        return "recusada", time.perf_counter() - inicio
+    except sqlite3.OperationalError:
+        return "erro", time.perf_counter() - inicio
+    latencia = time.perf_counter() - inicio
+
+    destino = rnd.random()
+    if destino < args.compra:
+        itens = [{"produto_id": produto_id, "Produto": PRODUTO, "Preço": preco,
+                  "Quantidade": quantidade, "Subtotal": preco * quantidade}]
+        try:
+            vendas.finalizar_pedido(pool, f"comprador{numero}", itens, sessao)
+            return "comprou", latencia
+        except vendas.EstoqueInsuficiente:
+            # Não pode acontecer: a reserva garante o estoque até vencer
+            return "compra_negada_com_reserva", latencia
+    if destino < args.compra + args.desistencia:
+        reservas.liberar(pool, sessao, produto_id)
+        return "desistiu", latencia
+    return "abandonou", latencia
+
+
+def processo(caminho, numeros, args, fila):
+    pool = banco.PoolConexoes(caminho, tamanho=args.threads)
+    with pool.conexao() as conn:
+        produto_id, preco = conn.execute("SELECT id, Preço FROM produtos WHERE Nome = ?", (PRODUTO,)).fetchone()
+    resultados = []
+
+    def trabalhador(indice):
+        rnd = random.Random(indice * 7919 + os.getpid())
+        for numero in numeros[indice::args.threads]:
+            resultados.append(comprador(pool, produto_id, preco, numero, args, rnd))
+
+    grupo = [threading.Thread(target=trabalhador, args=(i,)) for i in range(args.threads)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    pool.fechar()
+    fila.put(resultados)
+
+
+def auditar(pool, produto_id):
+    # Uma consulta só: tudo no mesmo instantâneo do WAL
+    with pool.conexao() as conn:
+        return conn.execute('''SELECT (SELECT COALESCE(SUM(quantidade), 0) FROM reservas WHERE produto_id = ?),
+                                      (SELECT COALESCE(SUM(quantidade), 0) FROM reservas_total WHERE produto_id = ?),
+                                      (SELECT Estoque FROM produtos WHERE id = ?)''',
+                            (produto_id, produto_id, produto_id)).fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--compradores", type=int, default=2_000)
+    parser.add_argument("--estoque", type=int, default=300)
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads por processo")
+    parser.add_argument("--compra", type=float, default=0.6, help="fração que finaliza a compra")
+    parser.add_argument("--desistencia", type=float, default=0.2, help="fração que remove do carrinho")
+    parser.add_argument("--ttl", type=float, default=1.0, help="prazo das reservas (s)")
+    args = parser.parse_args()
+    problemas = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "reservas.db")
+        pool = banco.PoolConexoes(caminho)
+        banco.init_db(pool)
+        with pool.transacao() as conn:
+            conn.execute("UPDATE produtos SET Estoque = ? WHERE Nome = ?", (args.estoque, PRODUTO))
+            produto_id = conn.execute("SELECT id FROM produtos WHERE Nome = ?", (PRODUTO,)).fetchone()[0]
+
+        parar = threading.Event()
+        auditorias = [0]
+        varridas = [0]
+
+        def auditor():
+            while not parar.is_set():
+                seguradas, total, estoque = auditar(pool, produto_id)
+                auditorias[0] += 1
+                if seguradas != total or seguradas > estoque:
+                    problemas.append(f"reservas {seguradas}, total {total}, estoque {estoque}")
+                time.sleep(0.01)
+
+        def varredor():
+            while not parar.wait(args.ttl / 4):
+                varridas[0] += reservas.expirar(pool)
+
+        fundo = [threading.Thread(target=auditor), threading.Thread(target=varredor)]
+        for t in fundo:
+            t.start()
+
+        fila = multiprocessing.Queue()
+        numeros = list(range(args.compradores))
+        inicio = time.perf_counter()
+        procs = [multiprocessing.Process(target=processo, args=(caminho, numeros[i::args.processos], args, fila))
+                 for i in range(args.processos)]
+        for p in procs:
+            p.start()
+        resultados = [r for _ in procs for r in fila.get()]
+        for p in procs:
+            p.join()
+        duracao = time.perf_counter() - inicio
+
+        time.sleep(args.ttl * 1.5)
+        parar.set()
+        for t in fundo:
+            t.join()
+        varridas[0] += reservas.expirar(pool)
+
+        contagem = {}
+        for desfecho, _ in resultados:
+            contagem[desfecho] = contagem.get(desfecho, 0) + 1
+        latencias = sorted(latencia * 1000 for _, latencia in resultados)
+        print(f"{len(resultados)} compradores em {duracao:.1f}s ({len(resultados) / duracao:,.0f}/s); "
+              f"reservar p50 {latencias[len(latencias) // 2]:.2f} ms, p95 {latencias[int(len(latencias) * .95)]:.2f} ms")
+        print("  " + ", ".join(f"{desfecho}={n}" for desfecho, n in sorted(contagem.items())))
+        print(f"  {auditorias[0]} auditorias durante a carga, {varridas[0]} reservas vencidas varridas")
+
+        with pool.conexao() as conn:
+            vendido = conn.execute("SELECT COALESCE(SUM(Quantidade), 0) FROM vendas WHERE produto_id = ?",
+                                   (produto_id,)).fetchone()[0]
+        seguradas, total, estoque = auditar(pool, produto_id)
+        print(f"estoque inicial={args.estoque} vendido={vendido} final={estoque} "
+              f"reservas restantes={seguradas} total mantido={total}")
+        pool.fechar()
+
+    if contagem.get("compra_negada_com_reserva"):
+        problemas.append(f"{contagem['compra_negada_com_reserva']} compras negadas apesar da reserva")
+    if contagem.get("erro"):
+        problemas.append(f"{contagem['erro']} erros de banco")
+    if vendido != args.estoque - estoque or estoque < 0:
+        problemas.append("vendido != estoque inicial - final")
+    if seguradas or total:
+        problemas.append("sobraram reservas depois da varredura")
+    if not contagem.get("recusada"):
+        problemas.append("nenhuma reserva recusada: aumente --compradores para haver disputa")
+
+    if problemas:
+        print("FALHOU: " + "; ".join(problemas[:10]))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Vários processos do app compartilhando o armazém de sessões.
+
+A cada rodada cada usuário é atendido por um processo diferente (como um
+balanceador sem afinidade): o processo lê o carrinho, confere que é a
+versão gravada na rodada anterior por outro processo e grava a próxima.
+Depois mede salvamentos/s com gravação imediata vs. adiada e confere o
+expurgo por TTL. Termina com código 1 se alguma verificação falhar.
+
+Uso: python benchmarks/stress_sessoes.py --processos 4 --usuarios 400 --rodadas 5
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import banco  # noqa: E402
+import carrinho  # noqa: E402
+import sessoes  # noqa: E402
+
+
+def montar_carrinho(usuario, versao, linhas):
+    c = carrinho.Carrinho()
+    for i in range(linhas):
+        c.adicionar(i + 1, f"Produto {i + 1}", 10 + i * 0.5, 1 + (usuario + versao + i) % 3)
+    c.adicionar(1000 + versao, f"Rodada {versao}", 1.0)
+    return c
+
+
+def rodadas(caminho, indice, processos, usuarios, total_rodadas, linhas, barreira, fila):
+    pool = banco.PoolConexoes(caminho, tamanho=2)
+    armazem = sessoes.ArmazemSessoes(sessoes.BackendSQLite(pool), intervalo=0.05)
+    erros = 0
+    for rodada in range(total_rodadas):
+        for usuario in range(usuarios):
+            if (usuario + rodada) % processos != indice:
+                continue
+            salva = armazem.ler(f"sessao:{usuario}")
+            if rodada > 0:
+                restaurado = carrinho.Carrinho.de_lista(salva["carrinho"]) if salva else None
+                if restaurado is None or (1000 + rodada - 1) not in restaurado:
+                    erros += 1
+            armazem.salvar(f"sessao:{usuario}",
+                           {"carrinho": montar_carrinho(usuario, rodada, linhas).para_lista(), "favoritos": []})
+        armazem.descarregar()
+        barreira.wait()
+    armazem.fechar()
+    pool.fechar()
+    fila.put(erros)
+
+
+def martelar(caminho, intervalo, salvamentos, chaves, linhas, fila):
+    pool = banco.PoolConexoes(caminho, tamanho=2)
+    armazem = sessoes.ArmazemSessoes(sessoes.BackendSQLite(pool), intervalo=intervalo)
+    valor = {"carrinho": montar_carrinho(0, 0, linhas).para_lista(), "favoritos": ["Shampoo Sólido"]}
+    inicio = time.perf_counter()
+    for i in range(salvamentos):
+        armazem.salvar(f"sessao:{os.getpid()}:{i % chaves}", valor)
+    armazem.fechar()
+    fila.put((time.perf_counter() - inicio, armazem.estatisticas["lotes"]))
+    pool.fechar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", type=int, default=4)
+    parser.add_argument("--usuarios", type=int, default=400)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--linhas", type=int, default=20, help="linhas por carrinho")
+    parser.add_argument("--salvamentos", type=int, default=2000, help="salvamentos por processo na medição")
+    args = parser.parse_args()
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho = os.path.join(tmp, "sessoes.db")
+        pool = banco.PoolConexoes(caminho)
+        banco.init_db(pool)
+
+        # Consistência entre processos
+        fila = multiprocessing.Queue()
+        barreira = multiprocessing.Barrier(args.processos)
+        procs = [multiprocessing.Process(target=rodadas,
+                                         args=(caminho, i, args.processos, args.usuarios, args.rodadas,
+                                               args.linhas, barreira, fila))
+                 for i in range(args.processos)]
+        for p in procs:
+            p.start()
+        erros = sum(fila.get() for _ in procs)
+        for p in procs:
+            p.join()
+        print(f"{args.usuarios} usuários x {args.rodadas} rodadas em {args.processos} processos: "
+              f"{erros} carrinhos desatualizados")
+        if erros:
+            falhas.append("carrinho de outra rodada lido entre processos")
+
+        # Vazão: gravação imediata vs. adiada
+        for nome, intervalo in (("imediata", 0), ("adiada 0.2s", 0.2)):
+            fila = multiprocessing.Queue()
+            procs = [multiprocessing.Process(target=martelar,
+                                             args=(caminho, intervalo, args.salvamentos, 50, args.linhas, fila))
+                     for _ in range(args.processos)]
+            for p in procs:
+                p.start()
+            resultados = [fila.get() for _ in procs]
+            for p in procs:
+                p.join()
+            duracao = max(r[0] for r in resultados)
+            lotes = sum(r[1] for r in resultados)
+            print(f"gravação {nome:<12} {args.salvamentos * args.processos / duracao:>10.0f} salvamentos/s"
+                  f"   {lotes:>6} transações")
+
+        # Tamanho da codificação
+        c = montar_carrinho(0, 0, args.linhas)
+        print(f"carrinho de {len(c)} linhas: pickle da lista de dicts "
+              f"{len(pickle.dumps(c.itens_pedido()))} B, codificado {len(sessoes.codificar(c.para_lista()))} B")
+
+        # TTL
+        armazem = sessoes.ArmazemSessoes(sessoes.BackendSQLite(pool), intervalo=0, ttl=3600)
+        antigo = time.time() - 7200
+        abandonados = [(f"abandonado:{i}", sessoes.codificar({"carrinho": []}), antigo) for i in range(100)]
+        armazem.backend.gravar(abandonados)
+        if armazem.ler("abandonado:0") is not None:
+            falhas.append("sessão expirada ainda é lida")
+        removidos = armazem.expirar()
+        print(f"expurgo: {removidos} sessões abandonadas removidas")
+        if removidos != 100:
+            falhas.append("expurgo não removeu as sessões abandonadas")
+        armazem.fechar()
+        pool.fechar()
+
+    if falhas:
+        print("FALHOU: " + "; ".join(falhas))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# ========== CARRINHO DE COMPRAS ==========
+class ItemCarrinho:
+    __slots__ = ("produto_id", "nome", "centavos", "quantidade")
+
+    def __init__(self, produto_id, nome, centavos, quantidade):
+        self.produto_id = produto_id
+        self.nome = nome
+        self.centavos = centavos
+        self.quantidade = quantidade
+
+    @property
+    def preco(self):
+        return self.centavos / 100
+
+    @property
+    def subtotal(self):
+        return self.centavos * self.quantidade / 100
+
+
+def _centavos(preco):
+    return int(round(float(preco) * 100))
+
+
+class Carrinho:
+    """Carrinho indexado pelo id do produto.
+
+    Adicionar, remover e alterar quantidade são O(1) e o total é mantido a
+    cada operação (em centavos, sem acumular erro de ponto flutuante), então
+    renderizar o carrinho não precisa somar as linhas de novo.
+    """
+
+    __slots__ = ("_itens", "_total_centavos", "_quantidade_total")
+
+    def __init__(self):
+        self._itens = {}
+        self._total_centavos = 0
+        self._quantidade_total = 0
+
+    # ----- operações -----
+    def adicionar(self, produto_id, nome, preco, quantidade=1):
+        if quantidade <= 0:
+            raise ValueError("A quantidade deve ser positiva")
+        item = self._itens.get(produto_id)
+        if item is None:
+            item = self._itens[produto_id] = ItemCarrinho(produto_id, nome, _centavos(preco), 0)
+        item.quantidade += quantidade
+        self._total_centavos += item.centavos * quantidade
+        self._quantidade_total += quantidade
+        return item
+
+    def remover(self, produto_id):
+        item = self._itens.pop(produto_id, None)
+        if item is not None:
+            self._total_centavos -= item.centavos * item.quantidade
+            self._quantidade_total -= item.quantidade
+        return item
+
+    def atualizar(self, produto_id, quantidade):
+        if quantidade <= 0:
+            return self.remover(produto_id)
+        item = self._itens[produto_id]
+        diferenca = quantidade - item.quantidade
+        item.quantidade = quantidade
+        self._total_centavos += item.centavos * diferenca
+        self._quantidade_total += diferenca
+        return item
+
+    def limpar(self):
+        self._itens.clear()
+        self._total_centavos = 0
+        self._quantidade_total = 0
+
+    def validar_precos(self, precos):
+        """Confere os preços com o catálogo (`precos`: id -> preço atual).
+
+        Atualiza as linhas cujo preço mudou e tira as de produtos que não
+        existem mais. Devolve (alterados, removidos) como listas de nomes.
+        """
+        alterados, removidos = [], []
+        for produto_id in list(self._itens):
+            item = self._itens[produto_id]
+            if produto_id not in precos:
+                self.remover(produto_id)
+                removidos.append(item.nome)
+                continue
+            centavos = _centavos(precos[produto_id])
+            if centavos != item.centavos:
+                self._total_centavos += (centavos - item.centavos) * item.quantidade
+                item.centavos = centavos
+                alterados.append(item.nome)
+        return alterados, removidos
+
+    # ----- consulta -----
+    @property
+    def total(self):
+        return self._total_centavos / 100
+
+    @property
+    def quantidade_total(self):
+        return self._quantidade_total
+
+    def quantidade(self, produto_id):
+        item = self._itens.get(produto_id)
+        return item.quantidade if item is not None else 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __bool__(self):
+        return bool(self._itens)
+
+    def __iter__(self):
+        return iter(self._itens.values())
+
+    def __contains__(self, produto_id):
+        return produto_id in self._itens
+
+    def itens_pedido(self):
+        # Formato esperado por vendas.finalizar_pedido
+        return [{"produto_id": item.produto_id, "Produto": item.nome, "Preço": item.preco,
+                 "Quantidade": item.quantidade, "Subtotal": item.subtotal}
+                for item in self._itens.values()]
+
+    # ----- serialização -----
+    def para_lista(self):
+        # Forma compacta: [[id, nome, centavos, quantidade], ...]
+        return [[item.produto_id, item.nome, item.centavos, item.quantidade]
+                for item in self._itens.values()]
+
+    @classmethod
+    def de_lista(cls, linhas):
+        carrinho = cls()
+        for produto_id, nome, centavos, quantidade in linhas:
+            item = carrinho._itens[produto_id] = ItemCarrinho(produto_id, nome, centavos, quantidade)
+            carrinho._total_centavos += item.centavos * quantidade
+            carrinho._quantidade_total += quantidade
+        return carrinho
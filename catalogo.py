@@ -0,0 +1,204 @@
+import re
+import threading
+
+import pandas as pd
+
+
+# ========== CACHE DO CATÁLOGO ==========
+class CacheCatalogo:
+    """Cópia em memória da tabela produtos, compartilhada entre sessões.
+
+    A cada leitura consulta apenas `catalogo_versao` (uma linha, mantida por
+    triggers em produtos) e só relê a tabela quando a versão mudou. O
+    estoque fica de fora: muda a cada venda e não altera a versão, então é
+    lido direto do banco (`reservas.disponiveis`). O DataFrame devolvido é
+    indexado por id e compartilhado: quem precisar alterá-lo deve usar
+    `.copy()`.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.acertos = 0
+        self.falhas = 0
+        self._versao = None
+        self._produtos = None
+        self._lock = threading.Lock()
+
+    def produtos(self):
+        with self.pool.conexao() as conn:
+            versao = conn.execute("SELECT versao FROM catalogo_versao").fetchone()[0]
+            with self._lock:
+                if versao == self._versao:
+                    self.acertos += 1
+                    return self._produtos
+
+                # Versão e dados lidos no mesmo snapshot
+                with self.pool.transacao() as snap:
+                    versao = snap.execute("SELECT versao FROM catalogo_versao").fetchone()[0]
+                    produtos = pd.read_sql('''SELECT id, Nome, Preço, Categoria, Descricao, Imagem, sku
+                                                FROM produtos''', snap)
+                self._versao = versao
+                self._produtos = produtos.set_index("id", drop=False)
+                self.falhas += 1
+                return self._produtos
+
+    def por_ids(self, ids):
+        """Produtos de `ids`, na ordem pedida; ids fora do catálogo ficam de fora."""
+        produtos = self.produtos()
+        presentes = [produto_id for produto_id in ids if produto_id in produtos.index]
+        return produtos.loc[presentes].reset_index(drop=True)
+
+    def precos(self, ids):
+        """Preço atual de cada id de `ids` que ainda está no catálogo (id -> preço)."""
+        produtos = self.produtos()
+        return {produto_id: float(produtos.at[produto_id, "Preço"])
+                for produto_id in ids if produto_id in produtos.index}
+
+    def invalidar(self):
+        with self._lock:
+            self._versao = None
+            self._produtos = None
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / total if total else 0.0,
+            "versao": self._versao,
+        }
+
+
+# ========== CONSULTA PAGINADA DO CATÁLOGO ==========
+TAMANHO_PAGINA = 20
+
+# Colunas de ordenação; todas terminam em id para o cursor ser único
+ORDENACOES = {
+    "Padrão": (("id", "ASC"),),
+    "Preço Crescente": (("Preço", "ASC"), ("id", "ASC")),
+    "Preço Decrescente": (("Preço", "DESC"), ("id", "DESC")),
+    "Mais Estoque": (("Estoque", "DESC"), ("id", "DESC")),
+}
+# Estoque muda a cada venda e reserva: entre uma página e outra o produto
+# cruzaria o cursor de keyset (pulado ou repetido), então essas ordenações
+# paginam por offset, como a busca
+COLUNAS_VOLATEIS = {"Estoque"}
+
+
+def _filtros_sql(categoria, preco_min, preco_max):
+    condicoes = ["Preço BETWEEN ? AND ?"]
+    params = [preco_min, preco_max]
+    if categoria and categoria != "Todas":
+        condicoes.insert(0, "Categoria = ?")
+        params.insert(0, categoria)
+    return condicoes, params
+
+
+def facetas_catalogo(pool):
+    with pool.conexao() as conn:
+        categorias = [linha[0] for linha in conn.execute(
+            "SELECT DISTINCT Categoria FROM produtos ORDER BY Categoria")]
+        preco_min, preco_max = conn.execute(
+            "SELECT MIN(Preço), MAX(Preço) FROM produtos").fetchone()
+    return categorias, float(preco_min or 0.0), float(preco_max or 0.0)
+
+
+def contar_produtos(pool, categoria, preco_min, preco_max):
+    condicoes, params = _filtros_sql(categoria, preco_min, preco_max)
+    with pool.conexao() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM produtos WHERE {' AND '.join(condicoes)}",
+                            params).fetchone()[0]
+
+
+def pagina_produtos(pool, categoria, preco_min, preco_max, ordenacao="Padrão",
+                    apos=None, tamanho=TAMANHO_PAGINA):
+    """Devolve (DataFrame da página, cursor da próxima página ou None).
+
+    Paginação por keyset: `apos` é o cursor devolvido pela página anterior,
+    com os valores das colunas de ordenação da última linha exibida. Em
+    ordenações por colunas de COLUNAS_VOLATEIS o cursor é o offset.
+    """
+    colunas = ORDENACOES[ordenacao]
+    nomes = [coluna for coluna, _ in colunas]
+    por_offset = not COLUNAS_VOLATEIS.isdisjoint(nomes)
+    offset = (apos or 0) if por_offset else 0
+    condicoes, params = _filtros_sql(categoria, preco_min, preco_max)
+    if apos is not None and not por_offset:
+        operador = ">" if colunas[0][1] == "ASC" else "<"
+        condicoes.append(f"({', '.join(nomes)}) {operador} ({', '.join('?' * len(nomes))})")
+        params.extend(apos)
+
+    ordem = ", ".join(f"{coluna} {direcao}" for coluna, direcao in colunas)
+    sql = f'''SELECT * FROM produtos
+              WHERE {' AND '.join(condicoes)}
+              ORDER BY {ordem}
+              LIMIT ? OFFSET ?'''
+    with pool.conexao() as conn:
+        cursor = conn.execute(sql, params + [tamanho + 1, offset])
+        campos = [descricao[0] for descricao in cursor.description]
+        linhas = cursor.fetchall()
+
+    proximo = None
+    if len(linhas) > tamanho:
+        linhas = linhas[:tamanho]
+        if por_offset:
+            proximo = offset + tamanho
+        else:
+            ultima = dict(zip(campos, linhas[-1]))
+            proximo = tuple(ultima[coluna] for coluna in nomes)
+    return pd.DataFrame.from_records(linhas, columns=campos), proximo
+
+
+# ========== BUSCA TEXTUAL ==========
+# Peso de cada coluna do produtos_fts no bm25: Nome > Descricao > Categoria
+PESOS_BUSCA = (10.0, 2.0, 1.0)
+
+
+def expressao_busca(termo):
+    # Cada palavra vira um prefixo entre aspas ("polp"*), combinadas com AND.
+    # As aspas neutralizam operadores do FTS5 digitados pelo usuário.
+    palavras = re.findall(r"\w+", termo or "")
+    return " ".join(f'"{palavra}"*' for palavra in palavras)
+
+
+def _busca_sql(termo, categoria, preco_min, preco_max):
+    condicoes, params = _filtros_sql(categoria, preco_min, preco_max)
+    condicoes = ["produtos_fts MATCH ?"] + [f"p.{condicao}" for condicao in condicoes]
+    return condicoes, [expressao_busca(termo)] + params
+
+
+def contar_busca(pool, termo, categoria="Todas", preco_min=float("-inf"), preco_max=float("inf")):
+    if not expressao_busca(termo):
+        return 0
+    condicoes, params = _busca_sql(termo, categoria, preco_min, preco_max)
+    with pool.conexao() as conn:
+        return conn.execute(f'''SELECT COUNT(*) FROM produtos_fts
+                                JOIN produtos p ON p.id = produtos_fts.rowid
+                                WHERE {' AND '.join(condicoes)}''', params).fetchone()[0]
+
+
+def buscar_produtos(pool, termo, categoria="Todas", preco_min=float("-inf"), preco_max=float("inf"),
+                    apos=None, tamanho=TAMANHO_PAGINA):
+    """Busca ordenada por relevância (bm25); mesmo contrato de `pagina_produtos`.
+
+    Ranking não tem chave estável para keyset, então aqui o cursor é o offset.
+    """
+    if not expressao_busca(termo):
+        return pd.DataFrame(), None
+    condicoes, params = _busca_sql(termo, categoria, preco_min, preco_max)
+    offset = apos or 0
+    pesos = ", ".join(str(peso) for peso in PESOS_BUSCA)
+    with pool.conexao() as conn:
+        cursor = conn.execute(f'''SELECT p.* FROM produtos_fts
+                                  JOIN produtos p ON p.id = produtos_fts.rowid
+                                  WHERE {' AND '.join(condicoes)}
+                                  ORDER BY bm25(produtos_fts, {pesos})
+                                  LIMIT ? OFFSET ?''', params + [tamanho + 1, offset])
+        campos = [descricao[0] for descricao in cursor.description]
+        linhas = cursor.fetchall()
+
+    proximo = None
+    if len(linhas) > tamanho:
+        linhas = linhas[:tamanho]
+        proximo = offset + tamanho
+    return pd.DataFrame.from_records(linhas, columns=campos), proximo
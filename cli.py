@@ -0,0 +1,162 @@
+"""Importação e exportação em massa do banco da Unifolhas.
+
+Exemplos:
+    python cli.py importar fornecedor.csv
+    python cli.py importar catalogo.parquet --lote 20000
+    python cli.py --banco novo.db importar catalogo.parquet --fora-do-ar
+    python cli.py exportar produtos produtos.parquet
+    python cli.py exportar vendas vendas.csv --inicio 2024-01-01 --fim 2024-12-31
+    python cli.py restaurar-indices
+    python cli.py analitico sincronizar --diretorio analitico
+    python cli.py tarefas executar
+    python cli.py recomendacoes atualizar
+"""
+import argparse
+import sys
+import time
+
+import analitico
+import banco
+import recomendacoes
+import rotinas  # noqa: F401 (registra todos os tipos de tarefa)
+import tarefas
+import transferencia
+import vendas
+
+
+def _progresso():
+    ultimo = [0.0]
+
+    def informar(linhas, segundos):
+        # No máximo uma linha de progresso por segundo
+        if segundos - ultimo[0] >= 1:
+            ultimo[0] = segundos
+            print(f"  {linhas:>12,} linhas  {linhas / segundos:>10,.0f} linhas/s", file=sys.stderr)
+    return informar
+
+
+def importar(pool, args):
+    estatisticas = transferencia.importar_produtos(pool, args.arquivo, args.formato, args.lote,
+                                                   adiar=args.adiar,
+                                                   progresso=_progresso())
+    print(f"{estatisticas['lidas']:,} linhas lidas, {estatisticas['importadas']:,} importadas, "
+          f"{estatisticas['rejeitadas']:,} rejeitadas em {estatisticas['segundos']:.1f}s "
+          f"({estatisticas['linhas_por_segundo']:,.0f} linhas/s)")
+    if estatisticas["indices_adiados"]:
+        print(f"{estatisticas['indices_adiados']} índices/triggers recriados em "
+              f"{estatisticas['segundos_indices']:.1f}s")
+
+
+def exportar(pool, args):
+    formato = args.formato or transferencia.formato_do_arquivo(args.arquivo)
+    inicio = time.perf_counter()
+    if args.tabela == "produtos":
+        linhas = transferencia.exportar_produtos(pool, args.arquivo, formato, args.lote)
+    else:
+        linhas = vendas.exportar_dados_completos(pool, args.arquivo, formato, args.inicio, args.fim,
+                                                 args.usuario, args.lote)
+    duracao = time.perf_counter() - inicio
+    print(f"{linhas:,} linhas exportadas em {duracao:.1f}s ({linhas / max(duracao, 1e-9):,.0f} linhas/s)")
+
+
+def restaurar(pool, args):
+    print(f"{banco.restaurar_indices(pool)} índices/triggers recriados")
+
+
+def espelhar(pool, args):
+    espelho = analitico.Espelho(args.diretorio)
+    inicio = time.perf_counter()
+    if args.acao == "reconstruir":
+        linhas = espelho.reconstruir(pool)
+    else:
+        linhas = espelho.sincronizar(pool)
+    tamanho = espelho.tamanho()
+    print(f"{linhas:,} vendas copiadas em {time.perf_counter() - inicio:.1f}s; espelho com "
+          f"{tamanho['meses']} meses, {tamanho['arquivos']} arquivos, {tamanho['bytes'] / 2**20:.1f} MiB")
+
+
+def fila(pool, args):
+    if args.acao == "reprocessar":
+        print(f"{tarefas.reenfileirar_falhas(pool, args.tipo)} tarefas devolvidas à fila")
+    elif args.acao == "executar":
+        # Sem threads: executa aqui até a fila esvaziar
+        trabalhadores = tarefas.Trabalhadores(pool, quantidade=0)
+        inicio = time.perf_counter()
+        executadas = trabalhadores.executar_pendentes()
+        print(f"{executadas} tarefas em {time.perf_counter() - inicio:.1f}s: {trabalhadores.estatisticas}")
+    estado = tarefas.profundidade(pool)
+    print(f"pendentes {estado['pendente']}, executando {estado['executando']}, feitas {estado['feita']}, "
+          f"falharam {estado['falhou']}; atraso {estado['atraso_s']:.1f}s")
+    for tipo, quantidade in sorted(estado["pendentes_por_tipo"].items()):
+        print(f"  {tipo:<20} {quantidade:>8} pendentes")
+
+
+def recomendar(pool, args):
+    inicio = time.perf_counter()
+    if args.acao == "reconstruir":
+        print(f"índice reconstruído para {recomendacoes.reconstruir(pool):,} produtos "
+              f"em {time.perf_counter() - inicio:.1f}s")
+    else:
+        print(f"{recomendacoes.atualizar(pool):,} vendas novas levadas ao índice "
+              f"em {time.perf_counter() - inicio:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--banco", default=banco.CAMINHO_DB, help="arquivo SQLite (padrão: UNIFOLHAS_DB)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_importar = comandos.add_parser("importar", help="upsert de produtos por SKU a partir de CSV/Parquet")
+    p_importar.add_argument("arquivo")
+    p_importar.add_argument("--formato", choices=("csv", "parquet"), help="padrão: pela extensão")
+    p_importar.add_argument("--lote", type=int, default=transferencia.TAMANHO_LOTE)
+    adiamento = p_importar.add_mutually_exclusive_group()
+    adiamento.add_argument("--fora-do-ar", dest="adiar", action="store_true", default=None,
+                           help="banco sem o app no ar: retira índices e triggers durante a carga")
+    adiamento.add_argument("--sem-adiar-indices", dest="adiar", action="store_false",
+                           help="mantém índices e triggers mesmo num banco vazio")
+    p_importar.set_defaults(executar=importar)
+
+    p_exportar = comandos.add_parser("exportar", help="exporta produtos ou vendas em lotes")
+    p_exportar.add_argument("tabela", choices=("produtos", "vendas"))
+    p_exportar.add_argument("arquivo")
+    p_exportar.add_argument("--formato", choices=("csv", "parquet"), help="padrão: pela extensão")
+    p_exportar.add_argument("--lote", type=int, default=10_000)
+    p_exportar.add_argument("--inicio", help="vendas a partir de AAAA-MM-DD")
+    p_exportar.add_argument("--fim", help="vendas até AAAA-MM-DD (inclusive)")
+    p_exportar.add_argument("--usuario", help="vendas de um usuário")
+    p_exportar.set_defaults(executar=exportar)
+
+    p_restaurar = comandos.add_parser("restaurar-indices",
+                                      help="recria índices deixados de fora por uma importação interrompida")
+    p_restaurar.set_defaults(executar=restaurar)
+
+    p_analitico = comandos.add_parser("analitico", help="atualiza o espelho colunar (Parquet) das vendas")
+    p_analitico.add_argument("acao", choices=("sincronizar", "reconstruir"))
+    p_analitico.add_argument("--diretorio", default=analitico.DIRETORIO or "analitico",
+                             help="padrão: UNIFOLHAS_ANALITICO ou ./analitico")
+    p_analitico.set_defaults(executar=espelhar)
+
+    p_tarefas = comandos.add_parser("tarefas", help="fila de tarefas em segundo plano")
+    p_tarefas.add_argument("acao", choices=("status", "executar", "reprocessar"))
+    p_tarefas.add_argument("--tipo", help="reprocessar só as falhas deste tipo")
+    p_tarefas.set_defaults(executar=fila)
+
+    p_recomendacoes = comandos.add_parser("recomendacoes", help="índice de \"quem comprou também comprou\"")
+    p_recomendacoes.add_argument("acao", choices=("atualizar", "reconstruir"))
+    p_recomendacoes.set_defaults(executar=recomendar)
+
+    args = parser.parse_args(argv)
+    pool = banco.PoolConexoes(args.banco)
+    try:
+        # Sem os produtos de exemplo: num banco novo entraria lixo na importação
+        banco.init_db(pool, exemplos=False)
+        args.executar(pool, args)
+    finally:
+        pool.fechar()
+
+
+if __name__ == "__main__":
+    main()
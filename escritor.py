@@ -0,0 +1,277 @@
+import os
+import pickle
+import queue
+import threading
+from contextlib import contextmanager
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# ========== CONFIGURAÇÕES ==========
+# "host:porta" do serviço de escrita; vazio = cada processo grava direto no banco
+ENDERECO = os.environ.get("UNIFOLHAS_ESCRITOR", "")
+# Chave compartilhada entre o serviço e os processos do app (autentica a conexão)
+CHAVE = os.environ.get("UNIFOLHAS_ESCRITOR_CHAVE", "")
+# Operações gravadas na mesma transação, cada uma no seu SAVEPOINT
+MAX_LOTE = 64
+
+_OPERACOES = {}
+
+
+def operacao(nome):
+    """Registra uma função de escrita (pool, *args) que pode passar pelo serviço (decorador).
+
+    A função continua podendo ser chamada direto; registrada, ela também
+    roda no processo do serviço de escrita, então argumentos, retorno e
+    exceções precisam ser serializáveis com pickle.
+    """
+    def registrar(funcao):
+        _OPERACOES[nome] = funcao
+        return funcao
+    return registrar
+
+
+def endereco(texto):
+    host, _, porta = texto.rpartition(":")
+    return host or "127.0.0.1", int(porta)
+
+
+def chave_autenticacao(chave):
+    """`chave` em bytes para o authkey; recusa chave vazia.
+
+    Os pedidos e respostas são desserializados com pickle, e sem authkey
+    qualquer um que alcance a porta poderia mandar um objeto que executa
+    código ao ser lido.
+    """
+    if not chave:
+        raise ValueError("chave do serviço de escrita vazia: defina UNIFOLHAS_ESCRITOR_CHAVE "
+                         "(implantacao.py gera uma a cada execução)")
+    return chave.encode()
+
+
+# ========== EXECUÇÃO NO PRÓPRIO PROCESSO ==========
+class Local:
+    """Executa as operações direto no pool do processo (um processo só do app)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def executar(self, nome, *args, **kwargs):
+        return _OPERACOES[nome](self.pool, *args, **kwargs)
+
+
+# ========== CLIENTE DO SERVIÇO ==========
+class Remoto:
+    """Manda as operações ao serviço de escrita; mesma interface de `Local`.
+
+    Cada thread pega uma conexão emprestada por chamada. Se o serviço
+    reiniciou, a conexão quebrada é descartada e o pedido vai por uma nova
+    (só quando o envio falhou: depois de enviado, a operação pode ter sido
+    gravada, então o erro sobe).
+    """
+
+    def __init__(self, endereco_servico, chave):
+        self.endereco = endereco(endereco_servico)
+        self.chave = chave_autenticacao(chave)
+        self._livres = queue.LifoQueue()
+
+    def _conectar(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            return Client(self.endereco, authkey=self.chave)
+
+    def executar(self, nome, *args, **kwargs):
+        conn = self._conectar()
+        try:
+            conn.send((nome, args, kwargs))
+        except OSError:
+            conn.close()
+            conn = Client(self.endereco, authkey=self.chave)
+            conn.send((nome, args, kwargs))
+        try:
+            situacao, valor = conn.recv()
+        except BaseException:
+            conn.close()
+            raise
+        self._livres.put(conn)
+        if situacao == "erro":
+            raise valor
+        return valor
+
+
+# ========== SERVIÇO ==========
+class Servico:
+    """Único processo que grava no banco quando o app roda em vários processos.
+
+    Cada conexão de cliente tem uma thread que só recebe pedidos e os põe na
+    fila; uma thread só executa, então as escritas saem serializadas sem
+    disputar o lock do SQLite. O que chegou junto vai numa transação (até
+    MAX_LOTE operações), cada operação no seu SAVEPOINT: uma que falha
+    (estoque insuficiente, reserva recusada) desfaz só o que ela fez. As
+    respostas só saem depois do COMMIT.
+
+    Outras threads do processo (a fila de tarefas) gravam por `vez()`, ou
+    por um `PoolServico`: a transação delas entra na mesma fila e a thread
+    de escrita espera, entre dois lotes, até ela terminar. Leituras longas
+    (varredura das cestas, cópia da réplica) rodam nessas threads sem
+    segurar os pedidos; só a gravação final disputa a vez.
+    """
+
+    def __init__(self, pool, endereco_servico, chave, depois_do_lote=None):
+        self.pool = pool
+        # Chamado na thread de escrita depois de responder cada lote
+        self.depois_do_lote = depois_do_lote
+        self.estatisticas = {"operacoes": 0, "lotes": 0, "erros": 0}
+        self._fila = queue.Queue()
+        self._listener = Listener(endereco(endereco_servico), authkey=chave_autenticacao(chave))
+        self._parar = threading.Event()
+        self._threads = [threading.Thread(target=self._aceitar, name="escritor-aceitar", daemon=True),
+                         threading.Thread(target=self._gravar, name="escritor-gravar", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def fechar(self):
+        self._parar.set()
+        self._fila.put(None)
+        self._listener.close()
+
+    @contextmanager
+    def vez(self):
+        """Espera a vez na fila de escrita; enquanto dura, a thread de escrita não grava."""
+        vez = _Vez()
+        self._fila.put(vez)
+        while not vez.concedida.wait(0.5):
+            if self._parar.is_set():
+                raise RuntimeError("serviço de escrita fechado")
+        try:
+            yield
+        finally:
+            vez.devolvida.set()
+
+    def _aceitar(self):
+        while not self._parar.is_set():
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Listener fechado, ou cliente que não passou na autenticação
+                continue
+            threading.Thread(target=self._receber, args=(conn,), daemon=True).start()
+
+    def _receber(self, conn):
+        with conn:
+            while True:
+                try:
+                    pedido = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self._fila.put((pedido, conn))
+
+    def _gravar(self):
+        while not self._parar.is_set():
+            primeiro = self._fila.get()
+            if primeiro is None:
+                return
+            if isinstance(primeiro, _Vez):
+                primeiro.ceder()
+                continue
+            lote, vez = [primeiro], None
+            while len(lote) < MAX_LOTE:
+                try:
+                    proximo = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    self._parar.set()
+                    break
+                if isinstance(proximo, _Vez):
+                    # Fecha o lote aqui; a transação da outra thread vem em seguida
+                    vez = proximo
+                    break
+                lote.append(proximo)
+            respostas = self._executar_lote([pedido for pedido, _ in lote])
+            for (_, conn), resposta in zip(lote, respostas):
+                self._responder(conn, resposta)
+            if vez is not None:
+                vez.ceder()
+            if self.depois_do_lote:
+                self.depois_do_lote()
+
+    @staticmethod
+    def _responder(conn, resposta):
+        try:
+            try:
+                conn.send(resposta)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                # Retorno ou exceção sem pickle: o cliente recebe pelo menos o texto
+                conn.send(("erro", RuntimeError(repr(resposta[1]))))
+        except OSError:
+            # Cliente foi embora
+            pass
+
+    def _executar_lote(self, pedidos):
+        respostas = []
+        try:
+            with self.pool.transacao(imediata=True) as conn:
+                for nome, args, kwargs in pedidos:
+                    conn.execute("SAVEPOINT operacao")
+                    try:
+                        respostas.append(("ok", _OPERACOES[nome](self.pool, *args, **kwargs)))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO operacao")
+                        respostas.append(("erro", e))
+                        self.estatisticas["erros"] += 1
+                    conn.execute("RELEASE operacao")
+        except Exception as e:
+            # COMMIT (ou BEGIN) falhou: nada do lote foi gravado
+            respostas = [("erro", e)] * len(pedidos)
+        self.estatisticas["operacoes"] += len(pedidos)
+        self.estatisticas["lotes"] += 1
+        return respostas
+
+
+class _Vez:
+    # Pedido de vez de outra thread: a de escrita concede e espera a devolução
+    def __init__(self):
+        self.concedida = threading.Event()
+        self.devolvida = threading.Event()
+
+    def ceder(self):
+        self.concedida.set()
+        self.devolvida.wait()
+
+
+# ========== POOL DAS OUTRAS THREADS DO SERVIÇO ==========
+class PoolServico:
+    """Pool para threads do processo do serviço que não são a de escrita.
+
+    Mesma interface de banco.PoolConexoes: leituras vão direto ao pool e
+    cada `transacao(imediata=True)` roda na vez cedida pela thread de
+    escrita (`Servico.vez`), então o processo continua gravando uma
+    transação por vez e ninguém espera o lock do SQLite.
+    """
+
+    def __init__(self, servico):
+        self.servico = servico
+        self.pool = servico.pool
+        self._local = threading.local()
+
+    def __getattr__(self, nome):
+        return getattr(self.pool, nome)
+
+    def conexao(self):
+        return self.pool.conexao()
+
+    @contextmanager
+    def transacao(self, imediata=False):
+        if not imediata or getattr(self._local, "com_vez", False):
+            # Leitura, ou transação aninhada numa que já tem a vez
+            with self.pool.transacao(imediata) as conn:
+                yield conn
+            return
+        with self.servico.vez():
+            self._local.com_vez = True
+            try:
+                with self.pool.transacao(imediata=True) as conn:
+                    yield conn
+            finally:
+                self._local.com_vez = False
@@ -0,0 +1,72 @@
+import pandas as pd
+
+import escritor
+
+
+# ========== FAVORITOS ==========
+# Uma linha por (usuário, produto) na tabela favoritos; cada clique em
+# favoritar/remover grava só aquela linha.
+def _id_usuario(conn, usuario):
+    # Quem entrou sem cadastro ganha um registro em usuarios no primeiro favorito
+    conn.execute("INSERT OR IGNORE INTO usuarios (nome) VALUES (?)", (usuario,))
+    return conn.execute("SELECT id FROM usuarios WHERE nome = ?", (usuario,)).fetchone()[0]
+
+
+@escritor.operacao("cadastrar")
+def cadastrar(pool, usuario, email):
+    # Cadastro pela barra lateral; nome já existente é mantido como está
+    with pool.transacao() as conn:
+        conn.execute("INSERT OR IGNORE INTO usuarios (nome, email) VALUES (?, ?)", (usuario, email))
+
+
+def carregar(pool, usuario):
+    """Ids dos produtos favoritos de `usuario`, como set."""
+    with pool.conexao() as conn:
+        return {linha[0] for linha in conn.execute(
+            '''SELECT produto_id FROM favoritos
+               WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)''', (usuario,))}
+
+
+@escritor.operacao("favoritar")
+def adicionar(pool, usuario, produto_ids):
+    with pool.transacao() as conn:
+        usuario_id = _id_usuario(conn, usuario)
+        conn.executemany("INSERT OR IGNORE INTO favoritos (usuario_id, produto_id) VALUES (?, ?)",
+                         [(usuario_id, produto_id) for produto_id in produto_ids])
+
+
+@escritor.operacao("desfavoritar")
+def remover(pool, usuario, produto_id):
+    with pool.transacao() as conn:
+        conn.execute('''DELETE FROM favoritos
+                        WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                          AND produto_id = ?''', (usuario, produto_id))
+
+
+def produtos_favoritos(pool, usuario, cache=None):
+    # Um join pela chave primária de favoritos, mais recentes primeiro; com
+    # `cache` (catalogo.CacheCatalogo) o banco só dá a ordem dos ids
+    if cache is not None:
+        with pool.conexao() as conn:
+            ids = [linha[0] for linha in conn.execute(
+                '''SELECT produto_id FROM favoritos
+                   WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                   ORDER BY created_at DESC, produto_id''', (usuario,))]
+        return cache.por_ids(ids)
+    with pool.conexao() as conn:
+        return pd.read_sql('''SELECT p.* FROM favoritos f
+                              JOIN produtos p ON p.id = f.produto_id
+                              WHERE f.usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                              ORDER BY f.created_at DESC, p.id''',
+                           conn, params=(usuario,))
+
+
+def mais_favoritados(pool, limite=10):
+    with pool.conexao() as conn:
+        return pd.read_sql('''SELECT p.Nome AS Produto, f.Favoritos
+                              FROM (SELECT produto_id, COUNT(*) AS Favoritos
+                                    FROM favoritos GROUP BY produto_id) f
+                              JOIN produtos p ON p.id = f.produto_id
+                              ORDER BY f.Favoritos DESC, p.Nome
+                              LIMIT ?''',
+                           conn, params=(limite,))
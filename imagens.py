@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+
+from PIL import Image
+
+# ========== CONFIGURAÇÕES DAS IMAGENS ==========
+DIRETORIO_CACHE = os.environ.get("UNIFOLHAS_CACHE_IMAGENS", ".cache_imagens")
+# Diretório com cópias locais das imagens (modo offline / fixtures)
+DIRETORIO_LOCAL = os.environ.get("UNIFOLHAS_IMAGENS_LOCAIS")
+OFFLINE = os.environ.get("UNIFOLHAS_OFFLINE") == "1"
+
+LIMITE_DISCO_BYTES = 256 * 1024 * 1024
+ITENS_MEMORIA = 1024
+TIMEOUT_DOWNLOAD = 5
+# Fonte que falhou não é tentada de novo por este tempo (s)
+ESPERA_APOS_FALHA = 300
+
+
+def nome_local(fonte):
+    # Nome do arquivo que representa uma URL dentro de DIRETORIO_LOCAL
+    return hashlib.sha256(fonte.encode("utf-8")).hexdigest()[:32]
+
+
+# ========== CACHE DE MINIATURAS ==========
+class CacheImagens:
+    """Miniaturas das imagens de produto em memória e em disco.
+
+    Cada imagem original é baixada (ou lida do diretório local) uma única
+    vez e reduzida para a largura pedida. As miniaturas ficam em disco
+    endereçadas pelo hash do conteúdo original, com um pequeno arquivo de
+    referência por fonte, e o disco é limitado a `limite_bytes` descartando
+    as miniaturas acessadas há mais tempo.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, diretorio_local=DIRETORIO_LOCAL, offline=OFFLINE,
+                 limite_bytes=LIMITE_DISCO_BYTES, itens_memoria=ITENS_MEMORIA):
+        self.diretorio = diretorio
+        self.diretorio_local = diretorio_local
+        self.offline = offline
+        self.limite_bytes = limite_bytes
+        self.itens_memoria = itens_memoria
+        self._memoria = OrderedDict()
+        self._falhas = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {"memoria": 0, "disco": 0, "geradas": 0, "falhas": 0, "descartadas": 0}
+
+        os.makedirs(os.path.join(diretorio, "miniaturas"), exist_ok=True)
+        os.makedirs(os.path.join(diretorio, "fontes"), exist_ok=True)
+        self._bytes_disco = sum(entrada.stat().st_size
+                                for entrada in os.scandir(os.path.join(diretorio, "miniaturas")))
+
+    # ----- caminhos -----
+    def _caminho_referencia(self, fonte):
+        return os.path.join(self.diretorio, "fontes", hashlib.sha256(fonte.encode("utf-8")).hexdigest())
+
+    def _caminho_miniatura(self, conteudo, largura):
+        return os.path.join(self.diretorio, "miniaturas", f"{conteudo}_{largura}.jpg")
+
+    # ----- leitura da imagem original -----
+    def _ler_original(self, fonte):
+        if fonte.startswith(("http://", "https://")):
+            if self.diretorio_local:
+                caminho = os.path.join(self.diretorio_local, nome_local(fonte))
+                if os.path.exists(caminho):
+                    with open(caminho, "rb") as arquivo:
+                        return arquivo.read()
+            if self.offline:
+                return None
+            with urllib.request.urlopen(fonte, timeout=TIMEOUT_DOWNLOAD) as resposta:
+                return resposta.read()
+
+        caminho = fonte if os.path.isabs(fonte) or not self.diretorio_local else os.path.join(self.diretorio_local, fonte)
+        if not os.path.exists(caminho):
+            return None
+        with open(caminho, "rb") as arquivo:
+            return arquivo.read()
+
+    @staticmethod
+    def _reduzir(original, largura):
+        with Image.open(io.BytesIO(original)) as imagem:
+            # JPEG: decodifica já reduzido, bem mais barato que reduzir depois
+            imagem.draft("RGB", (largura, largura * imagem.height // max(1, imagem.width)))
+            imagem = imagem.convert("RGB")
+            imagem.thumbnail((largura, imagem.height), Image.LANCZOS, reducing_gap=2.0)
+            saida = io.BytesIO()
+            imagem.save(saida, format="JPEG", quality=85)
+            return saida.getvalue()
+
+    @staticmethod
+    def _gravar(caminho, dados):
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, caminho)
+
+    def _guardar_memoria(self, chave, dados):
+        with self._lock:
+            self._memoria[chave] = dados
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.itens_memoria:
+                self._memoria.popitem(last=False)
+
+    def _descartar_excesso(self):
+        # Chamado com self._lock adquirido
+        if self._bytes_disco <= self.limite_bytes:
+            return
+        pasta = os.path.join(self.diretorio, "miniaturas")
+        # Menos acessadas primeiro (o mtime é tocado a cada leitura do disco)
+        entradas = sorted(os.scandir(pasta), key=lambda entrada: entrada.stat().st_mtime)
+        for entrada in entradas:
+            if self._bytes_disco <= self.limite_bytes * 0.9:
+                break
+            tamanho = entrada.stat().st_size
+            try:
+                os.remove(entrada.path)
+            except FileNotFoundError:
+                continue
+            self._bytes_disco -= tamanho
+            self.estatisticas["descartadas"] += 1
+
+    # ----- API -----
+    def miniatura(self, fonte, largura):
+        """Bytes JPEG da imagem `fonte` com no máximo `largura` px, ou None."""
+        if not fonte:
+            return None
+        chave = (fonte, largura)
+        with self._lock:
+            dados = self._memoria.get(chave)
+            if dados is not None:
+                self._memoria.move_to_end(chave)
+                self.estatisticas["memoria"] += 1
+                return dados
+
+        referencia = self._caminho_referencia(fonte)
+        if os.path.exists(referencia):
+            with open(referencia) as arquivo:
+                conteudo = arquivo.read().strip()
+            caminho = self._caminho_miniatura(conteudo, largura)
+            try:
+                with open(caminho, "rb") as arquivo:
+                    dados = arquivo.read()
+                os.utime(caminho)
+                self.estatisticas["disco"] += 1
+                self._guardar_memoria(chave, dados)
+                return dados
+            except FileNotFoundError:
+                pass
+
+        if time.monotonic() - self._falhas.get(fonte, float("-inf")) < ESPERA_APOS_FALHA:
+            return None
+        try:
+            original = self._ler_original(fonte)
+            if original is None:
+                raise FileNotFoundError(fonte)
+            conteudo = hashlib.sha256(original).hexdigest()
+            dados = self._reduzir(original, largura)
+        except Exception:
+            self._falhas[fonte] = time.monotonic()
+            self.estatisticas["falhas"] += 1
+            return None
+
+        self._gravar(self._caminho_miniatura(conteudo, largura), dados)
+        self._gravar(referencia, conteudo.encode("ascii"))
+        with self._lock:
+            self._bytes_disco += len(dados)
+            self.estatisticas["geradas"] += 1
+            self._descartar_excesso()
+        self._guardar_memoria(chave, dados)
+        return dados
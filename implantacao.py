@@ -0,0 +1,165 @@
+"""Modo de implantação com vários processos do app atrás de um proxy local.
+
+Sobe um serviço de escrita (único processo que grava no banco; a fila de
+tarefas e a cópia da réplica de leitura rodam em threads dele que só
+gravam na vez da thread de escrita), N processos do Streamlit e um proxy
+reverso com sessões presas por cookie na porta pública.
+
+Exemplos:
+    python implantacao.py --processos 4 --porta 8501
+    UNIFOLHAS_REPLICA=/var/lib/unifolhas/replica.db python implantacao.py --processos 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from multiprocessing.connection import Client
+from pathlib import Path
+
+import banco
+import escritor
+import proxy
+import rotinas
+import tarefas
+
+APP = Path(__file__).resolve().parent / "1_app.py"
+# Espera máxima (s) para o serviço e os processos do app ficarem prontos
+PRAZO_PARTIDA = 60.0
+
+
+# ========== SERVIÇO DE ESCRITA ==========
+def servir_escrita(endereco_servico, chave):
+    """Processo do serviço de escrita: banco, fila de tarefas e réplica."""
+    # Registra as operações de escrita que ainda não vieram com rotinas
+    import favoritos  # noqa: F401
+    import sessoes  # noqa: F401
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    signal.signal(signal.SIGINT, lambda *_: parar.set())
+
+    pool = banco.PoolConexoes(banco.CAMINHO_DB)
+    banco.init_db(pool)
+    if banco.CAMINHO_REPLICA:
+        # Os processos do app abrem a réplica assim que sobem
+        banco.copiar_replica(pool, banco.CAMINHO_REPLICA)
+    servico = escritor.Servico(pool, endereco_servico, chave)
+    # Tarefas em threads próprias (a reconstrução das recomendações e a cópia
+    # da réplica não seguram os pedidos); as escritas delas esperam a vez
+    trabalhadores = rotinas.agendar_periodicas(tarefas.Trabalhadores(escritor.PoolServico(servico)))
+    servico.depois_do_lote = trabalhadores.acordar
+    while not parar.wait(1):
+        pass
+    servico.fechar()
+    trabalhadores.fechar()
+    pool.fechar()
+
+
+def _esperar_servico(endereco_servico, chave, processo):
+    limite = time.monotonic() + PRAZO_PARTIDA
+    while time.monotonic() < limite and processo.is_alive():
+        try:
+            Client(escritor.endereco(endereco_servico), authkey=escritor.chave_autenticacao(chave)).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("serviço de escrita não subiu")
+
+
+def _esperar_app(porta, processo):
+    limite = time.monotonic() + PRAZO_PARTIDA
+    while time.monotonic() < limite and processo.poll() is None:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{porta}/_stcore/health", timeout=1) as resposta:
+                if resposta.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"processo do app na porta {porta} não subiu")
+
+
+# ========== PROCESSOS DO APP E PROXY ==========
+def iniciar(processos, porta_interna, saida=None):
+    """Sobe o serviço de escrita e os processos do app; devolve (serviço, [apps], [(host, porta)])."""
+    chave = secrets.token_hex(16)
+    endereco_servico = f"127.0.0.1:{porta_interna}"
+    servico = multiprocessing.get_context("spawn").Process(
+        target=servir_escrita, args=(endereco_servico, chave), name="unifolhas-escritor")
+    servico.start()
+    _esperar_servico(endereco_servico, chave, servico)
+
+    ambiente = {**os.environ,
+                "UNIFOLHAS_ESCRITOR": endereco_servico,
+                "UNIFOLHAS_ESCRITOR_CHAVE": chave}
+    apps, destinos = [], []
+    try:
+        _subir_apps(processos, porta_interna, ambiente, saida, apps, destinos)
+    except BaseException:
+        encerrar(servico, apps)
+        raise
+    return servico, apps, destinos
+
+
+def _subir_apps(processos, porta_interna, ambiente, saida, apps, destinos):
+    for indice in range(processos):
+        porta_app = porta_interna + 1 + indice
+        apps.append(subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", str(APP),
+             "--server.port", str(porta_app), "--server.address", "127.0.0.1",
+             "--server.headless", "true", "--browser.gatherUsageStats", "false"],
+            env=ambiente, stdout=saida, stderr=subprocess.STDOUT if saida else None))
+        destinos.append(("127.0.0.1", porta_app))
+    for app, (_, porta_app) in zip(apps, destinos):
+        _esperar_app(porta_app, app)
+
+
+def encerrar(servico, apps):
+    for app in apps:
+        app.terminate()
+    for app in apps:
+        try:
+            app.wait(10)
+        except subprocess.TimeoutExpired:
+            app.kill()
+    # Depois dos apps: o que eles mandaram gravar ao sair ainda é atendido
+    servico.terminate()
+    servico.join(10)
+
+
+async def _servir_proxy(destinos, host, porta):
+    servidor = await proxy.ProxyReverso(destinos).servir(host, porta)
+    parar = asyncio.Event()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sinal, parar.set)
+    print(f"Unifolhas em http://{host}:{porta} ({len(destinos)} processos do app)", flush=True)
+    async with servidor:
+        await parar.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog="\n".join(__doc__.splitlines()[2:]))
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1, help="processos do app")
+    parser.add_argument("--porta", type=int, default=8501, help="porta pública (proxy)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta-interna", type=int, default=8600,
+                        help="serviço de escrita nesta porta, processos do app nas seguintes")
+    args = parser.parse_args(argv)
+
+    servico, apps, destinos = iniciar(args.processos, args.porta_interna)
+    try:
+        asyncio.run(_servir_proxy(destinos, args.host, args.porta))
+    finally:
+        encerrar(servico, apps)
+
+
+if __name__ == "__main__":
+    main()
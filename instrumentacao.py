@@ -0,0 +1,271 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# ========== CONFIGURAÇÕES ==========
+# UNIFOLHAS_PERFIL=1 liga a instrumentação; desligada, `secao` devolve um
+# contexto vazio e as conexões são sqlite3.Connection comuns
+ATIVO = os.environ.get("UNIFOLHAS_PERFIL") == "1"
+DIRETORIO = os.environ.get("UNIFOLHAS_PERFIL_DIR", ".perfil")
+# Intervalo mínimo entre regravações do arquivo Prometheus (s)
+INTERVALO_PROMETHEUS = 5.0
+TAMANHO_SQL = 300
+
+_ESPACOS = re.compile(r"\s+")
+_NULO = nullcontext()
+_local = threading.local()
+
+
+# ========== EXECUÇÃO (UM RERUN) ==========
+class Execucao:
+    """Consultas SQL e seções de um rerun (ou de um rerun de fragmento)."""
+
+    __slots__ = ("escopo", "inicio", "duracao", "consultas", "secoes", "anotacoes")
+
+    def __init__(self, escopo):
+        self.escopo = escopo
+        self.inicio = time.perf_counter()
+        self.duracao = None
+        self.consultas = []
+        self.secoes = []
+        self.anotacoes = {}
+
+    def resumo(self):
+        ms_sql = sum(consulta["ms"] for consulta in self.consultas)
+        lentas = sorted(self.consultas, key=lambda consulta: consulta["ms"], reverse=True)[:5]
+        return {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "pid": os.getpid(),
+                "escopo": self.escopo,
+                **self.anotacoes,
+                "ms": round(self.duracao * 1000, 2),
+                "consultas": len(self.consultas),
+                "ms_sql": round(ms_sql, 2),
+                "linhas": sum(consulta["linhas"] for consulta in self.consultas),
+                "secoes": [{"secao": nome, "ms": round(ms, 2)} for nome, ms in self.secoes],
+                "mais_lentas": [dict(consulta, ms=round(consulta["ms"], 2)) for consulta in lentas]}
+
+
+def atual():
+    return getattr(_local, "execucao", None)
+
+
+def iniciar(escopo):
+    if ATIVO:
+        _local.execucao = Execucao(escopo)
+
+
+def anotar(chave, valor):
+    execucao = atual()
+    if execucao is not None:
+        execucao.anotacoes[chave] = valor
+
+
+def finalizar():
+    """Fecha o rerun atual, grava nas saídas e devolve a Execucao (ou None)."""
+    execucao = atual()
+    if execucao is None:
+        return None
+    _local.execucao = None
+    execucao.duracao = time.perf_counter() - execucao.inicio
+    _saida.registrar(execucao)
+    return execucao
+
+
+# ========== SEÇÕES ==========
+class _Secao:
+    __slots__ = ("nome", "inicio")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *excecao):
+        execucao = atual()
+        if execucao is not None:
+            execucao.secoes.append((self.nome, (time.perf_counter() - self.inicio) * 1000))
+
+
+class _ExecucaoAvulsa:
+    # Rerun só de um fragmento: o topo do script não roda, então o
+    # fragmento abre e fecha a própria Execucao
+    __slots__ = ("escopo",)
+
+    def __init__(self, escopo):
+        self.escopo = escopo
+
+    def __enter__(self):
+        iniciar(self.escopo)
+
+    def __exit__(self, *excecao):
+        finalizar()
+
+
+def secao(nome):
+    """Mede um trecho nomeado do rerun atual (`with secao("..."):`)."""
+    return _Secao(nome) if ATIVO else _NULO
+
+
+def secao_fragmento(nome):
+    # Dentro de um rerun completo vira seção; sozinho, vira uma execução
+    if not ATIVO:
+        return _NULO
+    return _Secao(nome) if atual() is not None else _ExecucaoAvulsa(f"fragmento:{nome}")
+
+
+# ========== SQL ==========
+def _registrar_consulta(sql, ms, linhas):
+    _saida.somar_sql(ms)
+    execucao = atual()
+    if execucao is None:
+        return None
+    consulta = {"sql": _ESPACOS.sub(" ", sql).strip()[:TAMANHO_SQL], "ms": ms, "linhas": linhas}
+    execucao.consultas.append(consulta)
+    return consulta
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    # Tempo de execute + leitura das linhas; a consulta é registrada no
+    # execute e atualizada a cada fetch
+    _consulta = None
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._consulta = _registrar_consulta(sql, (time.perf_counter() - inicio) * 1000,
+                                                 max(self.rowcount, 0))
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            self._consulta = _registrar_consulta(sql, (time.perf_counter() - inicio) * 1000,
+                                                 max(self.rowcount, 0))
+
+    def _medir(self, ler, *args):
+        inicio = time.perf_counter()
+        resultado = ler(*args)
+        if self._consulta is not None:
+            self._consulta["ms"] += (time.perf_counter() - inicio) * 1000
+            self._consulta["linhas"] += len(resultado) if isinstance(resultado, list) else resultado is not None
+        return resultado
+
+    def fetchone(self):
+        return self._medir(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._medir(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._medir(super().fetchall)
+
+    def __next__(self):
+        linha = self._medir(super().fetchone)
+        if linha is None:
+            raise StopIteration
+        return linha
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            _registrar_consulta("COMMIT", (time.perf_counter() - inicio) * 1000, 0)
+
+
+def fabrica_conexao():
+    """Classe de conexão para `banco.PoolConexoes`."""
+    return ConexaoInstrumentada if ATIVO else sqlite3.Connection
+
+
+# ========== SAÍDAS: JSONL E PROMETHEUS ==========
+class _Saida:
+    """Uma linha JSON por execução e métricas acumuladas no formato textfile
+    do Prometheus (um arquivo por processo, para o node_exporter)."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._lock = threading.Lock()
+        self._execucoes = defaultdict(lambda: [0, 0.0])
+        self._secoes = defaultdict(lambda: [0, 0.0])
+        self._sql = [0, 0.0]
+        self._ultima_gravacao = 0.0
+
+    def somar_sql(self, ms):
+        with self._lock:
+            self._sql[0] += 1
+            self._sql[1] += ms / 1000
+
+    def registrar(self, execucao):
+        with self._lock:
+            contagem = self._execucoes[execucao.escopo]
+            contagem[0] += 1
+            contagem[1] += execucao.duracao
+            for nome, ms in execucao.secoes:
+                contagem = self._secoes[nome]
+                contagem[0] += 1
+                contagem[1] += ms / 1000
+            prometheus = time.monotonic() - self._ultima_gravacao >= INTERVALO_PROMETHEUS
+            if prometheus:
+                self._ultima_gravacao = time.monotonic()
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            with open(os.path.join(self.diretorio, "execucoes.jsonl"), "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(execucao.resumo(), ensure_ascii=False) + "\n")
+            if prometheus:
+                self._gravar_prometheus()
+        except OSError:
+            # Perfil é auxiliar: disco cheio ou sem permissão não derruba o app
+            pass
+
+    def _gravar_prometheus(self):
+        with self._lock:
+            linhas = ["# TYPE unifolhas_execucao_segundos summary"]
+            for escopo, (quantidade, segundos) in sorted(self._execucoes.items()):
+                linhas.append(f'unifolhas_execucao_segundos_count{{escopo="{escopo}"}} {quantidade}')
+                linhas.append(f'unifolhas_execucao_segundos_sum{{escopo="{escopo}"}} {segundos:.6f}')
+            linhas.append("# TYPE unifolhas_secao_segundos summary")
+            for nome, (quantidade, segundos) in sorted(self._secoes.items()):
+                linhas.append(f'unifolhas_secao_segundos_count{{secao="{nome}"}} {quantidade}')
+                linhas.append(f'unifolhas_secao_segundos_sum{{secao="{nome}"}} {segundos:.6f}')
+            linhas.append("# TYPE unifolhas_sql_consultas_total counter")
+            linhas.append(f"unifolhas_sql_consultas_total {self._sql[0]}")
+            linhas.append("# TYPE unifolhas_sql_segundos_total counter")
+            linhas.append(f"unifolhas_sql_segundos_total {self._sql[1]:.6f}")
+        caminho = os.path.join(self.diretorio, f"unifolhas_{os.getpid()}.prom")
+        with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+            arquivo.write("\n".join(linhas) + "\n")
+        os.replace(caminho + ".tmp", caminho)
+
+    def fechar(self):
+        if self._execucoes:
+            try:
+                self._gravar_prometheus()
+            except OSError:
+                pass
+
+
+_saida = _Saida(DIRETORIO)
+if ATIVO:
+    atexit.register(_saida.fechar)
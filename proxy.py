@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import re
+
+# ========== CONFIGURAÇÕES ==========
+# Cookie que prende o navegador a um processo do app
+COOKIE = "unifolhas_worker"
+# Maior cabeçalho HTTP aceito (bytes)
+MAX_CABECALHO = 64 * 1024
+# Bytes lidos por vez ao repassar
+TAMANHO_BLOCO = 64 * 1024
+
+_COOKIE = re.compile(rb"^cookie:.*?\b" + COOKIE.encode() + rb"=(\d+)", re.IGNORECASE | re.MULTILINE)
+
+
+class ProxyReverso:
+    """Proxy HTTP/WebSocket local que distribui os navegadores entre os processos do app.
+
+    O estado de cada aba do Streamlit (session_state, carrinho, fragmentos)
+    vive no processo que abriu o WebSocket, e os arquivos de mídia que ele
+    gera só existem lá, então cada navegador fica preso a um processo: o
+    primeiro pedido sem cookie vai ao próximo da fila (rodízio) e a resposta
+    leva `Set-Cookie` com o índice dele. Depois do cabeçalho do primeiro
+    pedido a conexão vira um túnel de bytes, o que cobre o WebSocket
+    (uma conexão longa só) e o keep-alive sem interpretar o resto.
+    """
+
+    def __init__(self, destinos):
+        # destinos: [(host, porta)] dos processos do app, na ordem dos índices
+        self.destinos = list(destinos)
+        self._rodizio = itertools.cycle(range(len(self.destinos)))
+        self.estatisticas = {"conexoes": 0, "sem_cookie": 0, "destino_fora": 0}
+
+    async def servir(self, host, porta):
+        return await asyncio.start_server(self._atender, host, porta, limit=MAX_CABECALHO)
+
+    async def _conectar(self, preferido):
+        # Destino do cookie; se ele não atende, o próximo que atender
+        for deslocamento in range(len(self.destinos)):
+            indice = (preferido + deslocamento) % len(self.destinos)
+            try:
+                leitor, escritor = await asyncio.open_connection(*self.destinos[indice], limit=MAX_CABECALHO)
+                return indice, leitor, escritor
+            except OSError:
+                self.estatisticas["destino_fora"] += 1
+        raise ConnectionRefusedError("nenhum processo do app atendeu")
+
+    async def _atender(self, cliente_leitor, cliente_escritor):
+        self.estatisticas["conexoes"] += 1
+        destino_escritor = None
+        try:
+            try:
+                cabecalho = await cliente_leitor.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            achado = _COOKIE.search(cabecalho)
+            if achado and int(achado.group(1)) < len(self.destinos):
+                preferido = int(achado.group(1))
+            else:
+                preferido = next(self._rodizio)
+                self.estatisticas["sem_cookie"] += 1
+            try:
+                indice, destino_leitor, destino_escritor = await self._conectar(preferido)
+            except ConnectionRefusedError:
+                cliente_escritor.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            destino_escritor.write(cabecalho)
+            # O corpo do pedido (POST) segue já, antes da resposta chegar
+            subida = asyncio.ensure_future(self._repassar(cliente_leitor, destino_escritor))
+
+            # Cookie novo (ou destino trocado) vai no cabeçalho da primeira resposta
+            try:
+                resposta = await destino_leitor.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                subida.cancel()
+                return
+            if achado is None or int(achado.group(1)) != indice:
+                resposta = (resposta[:-2]
+                            + f"Set-Cookie: {COOKIE}={indice}; Path=/; HttpOnly; SameSite=Lax\r\n\r\n".encode())
+            cliente_escritor.write(resposta)
+
+            await asyncio.gather(subida, self._repassar(destino_leitor, cliente_escritor))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for escritor in (cliente_escritor, destino_escritor):
+                if escritor is not None:
+                    escritor.close()
+
+    @staticmethod
+    async def _repassar(leitor, escritor):
+        try:
+            while bloco := await leitor.read(TAMANHO_BLOCO):
+                escritor.write(bloco)
+                await escritor.drain()
+        except ConnectionError:
+            pass
+        finally:
+            # Um lado terminou: fecha a escrita do outro (meia conexão)
+            if escritor.can_write_eof():
+                try:
+                    escritor.write_eof()
+                except OSError:
+                    pass
@@ -0,0 +1,318 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import tarefas
+
+# ========== CONFIGURAÇÕES ==========
+# Vizinhos guardados por produto
+K = 10
+# Um favorito em comum vale menos que uma compra em comum
+PESO_FAVORITO = 0.5
+# Cestas (pedidos ou favoritos de um usuário) maiores que isso ficam de fora:
+# compras de atacado e quem favorita o catálogo inteiro só geram ruído
+LIMITE_CESTA = 50
+# Soma ao denominador: um único pedido em comum entre dois produtos raros
+# não vale mais que dezenas entre dois produtos populares
+ENCOLHIMENTO = 5.0
+# Acima de tantos produtos tocados pelas vendas novas, reconstrói tudo
+LIMITE_INCREMENTAL = 500
+# Compras recentes de um usuário usadas como sementes dos destaques
+SEMENTES_COMPRAS = 20
+
+# (cesta << 32) | produto_id numa coluna só: metade dos objetos Python por
+# linha lida, que é o que domina a leitura
+SQL_CESTAS_PEDIDOS = '''SELECT (pedido_id << 32) | produto_id FROM vendas
+                        WHERE pedido_id IS NOT NULL AND produto_id IS NOT NULL AND id <= ?
+                        ORDER BY pedido_id, produto_id'''
+SQL_CESTAS_FAVORITOS = '''SELECT (usuario_id << 32) | produto_id FROM favoritos
+                          ORDER BY usuario_id, produto_id'''
+
+
+# ========== MATRIZ DE COOCORRÊNCIA ==========
+# Cada cesta (pedido, ou favoritos de um usuário) vira linhas (cesta, produto)
+# ordenadas; os pares da mesma cesta saem comparando o vetor com ele mesmo
+# deslocado de 1, 2, ... posições, sem laço por cesta. A matriz esparsa fica
+# como vetores (linha, coluna, valor) agregados por np.unique.
+def _ler_cestas(conn, sql, params=()):
+    """Matriz n x 2 (cesta, produto_id) com as linhas de `sql`."""
+    codigos = np.fromiter((linha[0] for linha in conn.execute(sql, params)), dtype=np.int64)
+    return np.c_[codigos >> 32, codigos & 0xFFFFFFFF]
+
+
+def _pares(cestas):
+    """(produtos de cada linha mantida, a, b) com a < b na mesma cesta."""
+    if len(cestas) == 0:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio
+    cesta, produto = cestas[:, 0], cestas[:, 1]
+    # O mesmo produto duas vezes na cesta conta uma
+    distinta = np.r_[True, (cesta[1:] != cesta[:-1]) | (produto[1:] != produto[:-1])]
+    cesta, produto = cesta[distinta], produto[distinta]
+
+    inicios = np.flatnonzero(np.r_[True, cesta[1:] != cesta[:-1]])
+    tamanhos = np.diff(np.r_[inicios, len(cesta)])
+    manter = np.repeat(tamanhos <= LIMITE_CESTA, tamanhos)
+    cesta, produto = cesta[manter], produto[manter]
+    tamanhos = tamanhos[tamanhos <= LIMITE_CESTA]
+
+    a, b = [], []
+    for deslocamento in range(1, int(tamanhos.max(initial=1))):
+        mesma = cesta[deslocamento:] == cesta[:-deslocamento]
+        a.append(produto[:-deslocamento][mesma])
+        b.append(produto[deslocamento:][mesma])
+    if not a:
+        return produto, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return produto, np.concatenate(a), np.concatenate(b)
+
+
+def _somar(a, b, pesos, n):
+    # Agrega pares repetidos (a < b, índices densos < n) somando os pesos
+    unicos, inverso = np.unique(a * n + b, return_inverse=True)
+    soma = np.bincount(inverso, weights=pesos, minlength=len(unicos))
+    return unicos // n, unicos % n, soma
+
+
+def pontuacao(comum, peso_a, peso_b):
+    """Cosseno encolhido: comum / (sqrt(peso_a * peso_b) + ENCOLHIMENTO)."""
+    return comum / (np.sqrt(peso_a * peso_b) + ENCOLHIMENTO)
+
+
+def _melhores(origem, destino, pontos, k=K):
+    # Os k maiores de cada origem: ordena por (origem, -pontos, destino) e
+    # corta pela posição dentro do grupo. Com ids pequenos as três chaves
+    # cabem num int64 (pontos < 1 quantizados) e um argsort simples faz o
+    # trabalho do lexsort em uma fração do tempo.
+    bits = max(int(origem.max(initial=0)), int(destino.max(initial=0)), 1).bit_length()
+    bits_pontos = 63 - 2 * bits
+    if bits_pontos >= 24:
+        escala = (1 << bits_pontos) - 1
+        quantizados = escala - (np.clip(pontos, 0, 1) * escala).astype(np.int64)
+        ordem = np.argsort((origem << (63 - bits)) | (quantizados << bits) | destino)
+    else:
+        ordem = np.lexsort((destino, -pontos, origem))
+    origem, destino, pontos = origem[ordem], destino[ordem], pontos[ordem]
+    indices = np.arange(len(origem))
+    inicio_grupo = np.maximum.accumulate(np.where(np.r_[True, origem[1:] != origem[:-1]], indices, 0))
+    posicao = indices - inicio_grupo
+    manter = posicao < k
+    return origem[manter], posicao[manter], destino[manter], pontos[manter]
+
+
+def construir(pedidos, favoritos, k=K):
+    """Índice completo a partir das cestas (n x 2: cesta, produto_id).
+
+    Devolve (ocorrencias, vizinhos): ocorrencias com (produto_id, pedidos,
+    favoritos, peso) e vizinhos com (produto_id, posicao, vizinho_id,
+    pontuacao), ambos DataFrames.
+    """
+    itens_p, a_p, b_p = _pares(pedidos)
+    itens_f, a_f, b_f = _pares(favoritos)
+    ids = np.unique(np.concatenate([itens_p, itens_f]))
+    # produto_id -> índice denso, por tabela (ids de produto são pequenos)
+    denso = np.zeros(int(ids.max(initial=0)) + 1, dtype=np.int64)
+    denso[ids] = np.arange(len(ids))
+    n_pedidos = np.bincount(denso[itens_p], minlength=len(ids))
+    n_favoritos = np.bincount(denso[itens_f], minlength=len(ids))
+    peso = n_pedidos + PESO_FAVORITO * n_favoritos
+    ocorrencias = pd.DataFrame({"produto_id": ids, "pedidos": n_pedidos,
+                                "favoritos": n_favoritos, "peso": peso})
+
+    a, b, comum = _somar(denso[np.concatenate([a_p, a_f])], denso[np.concatenate([b_p, b_f])],
+                         np.r_[np.ones(len(a_p)), np.full(len(a_f), PESO_FAVORITO)], len(ids))
+    pontos = pontuacao(comum, peso[a], peso[b])
+    # Simétrica: cada par entra nas listas dos dois produtos
+    origem, posicao, destino, pontos = _melhores(np.r_[a, b], np.r_[b, a], np.r_[pontos, pontos], k)
+    vizinhos = pd.DataFrame({"produto_id": ids[origem], "posicao": posicao,
+                             "vizinho_id": ids[destino], "pontuacao": pontos})
+    return ocorrencias, vizinhos
+
+
+# ========== ATUALIZAÇÃO DO ÍNDICE ==========
+def _gravar(conn, ocorrencias, vizinhos, produto_ids=None):
+    # Sem produto_ids troca o índice inteiro; com, só as listas desses produtos
+    if produto_ids is None:
+        conn.execute("DELETE FROM recomendacoes")
+        conn.execute("DELETE FROM recomendacoes_ocorrencias")
+    else:
+        conn.executemany("DELETE FROM recomendacoes WHERE produto_id = ?", [(int(p),) for p in produto_ids])
+    conn.executemany('''INSERT INTO recomendacoes_ocorrencias (produto_id, pedidos, favoritos, peso)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT (produto_id) DO UPDATE SET
+                            pedidos = excluded.pedidos, favoritos = excluded.favoritos, peso = excluded.peso''',
+                     ocorrencias.itertuples(index=False, name=None))
+    conn.executemany('''INSERT INTO recomendacoes (produto_id, posicao, vizinho_id, pontuacao)
+                        VALUES (?, ?, ?, ?)''', vizinhos.itertuples(index=False, name=None))
+
+
+def reconstruir(pool, k=K):
+    """Recalcula o índice inteiro a partir de vendas e favoritos; devolve o nº de produtos.
+
+    A leitura roda fora do lock de escrita; só a troca das tabelas é uma
+    transação. Vendas gravadas durante a leitura ficam acima da marca e
+    entram na próxima atualização incremental.
+    """
+    with pool.conexao() as conn:
+        maxima = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+        pedidos = _ler_cestas(conn, SQL_CESTAS_PEDIDOS, (maxima,))
+        favoritos = _ler_cestas(conn, SQL_CESTAS_FAVORITOS)
+    ocorrencias, vizinhos = construir(pedidos, favoritos, k)
+    ocorrencias = ocorrencias.astype({"produto_id": int, "pedidos": int, "favoritos": int, "peso": float})
+    vizinhos = vizinhos.astype({"produto_id": int, "posicao": int, "vizinho_id": int, "pontuacao": float})
+    with pool.transacao(imediata=True) as conn:
+        _gravar(conn, ocorrencias, vizinhos)
+        conn.execute("UPDATE recomendacoes_marca SET ultima_venda = ?, reconstruido_em = ? WHERE id = 1",
+                     (maxima, time.time()))
+    return len(ocorrencias)
+
+
+def _vizinhos_atuais(conn, produto_id, maxima):
+    # Linha da matriz de um produto direto das tabelas, pelos índices de
+    # vendas (produto -> pedidos -> itens) e de favoritos
+    comum = {}
+    for vizinho, pedidos in conn.execute(
+            '''SELECT v2.produto_id, COUNT(DISTINCT v1.pedido_id)
+               FROM vendas v1 JOIN vendas v2 ON v2.pedido_id = v1.pedido_id AND v2.produto_id <> v1.produto_id
+               WHERE v1.produto_id = ? AND v1.id <= ?
+                 AND (SELECT COUNT(DISTINCT v3.produto_id) FROM vendas v3 WHERE v3.pedido_id = v1.pedido_id) <= ?
+               GROUP BY v2.produto_id''', (produto_id, maxima, LIMITE_CESTA)):
+        comum[vizinho] = float(pedidos)
+    for vizinho, usuarios in conn.execute(
+            '''SELECT f2.produto_id, COUNT(*)
+               FROM favoritos f1 JOIN favoritos f2 ON f2.usuario_id = f1.usuario_id AND f2.produto_id <> f1.produto_id
+               WHERE f1.produto_id = ?
+                 AND (SELECT COUNT(*) FROM favoritos f3 WHERE f3.usuario_id = f1.usuario_id) <= ?
+               GROUP BY f2.produto_id''', (produto_id, LIMITE_CESTA)):
+        comum[vizinho] = comum.get(vizinho, 0.0) + PESO_FAVORITO * usuarios
+    return comum
+
+
+@tarefas.tarefa("recomendacoes")
+def atualizar(pool, dados=None, k=K):
+    """Leva ao índice as vendas acima da marca; devolve quantas.
+
+    Só os produtos dos pedidos novos têm a lista recalculada (O(vendas do
+    produto) cada). As pontuações de outras listas que citam esses produtos
+    ficam levemente defasadas, e favoritos alterados só entram na
+    reconstrução periódica ("recomendacoes_reconstruir"). Sem índice ainda,
+    ou com vendas novas demais, reconstrói tudo.
+    """
+    with pool.conexao() as conn:
+        ultima = conn.execute("SELECT ultima_venda FROM recomendacoes_marca WHERE id = 1").fetchone()[0]
+        maxima = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+        if maxima <= ultima:
+            return 0
+        novos = dict(conn.execute(
+            '''SELECT v.produto_id, COUNT(DISTINCT v.pedido_id) FROM vendas v
+               WHERE v.id > ? AND v.id <= ? AND v.pedido_id IS NOT NULL AND v.produto_id IS NOT NULL
+                 AND (SELECT COUNT(DISTINCT v3.produto_id) FROM vendas v3 WHERE v3.pedido_id = v.pedido_id) <= ?
+               GROUP BY v.produto_id''', (ultima, maxima, LIMITE_CESTA)).fetchall())
+        ocorrencias = pd.read_sql("SELECT * FROM recomendacoes_ocorrencias", conn, index_col="produto_id")
+        completa = ultima == 0 or len(novos) > max(LIMITE_INCREMENTAL, len(ocorrencias) // 10)
+        if not completa:
+            novas = pd.DataFrame({"pedidos": novos, "favoritos": 0, "peso": novos}).rename_axis("produto_id")
+            ocorrencias = ocorrencias.add(novas, fill_value=0)
+            linhas = [(produto_id, vizinho, valor)
+                      for produto_id in novos
+                      for vizinho, valor in _vizinhos_atuais(conn, produto_id, maxima).items()
+                      if vizinho in ocorrencias.index]
+    if completa:
+        reconstruir(pool, k)
+        return maxima - ultima
+
+    if linhas:
+        origem, destino, comum = (np.array(coluna) for coluna in zip(*linhas))
+        pesos = ocorrencias["peso"]
+        pontos = pontuacao(comum, pesos.loc[origem].to_numpy(), pesos.loc[destino].to_numpy())
+        origem, posicao, destino, pontos = _melhores(origem, destino, pontos, k)
+    else:
+        origem = posicao = destino = pontos = np.empty(0)
+    vizinhos = pd.DataFrame({"produto_id": origem, "posicao": posicao, "vizinho_id": destino, "pontuacao": pontos})
+    vizinhos = vizinhos.astype({"produto_id": int, "posicao": int, "vizinho_id": int, "pontuacao": float})
+    alteradas = ocorrencias.loc[list(novos)].reset_index()
+    alteradas = alteradas.astype({"produto_id": int, "pedidos": int, "favoritos": int, "peso": float})
+
+    with pool.transacao(imediata=True) as conn:
+        # Outra atualização (ou reconstrução) chegou antes: ela já contou estas vendas
+        if conn.execute('''UPDATE recomendacoes_marca SET ultima_venda = ?
+                           WHERE id = 1 AND ultima_venda = ?''', (maxima, ultima)).rowcount == 0:
+            return 0
+        _gravar(conn, alteradas, vizinhos, list(novos))
+    return maxima - ultima
+
+
+@tarefas.tarefa("recomendacoes_reconstruir")
+def reconstruir_tarefa(pool, dados=None):
+    # Periódica (diária): acerta pontuações defasadas e os favoritos
+    return reconstruir(pool)
+
+
+# ========== CONSULTAS ==========
+def sugestoes(pool, produto_ids, k=3):
+    """Produtos comprados junto com cada um de `produto_ids`: id -> [(id, Nome), ...].
+
+    Lê os k primeiros vizinhos de cada produto pela chave primária do
+    índice, numa consulta só para a página inteira.
+    """
+    if not produto_ids:
+        return {}
+    marcas = ",".join("?" * len(produto_ids))
+    resultado = {}
+    with pool.conexao() as conn:
+        for produto_id, vizinho_id, nome in conn.execute(
+                f'''SELECT r.produto_id, p.id, p.Nome FROM recomendacoes r
+                    JOIN produtos p ON p.id = r.vizinho_id
+                    WHERE r.produto_id IN ({marcas}) AND r.posicao < ?
+                    ORDER BY r.produto_id, r.posicao''', [*produto_ids, k]):
+            resultado.setdefault(produto_id, []).append((vizinho_id, nome))
+    return resultado
+
+
+def destaques(pool, usuario=None, k=3, cache=None):
+    """Produtos em destaque na Home (DataFrame de produtos, k linhas no máximo).
+
+    Para quem entrou: soma dos vizinhos dos favoritos e das compras recentes,
+    sem repetir o que já tem. Completa com os mais populares do índice e,
+    sem histórico nenhum, com os primeiros do catálogo. Tudo com estoque.
+    Com `cache` (catalogo.CacheCatalogo) as linhas dos escolhidos saem da
+    memória e o banco só escolhe os ids.
+    """
+    with pool.conexao() as conn:
+        escolhidos, vistos = [], set()
+        if usuario:
+            sementes = {linha[0] for linha in conn.execute(
+                '''SELECT produto_id FROM favoritos
+                   WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                   UNION
+                   SELECT produto_id FROM (SELECT produto_id FROM vendas
+                                           WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                                           ORDER BY Data DESC LIMIT ?)''',
+                (usuario, usuario, SEMENTES_COMPRAS))}
+            vistos |= sementes
+            if sementes:
+                marcas = ",".join("?" * len(sementes))
+                escolhidos += [linha[0] for linha in conn.execute(
+                    f'''SELECT r.vizinho_id FROM recomendacoes r
+                        JOIN produtos p ON p.id = r.vizinho_id AND p.Estoque > 0
+                        WHERE r.produto_id IN ({marcas}) AND r.vizinho_id NOT IN ({marcas})
+                        GROUP BY r.vizinho_id
+                        ORDER BY SUM(r.pontuacao) DESC, r.vizinho_id
+                        LIMIT ?''', [*sementes, *sementes, k])]
+        for sql in ('''SELECT o.produto_id FROM recomendacoes_ocorrencias o
+                       JOIN produtos p ON p.id = o.produto_id AND p.Estoque > 0
+                       ORDER BY o.peso DESC LIMIT ?''',
+                    "SELECT id FROM produtos WHERE Estoque > 0 ORDER BY id LIMIT ?"):
+            if len(escolhidos) >= k:
+                break
+            candidatos = [linha[0] for linha in conn.execute(sql, (k + len(vistos) + len(escolhidos),))]
+            escolhidos += [produto_id for produto_id in candidatos
+                           if produto_id not in vistos and produto_id not in escolhidos][:k - len(escolhidos)]
+        if not escolhidos:
+            return pd.DataFrame()
+        if cache is None:
+            marcas = ",".join("?" * len(escolhidos))
+            produtos = pd.read_sql(f"SELECT * FROM produtos WHERE id IN ({marcas})", conn, params=escolhidos)
+    if cache is not None:
+        return cache.por_ids(escolhidos)
+    return produtos.set_index("id", drop=False).loc[escolhidos].reset_index(drop=True)
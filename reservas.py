@@ -0,0 +1,130 @@
+import os
+import time
+
+import escritor
+import tarefas
+
+# ========== CONFIGURAÇÕES ==========
+# Tempo (s) que um carrinho segura o estoque sem ser renovado
+TTL = int(os.environ.get("UNIFOLHAS_RESERVA_TTL", 15 * 60))
+# Intervalo (s) da varredura periódica das reservas vencidas
+INTERVALO_VARREDURA = 30
+
+
+class ReservaRecusada(Exception):
+    def __init__(self, produto_id, disponivel):
+        self.produto_id = produto_id
+        self.disponivel = disponivel
+        super().__init__(f"Só há {disponivel} unidade(s) disponível(is) do produto {produto_id}")
+
+    def __reduce__(self):
+        # Atravessa o serviço de escrita (pickle) com os mesmos argumentos
+        return type(self), (self.produto_id, self.disponivel)
+
+
+# ========== TOTAL POR PRODUTO ==========
+# reservas_total acompanha cada mudança em reservas, na mesma transação;
+# reservas vencidas continuam contando até serem varridas (o disponível
+# fica conservador, nunca otimista)
+def _somar_total(conn, linhas):
+    # linhas: (produto_id, diferença)
+    conn.executemany('''INSERT INTO reservas_total (produto_id, quantidade) VALUES (?, ?)
+                        ON CONFLICT (produto_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade''',
+                     linhas)
+
+
+def expirar_produtos(conn, produto_ids, agora=None):
+    """Varre as reservas vencidas só destes produtos (dentro de uma transação)."""
+    agora = time.time() if agora is None else agora
+    for produto_id in produto_ids:
+        vencida = conn.execute('''SELECT SUM(quantidade) FROM reservas
+                                  WHERE produto_id = ? AND expira_em < ?''', (produto_id, agora)).fetchone()[0]
+        if vencida:
+            conn.execute("DELETE FROM reservas WHERE produto_id = ? AND expira_em < ?", (produto_id, agora))
+            _somar_total(conn, [(produto_id, -vencida)])
+
+
+def soltar(conn, sessao, produto_ids=None):
+    """Apaga as reservas da sessão (todas ou só destes produtos) dentro de uma transação."""
+    if produto_ids is None:
+        linhas = conn.execute("SELECT produto_id, quantidade FROM reservas WHERE sessao = ?", (sessao,)).fetchall()
+    else:
+        marcas = ",".join("?" * len(produto_ids))
+        linhas = conn.execute(f'''SELECT produto_id, quantidade FROM reservas
+                                  WHERE sessao = ? AND produto_id IN ({marcas})''',
+                              [sessao, *produto_ids]).fetchall()
+    if linhas:
+        conn.executemany("DELETE FROM reservas WHERE sessao = ? AND produto_id = ?",
+                         [(sessao, produto_id) for produto_id, _ in linhas])
+        _somar_total(conn, [(produto_id, -quantidade) for produto_id, quantidade in linhas])
+    return len(linhas)
+
+
+# ========== OPERAÇÕES ==========
+@escritor.operacao("reservar")
+def reservar(pool, sessao, produto_id, quantidade, ttl=TTL):
+    """Deixa a reserva da sessão para o produto em `quantidade` unidades.
+
+    Aumentar só passa se houver estoque livre (estoque menos as reservas das
+    outras sessões); senão nada muda e `ReservaRecusada` diz quanto a sessão
+    poderia ter. Diminuir ou zerar sempre passa. Renova o prazo da reserva.
+    """
+    agora = time.time()
+    with pool.transacao(imediata=True) as conn:
+        expirar_produtos(conn, [produto_id], agora)
+        linha = conn.execute("SELECT quantidade FROM reservas WHERE sessao = ? AND produto_id = ?",
+                             (sessao, produto_id)).fetchone()
+        atual = linha[0] if linha else 0
+        diferenca = quantidade - atual
+        if diferenca > 0:
+            livre = conn.execute('''SELECT p.Estoque - COALESCE(t.quantidade, 0)
+                                    FROM produtos p LEFT JOIN reservas_total t ON t.produto_id = p.id
+                                    WHERE p.id = ?''', (produto_id,)).fetchone()
+            livre = livre[0] if livre else 0
+            if livre < diferenca:
+                raise ReservaRecusada(produto_id, atual + max(livre, 0))
+        if quantidade > 0:
+            conn.execute('''INSERT INTO reservas (sessao, produto_id, quantidade, expira_em) VALUES (?, ?, ?, ?)
+                            ON CONFLICT (sessao, produto_id) DO UPDATE SET
+                                quantidade = excluded.quantidade, expira_em = excluded.expira_em''',
+                         (sessao, produto_id, quantidade, agora + ttl))
+        elif linha:
+            conn.execute("DELETE FROM reservas WHERE sessao = ? AND produto_id = ?", (sessao, produto_id))
+        if diferenca:
+            _somar_total(conn, [(produto_id, diferenca)])
+    return quantidade
+
+
+@escritor.operacao("liberar")
+def liberar(pool, sessao, produto_id=None):
+    """Solta as reservas da sessão (remoção do carrinho ou saída)."""
+    with pool.transacao(imediata=True) as conn:
+        return soltar(conn, sessao, None if produto_id is None else [produto_id])
+
+
+def disponiveis(pool, produto_ids, sessao=None):
+    """Estoque livre por produto (id -> unidades), somando o que a própria sessão já segura."""
+    if not produto_ids:
+        return {}
+    marcas = ",".join("?" * len(produto_ids))
+    with pool.conexao() as conn:
+        linhas = conn.execute(f'''SELECT p.id, p.Estoque - COALESCE(t.quantidade, 0) + COALESCE(r.quantidade, 0)
+                                  FROM produtos p
+                                  LEFT JOIN reservas_total t ON t.produto_id = p.id
+                                  LEFT JOIN reservas r ON r.produto_id = p.id AND r.sessao = ?
+                                  WHERE p.id IN ({marcas})''', [sessao, *produto_ids]).fetchall()
+    return {produto_id: max(livre, 0) for produto_id, livre in linhas}
+
+
+@tarefas.tarefa("reservas")
+def expirar(pool, dados=None):
+    """Varre de uma vez todas as reservas vencidas; devolve quantas."""
+    agora = time.time()
+    with pool.transacao(imediata=True) as conn:
+        vencidas = conn.execute('''SELECT produto_id, SUM(quantidade) FROM reservas
+                                   WHERE expira_em < ? GROUP BY produto_id''', (agora,)).fetchall()
+        if not vencidas:
+            return 0
+        _somar_total(conn, [(produto_id, -quantidade) for produto_id, quantidade in vencidas])
+        conn.execute("DELETE FROM reservas_total WHERE quantidade <= 0")
+        return conn.execute("DELETE FROM reservas WHERE expira_em < ?", (agora,)).rowcount
@@ -0,0 +1,31 @@
+"""Tarefas em segundo plano do app: registro de todos os tipos e agenda das periódicas.
+
+Cada módulo registra as suas funções com `@tarefas.tarefa` ao ser
+importado; quem executa a fila (o app, o serviço de escrita ou
+`python cli.py tarefas executar`) importa este módulo para conhecer todos
+os tipos que podem estar enfileirados.
+"""
+import analitico
+import banco
+import recomendacoes  # noqa: F401
+import reservas
+import tarefas
+import vendas  # noqa: F401
+
+
+@tarefas.tarefa("replica")
+def copiar_replica(pool, dados):
+    banco.copiar_replica(pool, dados["destino"])
+
+
+def agendar_periodicas(trabalhadores):
+    """Recálculos periódicos, os mesmos com um processo só ou com o serviço de escrita."""
+    trabalhadores.periodica("resumos", 60)
+    trabalhadores.periodica("reservas", reservas.INTERVALO_VARREDURA)
+    trabalhadores.periodica("recomendacoes", 300)
+    trabalhadores.periodica("recomendacoes_reconstruir", 86400)
+    if analitico.DIRETORIO and analitico.disponivel():
+        trabalhadores.periodica("espelho", 60, {"diretorio": analitico.DIRETORIO})
+    if banco.CAMINHO_REPLICA:
+        trabalhadores.periodica("replica", banco.INTERVALO_REPLICA, {"destino": banco.CAMINHO_REPLICA})
+    return trabalhadores
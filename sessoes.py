@@ -0,0 +1,182 @@
+import atexit
+import json
+import threading
+import time
+import zlib
+
+import escritor
+
+# ========== CONFIGURAÇÕES ==========
+# Intervalo entre gravações em lote (s)
+INTERVALO_GRAVACAO = 1.0
+# Acima deste número de chaves pendentes a gravação é antecipada
+MAX_PENDENTES = 500
+# Sessão sem alteração por este tempo é descartada (carrinho abandonado)
+TTL_SESSAO = 30 * 24 * 3600
+INTERVALO_EXPURGO = 600
+# Valores codificados maiores que isto são comprimidos
+LIMITE_COMPRESSAO = 256
+
+
+# ========== CODIFICAÇÃO ==========
+def codificar(valor):
+    # JSON sem espaços; comprimido com zlib quando compensa. O primeiro byte
+    # diz qual dos dois formatos foi usado.
+    dados = json.dumps(valor, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(dados) > LIMITE_COMPRESSAO:
+        return b"z" + zlib.compress(dados)
+    return b"j" + dados
+
+
+def decodificar(dados):
+    dados = bytes(dados)
+    if dados[:1] == b"z":
+        return json.loads(zlib.decompress(dados[1:]))
+    return json.loads(dados[1:])
+
+
+# ========== BACKENDS ==========
+class BackendSQLite:
+    """Guarda as sessões na tabela `sessoes` do banco do app.
+
+    Qualquer objeto com `ler`, `gravar` e `expirar` com a mesma assinatura
+    serve de backend para `ArmazemSessoes` (ex.: um servidor chave-valor).
+    Gravações e expurgos passam por `escrita` (escritor.Local ou Remoto,
+    no modo com serviço de escrita); só a leitura usa o pool.
+    """
+
+    def __init__(self, pool, escrita=None):
+        self.pool = pool
+        self.escrita = escrita or escritor.Local(pool)
+
+    def ler(self, chave, desde):
+        with self.pool.conexao() as conn:
+            linha = conn.execute('''SELECT dados FROM sessoes
+                                    WHERE chave = ? AND atualizado_em >= ?''',
+                                 (chave, desde)).fetchone()
+        return linha[0] if linha else None
+
+    def gravar(self, linhas):
+        # linhas: [(chave, dados ou None para apagar, instante)]
+        self.escrita.executar("sessoes_gravar", linhas)
+
+    def expirar(self, antes_de):
+        return self.escrita.executar("sessoes_expirar", antes_de)
+
+
+@escritor.operacao("sessoes_gravar")
+def _gravar(pool, linhas):
+    with pool.transacao(imediata=True) as conn:
+        conn.executemany('''INSERT INTO sessoes (chave, dados, atualizado_em) VALUES (?, ?, ?)
+                            ON CONFLICT (chave) DO UPDATE
+                            SET dados = excluded.dados, atualizado_em = excluded.atualizado_em''',
+                         [linha for linha in linhas if linha[1] is not None])
+        conn.executemany("DELETE FROM sessoes WHERE chave = ?",
+                         [(linha[0],) for linha in linhas if linha[1] is None])
+
+
+@escritor.operacao("sessoes_expirar")
+def _expirar(pool, antes_de):
+    with pool.transacao(imediata=True) as conn:
+        return conn.execute("DELETE FROM sessoes WHERE atualizado_em < ?", (antes_de,)).rowcount
+
+
+# ========== ARMAZÉM COM GRAVAÇÃO ADIADA ==========
+class ArmazemSessoes:
+    """Estado de sessão persistente, com gravação adiada e em lote.
+
+    `salvar` só guarda o valor em memória; uma thread grava tudo o que
+    mudou a cada `intervalo` segundos numa única transação (a última versão
+    de cada chave vence). Leituras veem primeiro o que ainda não foi
+    gravado. Outro processo enxerga a mudança depois de no máximo
+    `intervalo` segundos. Com `intervalo=0` cada `salvar` grava na hora.
+    """
+
+    def __init__(self, backend, intervalo=INTERVALO_GRAVACAO, ttl=TTL_SESSAO,
+                 max_pendentes=MAX_PENDENTES, intervalo_expurgo=INTERVALO_EXPURGO):
+        self.backend = backend
+        self.intervalo = intervalo
+        self.ttl = ttl
+        self.max_pendentes = max_pendentes
+        self.intervalo_expurgo = intervalo_expurgo
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._ultimo_expurgo = 0.0
+        self.estatisticas = {"salvos": 0, "gravados": 0, "lotes": 0, "expirados": 0}
+
+        self._thread = None
+        if intervalo > 0:
+            self._thread = threading.Thread(target=self._laco, name="armazem-sessoes", daemon=True)
+            self._thread.start()
+        atexit.register(self.fechar)
+
+    # ----- API -----
+    def ler(self, chave):
+        with self._lock:
+            if chave in self._pendentes:
+                dados = self._pendentes[chave][0]
+                return None if dados is None else decodificar(dados)
+        dados = self.backend.ler(chave, time.time() - self.ttl)
+        return None if dados is None else decodificar(dados)
+
+    def salvar(self, chave, valor):
+        self._enfileirar(chave, codificar(valor))
+
+    def apagar(self, chave):
+        self._enfileirar(chave, None)
+
+    def descarregar(self):
+        """Grava agora tudo o que está pendente."""
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, {}
+        if not pendentes:
+            return
+        try:
+            self.backend.gravar([(chave, dados, instante) for chave, (dados, instante) in pendentes.items()])
+        except Exception:
+            # Devolve à fila o que não foi sobrescrito enquanto isso
+            with self._lock:
+                for chave, valor in pendentes.items():
+                    self._pendentes.setdefault(chave, valor)
+            raise
+        else:
+            self.estatisticas["gravados"] += len(pendentes)
+            self.estatisticas["lotes"] += 1
+
+    def expirar(self):
+        removidos = self.backend.expirar(time.time() - self.ttl)
+        self.estatisticas["expirados"] += removidos
+        self._ultimo_expurgo = time.monotonic()
+        return removidos
+
+    def fechar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.descarregar()
+
+    # ----- interno -----
+    def _enfileirar(self, chave, dados):
+        with self._lock:
+            self._pendentes[chave] = (dados, time.time())
+            self.estatisticas["salvos"] += 1
+            cheio = len(self._pendentes) >= self.max_pendentes
+        if self._thread is None:
+            self.descarregar()
+        elif cheio:
+            self._acordar.set()
+
+    def _laco(self):
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.descarregar()
+                if time.monotonic() - self._ultimo_expurgo >= self.intervalo_expurgo:
+                    self.expirar()
+            except Exception:
+                # Banco ocupado ou indisponível: tenta de novo na próxima volta
+                pass
@@ -0,0 +1,198 @@
+import atexit
+import json
+import threading
+import time
+
+import escritor
+
+# ========== CONFIGURAÇÕES ==========
+MAX_TENTATIVAS = 5
+# Espera antes de tentar de novo: ESPERA_BASE * 2^(tentativas - 1), até ESPERA_MAXIMA (s)
+ESPERA_BASE = 2.0
+ESPERA_MAXIMA = 300.0
+# Tarefa "executando" há mais que isso (s) é de um trabalhador que morreu
+PRAZO_EXECUCAO = 300.0
+# Tarefas concluídas ficam guardadas (com a chave de idempotência) por este tempo
+RETENCAO = 7 * 86400
+# Intervalo entre rodadas de manutenção: prazos vencidos, limpeza, periódicas
+INTERVALO_MANUTENCAO = 10.0
+
+_TIPOS = {}
+
+
+def tarefa(tipo):
+    """Registra a função que executa as tarefas de `tipo` (decorador).
+
+    A função recebe (pool, dados) e pode rodar mais de uma vez para a mesma
+    tarefa (um trabalhador pode morrer depois de fazer o trabalho e antes de
+    marcá-la como feita), então precisa ser idempotente.
+    """
+    def registrar(funcao):
+        _TIPOS[tipo] = funcao
+        return funcao
+    return registrar
+
+
+# ========== FILA ==========
+def enfileirar(conn, tipo, dados=None, chave=None, atraso=0.0, max_tentativas=MAX_TENTATIVAS):
+    """Insere uma tarefa na transação de `conn` e devolve o id (None se a chave já existia).
+
+    Chamado dentro da transação que gera o trabalho, a tarefa só passa a
+    existir junto com ele (o pedido, no checkout). Com `chave`, enfileirar
+    de novo não cria outra tarefa enquanto a primeira estiver guardada.
+    """
+    agora = time.time()
+    cursor = conn.execute('''INSERT INTO tarefas (tipo, chave, dados, max_tentativas, disponivel_em, criado_em)
+                             VALUES (?, ?, ?, ?, ?, ?)
+                             ON CONFLICT (chave) DO NOTHING''',
+                          (tipo, chave, json.dumps(dados, separators=(",", ":")), max_tentativas,
+                           agora + atraso, agora))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def profundidade(pool):
+    """Tarefas por estado, pendentes por tipo e idade (s) da pendente mais antiga."""
+    with pool.conexao() as conn:
+        por_estado = dict(conn.execute("SELECT estado, COUNT(*) FROM tarefas GROUP BY estado").fetchall())
+        por_tipo = dict(conn.execute('''SELECT tipo, COUNT(*) FROM tarefas
+                                        WHERE estado = 'pendente' GROUP BY tipo''').fetchall())
+        mais_antiga = conn.execute('''SELECT MIN(disponivel_em) FROM tarefas
+                                      WHERE estado = 'pendente' AND disponivel_em <= ?''',
+                                   (time.time(),)).fetchone()[0]
+    return {
+        **{estado: por_estado.get(estado, 0) for estado in ("pendente", "executando", "feita", "falhou")},
+        "pendentes_por_tipo": por_tipo,
+        "atraso_s": time.time() - mais_antiga if mais_antiga else 0.0,
+    }
+
+
+@escritor.operacao("reenfileirar_falhas")
+def reenfileirar_falhas(pool, tipo=None):
+    """Devolve à fila as tarefas que esgotaram as tentativas; devolve quantas."""
+    filtro, params = ("AND tipo = ?", [tipo]) if tipo else ("", [])
+    with pool.transacao(imediata=True) as conn:
+        return conn.execute(f'''UPDATE tarefas SET estado = 'pendente', tentativas = 0, disponivel_em = ?
+                                WHERE estado = 'falhou' {filtro}''', [time.time()] + params).rowcount
+
+
+# ========== TRABALHADORES ==========
+class Trabalhadores:
+    """Threads do processo que executam as tarefas da fila no banco.
+
+    Vários processos podem ter os seus: cada tarefa é tomada com um UPDATE
+    dentro de BEGIN IMMEDIATE, então só um trabalhador a executa. Falhas
+    voltam para a fila com espera exponencial até `max_tentativas`; depois
+    a tarefa fica como "falhou" para análise (`reenfileirar_falhas`). No
+    serviço de escrita o pool é um `escritor.PoolServico`: as leituras das
+    tarefas correm soltas e só as transações de escrita esperam a vez.
+    """
+
+    def __init__(self, pool, quantidade=2, intervalo=1.0):
+        self.pool = pool
+        self.intervalo = intervalo
+        self.estatisticas = {"executadas": 0, "falhas": 0, "desistencias": 0}
+        self._periodicas = []
+        self._lock = threading.Lock()
+        self._proxima_manutencao = 0.0
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._threads = [threading.Thread(target=self._laco, name=f"tarefas-{i}", daemon=True)
+                         for i in range(quantidade)]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.fechar)
+
+    def periodica(self, tipo, intervalo, dados=None):
+        """Enfileira `tipo` a cada `intervalo` segundos.
+
+        A chave é o número da janela de tempo, então processos diferentes
+        agendando a mesma periódica geram uma única tarefa por janela.
+        """
+        self._periodicas.append((tipo, intervalo, dados))
+        self._proxima_manutencao = 0.0
+        self.acordar()
+
+    def acordar(self):
+        # Chamado depois de enfileirar no próprio processo: não espera o intervalo
+        self._acordar.set()
+
+    def fechar(self, espera=5.0):
+        self._parar.set()
+        self._acordar.set()
+        for thread in self._threads:
+            thread.join(espera)
+
+    def _laco(self):
+        while not self._parar.is_set():
+            try:
+                self._manutencao()
+                if not self.executar_uma():
+                    self._acordar.wait(self.intervalo)
+                    self._acordar.clear()
+            except Exception:
+                # Banco ocupado ou fora do ar: tenta de novo na próxima volta
+                self._parar.wait(self.intervalo)
+
+    def _manutencao(self):
+        agora = time.time()
+        with self._lock:
+            if agora < self._proxima_manutencao:
+                return
+            self._proxima_manutencao = agora + INTERVALO_MANUTENCAO
+        with self.pool.transacao(imediata=True) as conn:
+            conn.execute('''UPDATE tarefas SET estado = 'pendente', disponivel_em = ?,
+                                               erro = 'prazo de execução vencido'
+                            WHERE estado = 'executando' AND iniciado_em < ?''',
+                         (agora, agora - PRAZO_EXECUCAO))
+            conn.execute("DELETE FROM tarefas WHERE estado = 'feita' AND concluido_em < ?", (agora - RETENCAO,))
+            for tipo, intervalo, dados in self._periodicas:
+                enfileirar(conn, tipo, dados, chave=f"{tipo}@{int(agora // intervalo)}")
+
+    def _tomar(self):
+        agora = time.time()
+        # Leitura antes: fila vazia não disputa o lock de escrita
+        with self.pool.conexao() as conn:
+            if conn.execute('''SELECT 1 FROM tarefas WHERE estado = 'pendente' AND disponivel_em <= ?
+                               LIMIT 1''', (agora,)).fetchone() is None:
+                return None
+        with self.pool.transacao(imediata=True) as conn:
+            return conn.execute('''UPDATE tarefas SET estado = 'executando', tentativas = tentativas + 1,
+                                                      iniciado_em = ?
+                                   WHERE id = (SELECT id FROM tarefas
+                                               WHERE estado = 'pendente' AND disponivel_em <= ?
+                                               ORDER BY disponivel_em, id LIMIT 1)
+                                   RETURNING id, tipo, dados, tentativas, max_tentativas''',
+                                (agora, agora)).fetchone()
+
+    def executar_uma(self):
+        """Executa a próxima tarefa disponível; devolve False se a fila estava vazia."""
+        tomada = self._tomar()
+        if tomada is None:
+            return False
+        tarefa_id, tipo, dados, tentativas, max_tentativas = tomada
+        try:
+            funcao = _TIPOS.get(tipo)
+            if funcao is None:
+                raise LookupError(f"tipo de tarefa sem função registrada: {tipo}")
+            funcao(self.pool, json.loads(dados))
+        except Exception as e:
+            desistir = tentativas >= max_tentativas
+            espera = min(ESPERA_BASE * 2 ** (tentativas - 1), ESPERA_MAXIMA)
+            with self.pool.transacao(imediata=True) as conn:
+                conn.execute('''UPDATE tarefas SET estado = ?, disponivel_em = ?, erro = ?
+                                WHERE id = ?''',
+                             ("falhou" if desistir else "pendente", time.time() + espera, repr(e), tarefa_id))
+            self.estatisticas["desistencias" if desistir else "falhas"] += 1
+        else:
+            with self.pool.transacao(imediata=True) as conn:
+                conn.execute("UPDATE tarefas SET estado = 'feita', concluido_em = ?, erro = NULL WHERE id = ?",
+                             (time.time(), tarefa_id))
+            self.estatisticas["executadas"] += 1
+        return True
+
+    def executar_pendentes(self, limite=None):
+        """Executa na thread atual até a fila esvaziar (CLI e benchmarks)."""
+        executadas = 0
+        while (limite is None or executadas < limite) and self.executar_uma():
+            executadas += 1
+        return executadas
@@ -0,0 +1,228 @@
+import csv
+import itertools
+import os
+import time
+import unicodedata
+
+import banco
+
+# ========== CONFIGURAÇÕES ==========
+TAMANHO_LOTE = 5_000
+# Colunas aceitas num arquivo de produtos (o cabeçalho é comparado sem
+# acentos nem maiúsculas: "preco" e "PREÇO" valem como "Preço")
+COLUNAS_PRODUTO = ("sku", "Nome", "Preço", "Estoque", "Categoria", "Descricao", "Imagem")
+OBRIGATORIAS = ("sku", "Nome", "Preço")
+
+
+def _normalizar(nome):
+    sem_acento = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    return sem_acento.strip().lower()
+
+
+_CANONICAS = {_normalizar(coluna): coluna for coluna in COLUNAS_PRODUTO}
+
+
+def formato_do_arquivo(caminho):
+    return "parquet" if os.path.splitext(caminho)[1].lower() in (".parquet", ".pq") else "csv"
+
+
+# ========== LEITURA E ESCRITA EM LOTES ==========
+def ler_lotes(origem, formato, lote=TAMANHO_LOTE):
+    """Gera (colunas, lote de linhas) de um CSV ou Parquet sem ler o arquivo todo."""
+    if formato == "csv":
+        with open(origem, newline="", encoding="utf-8-sig") as arquivo:
+            leitor = csv.reader(arquivo)
+            colunas = next(leitor, None)
+            if colunas is None:
+                return
+            while True:
+                linhas = list(itertools.islice(leitor, lote))
+                if not linhas:
+                    break
+                yield colunas, linhas
+        return
+
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+
+        arquivo = pq.ParquetFile(origem)
+        colunas = arquivo.schema_arrow.names
+        for parte in arquivo.iter_batches(batch_size=lote):
+            yield colunas, list(zip(*(parte.column(i).to_pylist() for i in range(parte.num_columns))))
+        return
+
+    raise ValueError(f"Formato desconhecido: {formato}")
+
+
+def gravar_lotes(destino, formato, lotes, esquema=None):
+    """Grava os lotes (colunas, linhas) em `destino` e devolve o nº de linhas.
+
+    A memória usada é a de um lote. Em Parquet, sem `esquema` os tipos são
+    inferidos do primeiro lote.
+    """
+    total = 0
+    if formato == "csv":
+        with open(destino, "w", newline="", encoding="utf-8") as arquivo:
+            escritor = csv.writer(arquivo)
+            cabecalho = False
+            for colunas, linhas in lotes:
+                if not cabecalho:
+                    escritor.writerow(colunas)
+                    cabecalho = True
+                escritor.writerows(linhas)
+                total += len(linhas)
+        return total
+
+    if formato == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        escritor = None
+        try:
+            for colunas, linhas in lotes:
+                valores = dict(zip(colunas, map(list, zip(*linhas))))
+                tabela = pa.Table.from_pydict(valores, schema=esquema)
+                if escritor is None:
+                    esquema = tabela.schema
+                    escritor = pq.ParquetWriter(destino, esquema)
+                escritor.write_table(tabela)
+                total += len(linhas)
+            if escritor is None and esquema is not None:
+                # Nenhuma linha: ainda assim grava o arquivo com o esquema
+                escritor = pq.ParquetWriter(destino, esquema)
+        finally:
+            if escritor is not None:
+                escritor.close()
+        return total
+
+    raise ValueError(f"Formato desconhecido: {formato}")
+
+
+# ========== IMPORTAÇÃO DE PRODUTOS ==========
+def _texto(valor):
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _preco(valor):
+    if isinstance(valor, str):
+        valor = valor.strip().replace(",", ".")
+    preco = float(valor)
+    if not preco >= 0:
+        raise ValueError(f"Preço inválido: {valor}")
+    return preco
+
+
+def _estoque(valor):
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return 0
+    return int(float(valor))
+
+
+_CONVERSORES = {"sku": _texto, "Nome": _texto, "Preço": _preco, "Estoque": _estoque,
+                "Categoria": _texto, "Descricao": _texto, "Imagem": _texto}
+
+
+def _sql_upsert(presentes):
+    # Só as colunas que vieram no arquivo são atualizadas; Estoque ausente
+    # vale 0 para produto novo e fica como está nos existentes
+    inseridas = list(presentes) + ([] if "Estoque" in presentes else ["Estoque"])
+    valores = ["?"] * len(presentes) + ([] if "Estoque" in presentes else ["0"])
+    atualizadas = [f"{coluna} = excluded.{coluna}" for coluna in presentes if coluna != "sku"]
+    return f'''INSERT INTO produtos ({", ".join(inseridas)}) VALUES ({", ".join(valores)})
+               ON CONFLICT (sku) DO UPDATE SET {", ".join(atualizadas)}'''
+
+
+def importar_produtos(pool, origem, formato=None, lote=TAMANHO_LOTE, adiar=None, progresso=None):
+    """Carrega produtos de um CSV/Parquet com upsert por SKU.
+
+    Cada lote é um `executemany` na sua própria transação, então o app
+    continua gravando entre um lote e outro. Com `adiar`, os índices e
+    triggers de produtos (menos o do SKU, usado no upsert) saem antes da
+    carga e são recriados uma vez no fim; enquanto isso as consultas varrem
+    a tabela e a busca e a versão do catálogo ficam paradas, então só serve
+    para um banco que não está no ar. Sem `adiar` explícito, adia apenas
+    se produtos estiver vazia (banco novo, montado para a importação).
+    Linhas sem SKU, nome ou preço válido são contadas em "rejeitadas" e
+    puladas.
+    """
+    formato = formato or formato_do_arquivo(origem)
+    estatisticas = {"lidas": 0, "importadas": 0, "rejeitadas": 0, "indices_adiados": 0}
+    inicio = time.perf_counter()
+
+    # Sobra de uma carga interrompida
+    banco.restaurar_indices(pool)
+    if adiar is None:
+        with pool.conexao() as conn:
+            adiar = conn.execute("SELECT 1 FROM produtos LIMIT 1").fetchone() is None
+    if adiar:
+        estatisticas["indices_adiados"] = banco.adiar_indices(pool, "produtos", manter=("idx_produtos_sku",))
+    try:
+        sql = posicoes = None
+        for colunas, linhas in ler_lotes(origem, formato, lote):
+            if sql is None:
+                posicoes = {_CANONICAS[_normalizar(coluna)]: i
+                            for i, coluna in enumerate(colunas) if _normalizar(coluna) in _CANONICAS}
+                faltando = [coluna for coluna in OBRIGATORIAS if coluna not in posicoes]
+                if faltando:
+                    raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+                presentes = [coluna for coluna in COLUNAS_PRODUTO if coluna in posicoes]
+                sql = _sql_upsert(presentes)
+                conversores = [(_CONVERSORES[coluna], posicoes[coluna]) for coluna in presentes]
+
+            validas = []
+            for linha in linhas:
+                try:
+                    valores = tuple(converter(linha[i]) for converter, i in conversores)
+                except (ValueError, TypeError, IndexError):
+                    estatisticas["rejeitadas"] += 1
+                    continue
+                if valores[0] is None or valores[1] is None:
+                    estatisticas["rejeitadas"] += 1
+                    continue
+                validas.append(valores)
+
+            with pool.transacao(imediata=True) as conn:
+                conn.executemany(sql, validas)
+            estatisticas["lidas"] += len(linhas)
+            estatisticas["importadas"] += len(validas)
+            if progresso:
+                progresso(estatisticas["lidas"], time.perf_counter() - inicio)
+    finally:
+        if adiar:
+            inicio_indices = time.perf_counter()
+            banco.restaurar_indices(pool)
+            estatisticas["segundos_indices"] = time.perf_counter() - inicio_indices
+        with pool.conexao() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    estatisticas["segundos"] = time.perf_counter() - inicio
+    estatisticas["linhas_por_segundo"] = estatisticas["lidas"] / max(estatisticas["segundos"], 1e-9)
+    return estatisticas
+
+
+# ========== EXPORTAÇÃO DE PRODUTOS ==========
+def _lotes_produtos(pool, lote):
+    with pool.conexao() as conn:
+        cursor = conn.execute(f'''SELECT {", ".join(COLUNAS_PRODUTO)}, id
+                                  FROM produtos ORDER BY id''')
+        colunas = [descricao[0] for descricao in cursor.description]
+        while True:
+            linhas = cursor.fetchmany(lote)
+            if not linhas:
+                break
+            yield colunas, linhas
+
+
+def exportar_produtos(pool, destino, formato=None, lote=10_000):
+    formato = formato or formato_do_arquivo(destino)
+    esquema = None
+    if formato == "parquet":
+        import pyarrow as pa
+
+        esquema = pa.schema([("sku", pa.string()), ("Nome", pa.string()), ("Preço", pa.float64()),
+                             ("Estoque", pa.int64()), ("Categoria", pa.string()),
+                             ("Descricao", pa.string()), ("Imagem", pa.string()), ("id", pa.int64())])
+    return gravar_lotes(destino, formato, _lotes_produtos(pool, lote), esquema)
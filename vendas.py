@@ -0,0 +1,418 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+import escritor
+import reservas
+import tarefas
+import transferencia
+
+
+# ========== CHECKOUT ==========
+class EstoqueInsuficiente(Exception):
+    def __init__(self, produtos):
+        self.produtos = produtos
+        super().__init__("Estoque insuficiente para: " + ", ".join(produtos))
+
+    def __reduce__(self):
+        # Recriada com a lista de produtos ao voltar do serviço de escrita
+        return type(self), (self.produtos,)
+
+
+class PrecosAlterados(Exception):
+    """Preço de algum item mudou (ou o produto saiu do catálogo) desde que entrou no carrinho.
+
+    `precos` traz id -> preço atual dos produtos do pedido que ainda
+    existem, no formato de `Carrinho.validar_precos`.
+    """
+
+    def __init__(self, precos):
+        self.precos = precos
+        super().__init__("Preços alterados desde que os itens entraram no carrinho")
+
+    def __reduce__(self):
+        return type(self), (self.precos,)
+
+
+@escritor.operacao("finalizar_pedido")
+def finalizar_pedido(pool, usuario, itens, sessao=None):
+    """Grava o pedido inteiro numa única transação e devolve o id do pedido.
+
+    O estoque é baixado com UPDATE condicional, sem tocar no que está
+    reservado por outros carrinhos; as reservas da própria `sessao` viram a
+    compra. Se qualquer produto não tiver estoque suficiente nada é gravado
+    (as reservas também voltam) e `EstoqueInsuficiente` é levantada. Os
+    preços são conferidos na mesma transação: se algum mudou ou o produto
+    saiu do catálogo, `PrecosAlterados` é levantada antes de qualquer baixa.
+    Resumos, alertas de estoque e confirmação ficam para a tarefa
+    "pos_checkout", enfileirada na mesma transação.
+    """
+    quantidades = {}
+    nomes = {}
+    for item in itens:
+        quantidades[item["produto_id"]] = quantidades.get(item["produto_id"], 0) + item["Quantidade"]
+        nomes[item["produto_id"]] = item["Produto"]
+
+    # BEGIN IMMEDIATE: pega o lock de escrita já no início, então checkouts
+    # concorrentes esperam (busy_timeout) em vez de falhar no meio
+    with pool.transacao(imediata=True) as conn:
+        marcas = ",".join("?" * len(quantidades))
+        precos = dict(conn.execute(f'''SELECT id, Preço FROM produtos WHERE id IN ({marcas})''',
+                                   list(quantidades)).fetchall())
+        if any(item["produto_id"] not in precos
+               or round(precos[item["produto_id"]] * 100) != round(item["Preço"] * 100) for item in itens):
+            raise PrecosAlterados(precos)
+
+        if sessao is not None:
+            reservas.soltar(conn, sessao, list(quantidades))
+        reservas.expirar_produtos(conn, quantidades)
+        faltando = []
+        for produto_id, quantidade in sorted(quantidades.items()):
+            cursor = conn.execute('''UPDATE produtos SET Estoque = Estoque - ?
+                                     WHERE id = ? AND Estoque - COALESCE(
+                                         (SELECT quantidade FROM reservas_total WHERE produto_id = ?), 0) >= ?''',
+                                  (quantidade, produto_id, produto_id, quantidade))
+            if cursor.rowcount == 0:
+                faltando.append(nomes[produto_id])
+        if faltando:
+            raise EstoqueInsuficiente(faltando)
+
+        # Quem entrou sem cadastro ganha um registro em usuarios na primeira compra
+        conn.execute("INSERT OR IGNORE INTO usuarios (nome) VALUES (?)", (usuario,))
+        usuario_id = conn.execute("SELECT id FROM usuarios WHERE nome = ?", (usuario,)).fetchone()[0]
+
+        total = sum(item["Subtotal"] for item in itens)
+        pedido_id = conn.execute('''INSERT INTO pedidos (Usuario, Itens, Total)
+                                    VALUES (?, ?, ?)''',
+                                 (usuario, len(itens), total)).lastrowid
+        conn.executemany('''INSERT INTO vendas (Produto, produto_id, Quantidade, Preço, Subtotal,
+                                               Usuario, usuario_id, pedido_id)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                         [(item["Produto"], item["produto_id"], item["Quantidade"], item["Preço"],
+                           item["Subtotal"], usuario, usuario_id, pedido_id) for item in itens])
+        tarefas.enfileirar(conn, "pos_checkout", {"pedido_id": pedido_id}, chave=f"pos_checkout:{pedido_id}")
+    return pedido_id
+
+
+# Estoque a partir do qual um produto vendido gera alerta
+LIMITE_ESTOQUE_BAIXO = 5
+
+
+@tarefas.tarefa("pos_checkout")
+def pos_checkout(pool, dados):
+    # Tudo idempotente: resumos pela marca d'água, alerta por upsert e
+    # confirmação com o pedido como chave primária
+    agora = time.time()
+    with pool.transacao(imediata=True) as conn:
+        acumular_resumos(conn)
+        conn.execute('''INSERT INTO alertas_estoque (produto_id, Estoque, criado_em)
+                        SELECT p.id, p.Estoque, ? FROM produtos p
+                        WHERE p.id IN (SELECT produto_id FROM vendas WHERE pedido_id = ?)
+                          AND p.Estoque <= ?
+                        ON CONFLICT (produto_id) DO UPDATE SET Estoque = excluded.Estoque''',
+                     (agora, dados["pedido_id"], LIMITE_ESTOQUE_BAIXO))
+        conn.execute('''INSERT OR IGNORE INTO confirmacoes_pedido (pedido_id, Usuario, Itens, Total, criado_em)
+                        SELECT id, Usuario, Itens, Total, ? FROM pedidos WHERE id = ?''',
+                     (agora, dados["pedido_id"]))
+
+
+def alertas_estoque(pool):
+    # Só os que continuam baixos (reposição apaga o alerta na prática)
+    with pool.conexao() as conn:
+        return pd.read_sql('''SELECT p.Nome AS Produto, p.Estoque, datetime(a.criado_em, 'unixepoch') AS Desde
+                               FROM alertas_estoque a JOIN produtos p ON p.id = a.produto_id
+                               WHERE p.Estoque <= ?
+                               ORDER BY p.Estoque, p.Nome''', conn, params=(LIMITE_ESTOQUE_BAIXO,))
+
+
+# ========== RESUMOS DO DASHBOARD ==========
+# (tabela, chave, expressão da chave em vendas, coluna de contagem)
+RESUMOS = (
+    ("resumo_vendas_dia", "Dia", "date(Data)", "Vendas"),
+    ("resumo_vendas_produto", "Produto", "Produto", "Vendas"),
+    ("resumo_vendas_usuario", "Usuario", "Usuario", "Compras"),
+)
+
+
+def acumular_resumos(conn):
+    """Soma aos resumos as vendas com id acima da marca d'água.
+
+    Deve rodar dentro de uma transação de escrita (o checkout já está numa);
+    só lê as vendas novas, então o custo não cresce com o histórico.
+    """
+    ultima = conn.execute("SELECT ultima_venda FROM resumo_marca_d_agua WHERE id = 1").fetchone()[0]
+    maxima = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+    if maxima <= ultima:
+        return 0
+
+    for tabela, chave, expressao, contagem in RESUMOS:
+        conn.execute(f'''INSERT INTO {tabela} ({chave}, {contagem}, Quantidade, Receita)
+                         SELECT {expressao}, COUNT(*), SUM(Quantidade), SUM(Subtotal)
+                         FROM vendas
+                         WHERE id > ? AND id <= ?
+                         GROUP BY {expressao}
+                         ON CONFLICT ({chave}) DO UPDATE SET
+                             {contagem} = {contagem} + excluded.{contagem},
+                             Quantidade = Quantidade + excluded.Quantidade,
+                             Receita = Receita + excluded.Receita''',
+                     (ultima, maxima))
+    conn.execute("UPDATE resumo_marca_d_agua SET ultima_venda = ? WHERE id = 1", (maxima,))
+    return maxima - ultima
+
+
+@tarefas.tarefa("resumos")
+def atualizar_resumos(pool, dados=None):
+    # Periódica: pega vendas gravadas fora do checkout (importações, scripts)
+    with pool.transacao(imediata=True) as conn:
+        return acumular_resumos(conn)
+
+
+def periodo_vendas(pool):
+    """(primeiro dia, último dia) com vendas, ou (None, None)."""
+    with pool.conexao() as conn:
+        primeiro, ultimo = conn.execute("SELECT MIN(Dia), MAX(Dia) FROM resumo_vendas_dia").fetchone()
+    if primeiro is None:
+        return None, None
+    return datetime.date.fromisoformat(primeiro), datetime.date.fromisoformat(ultimo)
+
+
+def painel_vendas(pool, inicio=None, fim=None):
+    """Números do Dashboard pelo SQLite.
+
+    Sem período tudo sai das tabelas de resumo. Com período tudo sai da
+    varredura das vendas do intervalo (pelo índice em Data): os resumos só
+    alcançam as vendas quando a fila de tarefas roda, e totais de uma fonte
+    com rankings de outra podiam não bater. Cada painel é lido num snapshot.
+    """
+    if inicio is None and fim is None:
+        return _painel_resumos(pool)
+
+    where, params = _filtros_dados_completos(inicio, fim, None)
+    with pool.transacao() as conn:
+        vendas, receita, quantidade, clientes = conn.execute(f'''SELECT COUNT(*),
+                                                                        COALESCE(SUM(v.Subtotal), 0),
+                                                                        COALESCE(SUM(v.Quantidade), 0),
+                                                                        COUNT(DISTINCT v.Usuario)
+                                                                 FROM vendas v{where}''',
+                                                              params).fetchone()
+        por_dia = pd.read_sql(f'''SELECT date(v.Data) AS Dia, SUM(v.Subtotal) AS Subtotal,
+                                         SUM(v.Quantidade) AS Quantidade
+                                  FROM vendas v{where}
+                                  GROUP BY Dia ORDER BY Dia''', conn, params=params)
+        top_produtos = pd.read_sql(f'''SELECT v.Produto, SUM(v.Quantidade) AS Quantidade,
+                                              SUM(v.Subtotal) AS Subtotal
+                                       FROM vendas v{where}
+                                       GROUP BY v.Produto
+                                       ORDER BY Quantidade DESC LIMIT 5''', conn, params=params)
+        top_clientes = pd.read_sql(f'''SELECT v.Usuario, SUM(v.Subtotal) AS Subtotal,
+                                              SUM(v.Quantidade) AS Quantidade, COUNT(*) AS Compras
+                                       FROM vendas v{where}
+                                       GROUP BY v.Usuario
+                                       ORDER BY Subtotal DESC LIMIT 5''', conn, params=params)
+    return {
+        "motor": "sqlite",
+        "vendas": vendas,
+        "receita": receita,
+        "quantidade": quantidade,
+        "clientes": clientes,
+        "por_dia": por_dia,
+        "top_produtos": top_produtos,
+        "top_clientes": top_clientes,
+    }
+
+
+def _painel_resumos(pool):
+    with pool.transacao() as conn:
+        vendas, receita, quantidade = conn.execute('''SELECT COALESCE(SUM(Vendas), 0),
+                                                             COALESCE(SUM(Receita), 0),
+                                                             COALESCE(SUM(Quantidade), 0)
+                                                      FROM resumo_vendas_dia''').fetchone()
+        clientes = conn.execute("SELECT COUNT(*) FROM resumo_vendas_usuario").fetchone()[0]
+        por_dia = pd.read_sql('''SELECT Dia, Receita AS Subtotal, Quantidade
+                                 FROM resumo_vendas_dia ORDER BY Dia''', conn)
+        top_produtos = pd.read_sql('''SELECT Produto, Quantidade, Receita AS Subtotal
+                                      FROM resumo_vendas_produto
+                                      ORDER BY Quantidade DESC LIMIT 5''', conn)
+        top_clientes = pd.read_sql('''SELECT Usuario, Receita AS Subtotal, Quantidade, Compras
+                                      FROM resumo_vendas_usuario
+                                      ORDER BY Receita DESC LIMIT 5''', conn)
+    return {
+        "motor": "sqlite",
+        "vendas": vendas,
+        "receita": receita,
+        "quantidade": quantidade,
+        "clientes": clientes,
+        "por_dia": por_dia,
+        "top_produtos": top_produtos,
+        "top_clientes": top_clientes,
+    }
+
+
+# ========== DADOS COMPLETOS (PAGINADO NO SERVIDOR) ==========
+COLUNAS_DADOS_COMPLETOS = '''v.id, v.Data, v.Usuario, v.Produto, p.Categoria, v.Quantidade,
+                             v.Preço AS "Preço Vendido", p.Preço AS "Preço Atual",
+                             v.Subtotal, v.pedido_id'''
+
+# Opções de ordenação expostas na tela -> coluna SQL
+ORDENACAO_DADOS_COMPLETOS = {
+    "Data": "v.Data",
+    "Subtotal": "v.Subtotal",
+    "Quantidade": "v.Quantidade",
+    "Usuário": "v.Usuario",
+    "Produto": "v.Produto",
+}
+
+
+def _filtros_dados_completos(inicio, fim, usuario):
+    condicoes, params = [], []
+    if inicio:
+        condicoes.append("v.Data >= ?")
+        params.append(str(inicio))
+    if fim:
+        # Inclui o dia final inteiro sem aplicar função sobre a coluna indexada
+        condicoes.append("v.Data < date(?, '+1 day')")
+        params.append(str(fim))
+    if usuario:
+        condicoes.append("v.usuario_id = (SELECT id FROM usuarios WHERE nome = ?)")
+        params.append(usuario)
+    return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", params
+
+
+def contar_dados_completos(pool, inicio=None, fim=None, usuario=None):
+    where, params = _filtros_dados_completos(inicio, fim, usuario)
+    with pool.conexao() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM vendas v{where}", params).fetchone()[0]
+
+
+def pagina_dados_completos(pool, inicio=None, fim=None, usuario=None,
+                           ordenar_por="Data", decrescente=True, pagina=1, tamanho=50):
+    where, params = _filtros_dados_completos(inicio, fim, usuario)
+    coluna = ORDENACAO_DADOS_COMPLETOS[ordenar_por]
+    direcao = "DESC" if decrescente else "ASC"
+    with pool.conexao() as conn:
+        return pd.read_sql(f'''SELECT {COLUNAS_DADOS_COMPLETOS}
+                                FROM vendas v
+                                LEFT JOIN produtos p ON p.id = v.produto_id
+                                {where}
+                                ORDER BY {coluna} {direcao}, v.id {direcao}
+                                LIMIT ? OFFSET ?''',
+                           conn, params=params + [tamanho, (pagina - 1) * tamanho])
+
+
+def _linhas_dados_completos(pool, inicio, fim, usuario, lote):
+    # Gera (colunas, lote de linhas) direto do cursor, sem montar a tabela inteira
+    where, params = _filtros_dados_completos(inicio, fim, usuario)
+    with pool.conexao() as conn:
+        cursor = conn.execute(f'''SELECT {COLUNAS_DADOS_COMPLETOS}
+                                   FROM vendas v
+                                   LEFT JOIN produtos p ON p.id = v.produto_id
+                                   {where}
+                                   ORDER BY v.id''', params)
+        colunas = [descricao[0] for descricao in cursor.description]
+        while True:
+            linhas = cursor.fetchmany(lote)
+            if not linhas:
+                break
+            yield colunas, linhas
+
+
+def exportar_dados_completos(pool, destino, formato="csv", inicio=None, fim=None, usuario=None,
+                             lote=10_000):
+    """Grava vendas ⋈ produtos em `destino` lote a lote e devolve o nº de linhas.
+
+    A memória usada é a de um lote, independente do tamanho do histórico.
+    Parquet usa pyarrow (já instalado como dependência do Streamlit).
+    """
+    esquema = None
+    if formato == "parquet":
+        import pyarrow as pa
+
+        esquema = pa.schema([("id", pa.int64()), ("Data", pa.string()), ("Usuario", pa.string()),
+                             ("Produto", pa.string()), ("Categoria", pa.string()),
+                             ("Quantidade", pa.int64()), ("Preço Vendido", pa.float64()),
+                             ("Preço Atual", pa.float64()), ("Subtotal", pa.float64()),
+                             ("pedido_id", pa.int64())])
+    return transferencia.gravar_lotes(destino, formato,
+                                      _linhas_dados_completos(pool, inicio, fim, usuario, lote), esquema)
+
+
+# ========== HISTÓRICO DE COMPRAS POR USUÁRIO ==========
+class HistoricoCompras:
+    """Totais e série mensal de cada usuário, atualizados incrementalmente.
+
+    Guarda, por usuário, o id da última venda já somada; a cada leitura só
+    busca (e agrega no SQL) as vendas com id maior. Mantém no máximo
+    `max_usuarios` entradas, descartando as usadas há mais tempo.
+    """
+
+    def __init__(self, pool, max_usuarios=10_000):
+        self.pool = pool
+        self.max_usuarios = max_usuarios
+        self._usuarios = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resumo(self, usuario):
+        with self._lock:
+            estado = self._usuarios.get(usuario)
+            if estado is None:
+                estado = {"ultima_venda": 0, "total_gasto": 0.0, "total_itens": 0, "por_mes": {}}
+            else:
+                self._usuarios.move_to_end(usuario)
+            ultima = estado["ultima_venda"]
+
+        with self.pool.conexao() as conn:
+            novas = conn.execute('''SELECT strftime('%Y-%m', Data), SUM(Subtotal), SUM(Quantidade), MAX(id)
+                                    FROM vendas
+                                    WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                                      AND id > ?
+                                    GROUP BY 1''', (usuario, ultima)).fetchall()
+
+        with self._lock:
+            # Outra thread pode ter avançado o mesmo usuário enquanto consultávamos
+            atual = self._usuarios.get(usuario)
+            if atual is not None and atual["ultima_venda"] != ultima:
+                estado = atual
+            else:
+                por_mes = dict(estado["por_mes"])
+                ultima_venda, total_gasto, total_itens = ultima, estado["total_gasto"], estado["total_itens"]
+                for mes, subtotal, quantidade, maior_id in novas:
+                    anterior = por_mes.get(mes, (0.0, 0))
+                    por_mes[mes] = (anterior[0] + subtotal, anterior[1] + quantidade)
+                    ultima_venda = max(ultima_venda, maior_id)
+                    total_gasto += subtotal
+                    total_itens += quantidade
+                estado = {"ultima_venda": ultima_venda, "total_gasto": total_gasto,
+                          "total_itens": total_itens, "por_mes": por_mes}
+                self._usuarios[usuario] = estado
+                self._usuarios.move_to_end(usuario)
+                while len(self._usuarios) > self.max_usuarios:
+                    self._usuarios.popitem(last=False)
+
+        compras_por_mes = pd.DataFrame(
+            [(mes, subtotal, quantidade) for mes, (subtotal, quantidade) in sorted(estado["por_mes"].items())],
+            columns=["Mês", "Subtotal", "Quantidade"])
+        return {
+            "total_gasto": estado["total_gasto"],
+            "total_itens": estado["total_itens"],
+            "compras_por_mes": compras_por_mes,
+        }
+
+
+def contar_historico(pool, usuario):
+    with pool.conexao() as conn:
+        return conn.execute('''SELECT COUNT(*) FROM vendas
+                               WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)''',
+                            (usuario,)).fetchone()[0]
+
+
+def pagina_historico(pool, usuario, pagina=1, tamanho=20):
+    with pool.conexao() as conn:
+        return pd.read_sql('''SELECT Produto, Quantidade, Subtotal, Data
+                              FROM vendas
+                              WHERE usuario_id = (SELECT id FROM usuarios WHERE nome = ?)
+                              ORDER BY Data DESC, id DESC
+                              LIMIT ? OFFSET ?''',
+                           conn, params=(usuario, tamanho, (pagina - 1) * tamanho))